@@ -0,0 +1,37 @@
+"""
+Index migration command
+
+Usage:
+    python manage_indexes.py apply    # create every index registered by the routers
+    python manage_indexes.py report   # show present / missing indexes per collection
+    python manage_indexes.py migrate  # replace non-unique indexes that are now registered unique, then apply
+"""
+
+import argparse
+import asyncio
+import json
+
+import server  # noqa: F401 - importing the app registers every router's indexes
+from services.database import database_service
+from services.index_registry import index_registry
+
+async def main(command: str):
+    try:
+        if command == "apply":
+            result = await index_registry.apply(database_service.db)
+        elif command == "migrate":
+            result = {
+                "migration": await index_registry.migrate_unique(database_service.db),
+                "applied": await index_registry.apply(database_service.db)
+            }
+        else:
+            result = await index_registry.report(database_service.db)
+        print(json.dumps(result, indent=2))
+    finally:
+        database_service.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage HexaBid MongoDB indexes")
+    parser.add_argument("command", choices=["apply", "report", "migrate"])
+    args = parser.parse_args()
+    asyncio.run(main(args.command))
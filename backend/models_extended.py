@@ -54,6 +54,8 @@ class BOQLineItem(BaseModel):
     unit: str
     estimatedRate: Optional[float] = None
     ourRate: Optional[float] = None
+    costRate: Optional[float] = None
+    gstRate: Optional[float] = None  # percent; BOQ_DEFAULT_GST_PERCENT when unset
     totalAmount: Optional[float] = None
     remarks: Optional[str] = None
     productId: Optional[str] = None
@@ -65,9 +67,20 @@ class BOQCreate(BaseModel):
     lineItems: List[BOQLineItem]
     totalEstimatedValue: Optional[float] = None
     totalOurValue: Optional[float] = None
+    totalGstValue: Optional[float] = None
+    grandTotal: Optional[float] = None
     marginPercentage: Optional[float] = None
     notes: Optional[str] = None
 
+class BOQScenarioRequest(BaseModel):
+    # Either explicit margins or a start/stop/step range, all in percent
+    margins: Optional[List[float]] = None
+    marginStart: float = 0
+    marginStop: Optional[float] = None
+    marginStep: float = 1
+    discounts: List[float] = [0]
+    gstPercentage: Optional[float] = None
+
 class BOQ(BOQCreate):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -104,6 +117,12 @@ class ProductCreate(BaseModel):
     datasheet: Optional[str] = None
     tags: List[str] = []
 
+class ProductMatchRequest(BaseModel):
+    # BOQ-style lines; description and specification are matched
+    lineItems: List[Dict[str, Any]]
+    topK: int = 5
+    minScore: float = 0.1
+
 class Product(ProductCreate):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
 from typing import Optional
@@ -7,29 +8,46 @@ sys.path.append('/app/backend')
 from models_extended import Alert, AlertType, AlertChannel
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.pagination import paginate, page_meta
+from services.data_export import data_exporter, EXPORT_BATCH_SIZE
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("alerts", [("userId", 1), ("createdAt", -1), ("_id", -1)])
+index_registry.register("alerts", [("userId", 1), ("alertType", 1), ("createdAt", -1), ("_id", -1)])
+index_registry.register("alerts", [("userId", 1), ("isRead", 1), ("createdAt", -1), ("_id", -1)])
+index_registry.register("alerts", "id")
+
+def _alert_query(user_id: str, alert_type: Optional[str], unread_only: bool) -> dict:
+    """Filters shared by the alert list and export"""
+    query = {"userId": user_id}
+    
+    if alert_type:
+        query["alertType"] = alert_type
+    if unread_only:
+        query["isRead"] = False
+    return query
+
 @router.get("/")
 async def get_alerts(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     alert_type: Optional[str] = None,
     unread_only: bool = False,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    skip = (page - 1) * limit
-    query = {"userId": current_user.id}
+    query = _alert_query(current_user.id, alert_type, unread_only)
     
-    if alert_type:
-        query["alertType"] = alert_type
-    if unread_only:
-        query["isRead"] = False
-    
-    total = await db.alerts.count_documents(query)
-    alerts_cursor = db.alerts.find(query, {"_id": 0}).skip(skip).limit(limit).sort("createdAt", -1)
-    alerts = await alerts_cursor.to_list(length=limit)
+    try:
+        result = await paginate(db.alerts, query, [("createdAt", -1)], limit, cursor, page, {"_id": 0}, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    alerts = result["items"]
     
     for alert in alerts:
         for date_field in ['sentAt', 'createdAt']:
@@ -42,9 +60,33 @@ async def get_alerts(
     return {
         "data": alerts,
         "unreadCount": unread_count,
-        "pagination": {"page": page, "limit": limit, "total": total, "totalPages": (total + limit - 1) // limit}
+        "pagination": page_meta(result, page, limit)
     }
 
+@router.get("/export")
+async def export_alerts(
+    format: str = Query("csv"),
+    alert_type: Optional[str] = None,
+    unread_only: bool = False,
+    fields: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Stream every alert matching the list filters as csv, xlsx, ndjson or
+    parquet; fields is an optional comma-separated column list
+    """
+    try:
+        plan = data_exporter.prepare("alerts", format, fields, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(
+        data_exporter.stream(db, plan, _alert_query(current_user.id, alert_type, unread_only)),
+        media_type=plan["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{plan["file_name"]}"'}
+    )
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_alert(
     alert_data: dict,
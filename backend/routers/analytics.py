@@ -6,56 +6,43 @@ import sys
 sys.path.append('/app/backend')
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.dashboard_rollups import dashboard_rollups
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("tenders", [("userId", 1), ("updatedAt", -1)])
+
 @router.get("/dashboard")
 async def get_dashboard_metrics(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
+    rollup = await dashboard_rollups.get(db, current_user.id)
+    
     # Tender metrics
-    total_tenders = await db.tenders.count_documents({"userId": current_user.id})
-    active_tenders = await db.tenders.count_documents({"userId": current_user.id, "status": {"$in": ["new", "in_progress"]}})
-    submitted_tenders = await db.tenders.count_documents({"userId": current_user.id, "status": "submitted"})
-    won_tenders = await db.tenders.count_documents({"userId": current_user.id, "status": "won"})
-    lost_tenders = await db.tenders.count_documents({"userId": current_user.id, "status": "lost"})
+    tenders = rollup.get("tenders", {})
+    tender_status = tenders.get("byStatus", {})
+    total_tenders = tenders.get("total", 0)
+    won_tenders = tender_status.get("won", 0)
+    lost_tenders = tender_status.get("lost", 0)
     
     # Calculate win rate
     closed_tenders = won_tenders + lost_tenders
     win_rate = (won_tenders / closed_tenders * 100) if closed_tenders > 0 else 0.0
     
-    # Total tender value (sum of tenderValue field)
-    tender_pipeline = [
-        {"$match": {"userId": current_user.id, "tenderValue": {"$exists": True}}},
-        {"$group": {"_id": None, "totalValue": {"$sum": "$tenderValue"}}}
-    ]
-    tender_value_result = await db.tenders.aggregate(tender_pipeline).to_list(length=1)
-    total_value = tender_value_result[0]["totalValue"] if tender_value_result else 0.0
+    total_value = tenders.get("totalValue", 0.0)
     avg_tender_value = total_value / total_tenders if total_tenders > 0 else 0.0
     
-    # Vendor metrics
-    total_vendors = await db.vendors.count_documents({"userId": current_user.id, "isActive": True})
-    
     # RFQ metrics
-    total_rfqs = await db.rfqs.count_documents({"userId": current_user.id})
-    open_rfqs = await db.rfqs.count_documents({"userId": current_user.id, "status": {"$in": ["draft", "sent"]}})
-    
-    # Product metrics
-    total_products = await db.products.count_documents({"userId": current_user.id, "isActive": True})
-    
-    # BOQ metrics
-    total_boqs = await db.boqs.count_documents({"userId": current_user.id})
-    
-    # Team size
-    team_result = await db.companies.find_one({"userId": current_user.id}, {"teamMembers": 1})
-    team_size = len(team_result.get("teamMembers", [])) if team_result else 0
+    rfq_status = rollup.get("rfqs", {}).get("byStatus", {})
     
     return {
         "tenders": {
             "total": total_tenders,
-            "active": active_tenders,
-            "submitted": submitted_tenders,
+            "active": tender_status.get("new", 0) + tender_status.get("in_progress", 0),
+            "submitted": tender_status.get("submitted", 0),
             "won": won_tenders,
             "lost": lost_tenders,
             "winRate": round(win_rate, 2),
@@ -63,23 +50,31 @@ async def get_dashboard_metrics(
             "avgValue": round(avg_tender_value, 2)
         },
         "vendors": {
-            "total": total_vendors
+            "total": rollup.get("vendors", {}).get("total", 0)
         },
         "rfqs": {
-            "total": total_rfqs,
-            "open": open_rfqs
+            "total": rollup.get("rfqs", {}).get("total", 0),
+            "open": rfq_status.get("draft", 0) + rfq_status.get("sent", 0)
         },
         "products": {
-            "total": total_products
+            "total": rollup.get("products", {}).get("total", 0)
         },
         "boqs": {
-            "total": total_boqs
+            "total": rollup.get("boqs", {}).get("total", 0)
         },
         "team": {
-            "size": team_size
+            "size": rollup.get("team", {}).get("size", 0)
         }
     }
 
+@router.post("/dashboard/rebuild")
+async def rebuild_dashboard_metrics(
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    rollup = await dashboard_rollups.rebuild(db, current_user.id)
+    return {"message": "Dashboard metrics rebuilt", "rebuiltAt": rollup["rebuiltAt"]}
+
 @router.get("/tender-stats")
 async def get_tender_stats(
     period: str = Query("month", regex="^(week|month|quarter|year)$"),
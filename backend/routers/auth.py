@@ -8,8 +8,16 @@ from typing import Optional
 import os
 import httpx
 from models import User, UserCreate, UserLogin, TokenResponse
+from services.database import get_db
+from services.auth_cache import auth_cache, CACHE_MISS
+from services.index_registry import index_registry
 
 router = APIRouter()
+
+# Indexes
+index_registry.register("users", "email", unique=True)
+index_registry.register("users", "id")
+index_registry.register("user_sessions", "session_token")
 security = HTTPBearer(auto_error=False)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -18,10 +26,6 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 EMERGENT_AUTH_URL = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
 
-def get_db():
-    from server import db
-    return db
-
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -38,6 +42,35 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+async def _load_user(db: AsyncIOMotorDatabase, user_id: str) -> Optional[User]:
+    user_doc = await auth_cache.get_user(user_id)
+    if user_doc is CACHE_MISS:
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "hashedPassword": 0})
+        await auth_cache.set_user(user_id, user_doc)
+    if user_doc is None:
+        return None
+    
+    user_doc = dict(user_doc)
+    if isinstance(user_doc.get('createdAt'), str):
+        user_doc['createdAt'] = datetime.fromisoformat(user_doc['createdAt'])
+    return User(**user_doc)
+
+async def _load_session(db: AsyncIOMotorDatabase, session_token: str) -> Optional[dict]:
+    session = await auth_cache.get_session(session_token)
+    if session is CACHE_MISS:
+        session_doc = await db.user_sessions.find_one(
+            {"session_token": session_token},
+            {"_id": 0, "user_id": 1, "expires_at": 1}
+        )
+        session = None
+        if session_doc and session_doc.get("expires_at"):
+            expires_at = session_doc["expires_at"]
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            session = {"user_id": session_doc["user_id"], "expires_at": expires_at.isoformat()}
+        await auth_cache.set_session(session_token, session)
+    return session
+
 async def get_current_user(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
@@ -46,13 +79,11 @@ async def get_current_user(
     # Try session token from cookie first
     session_token = request.cookies.get("session_token")
     if session_token:
-        session = await db.user_sessions.find_one({"session_token": session_token})
-        if session and session.get("expires_at") > datetime.now(timezone.utc):
-            user_doc = await db.users.find_one({"id": session["user_id"]}, {"_id": 0})
-            if user_doc:
-                if isinstance(user_doc.get('createdAt'), str):
-                    user_doc['createdAt'] = datetime.fromisoformat(user_doc['createdAt'])
-                return User(**user_doc)
+        session = await _load_session(db, session_token)
+        if session and datetime.fromisoformat(session["expires_at"]) > datetime.now(timezone.utc):
+            user = await _load_user(db, session["user_id"])
+            if user:
+                return user
     
     # Fallback to JWT token
     if credentials:
@@ -65,13 +96,10 @@ async def get_current_user(
         except JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
         
-        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if user_doc is None:
+        user = await _load_user(db, user_id)
+        if user is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-        
-        if isinstance(user_doc.get('createdAt'), str):
-            user_doc['createdAt'] = datetime.fromisoformat(user_doc['createdAt'])
-        return User(**user_doc)
+        return user
     
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
@@ -176,6 +204,7 @@ async def process_google_session(
             "created_at": datetime.now(timezone.utc)
         }
         await db.user_sessions.insert_one(session_doc)
+        await auth_cache.invalidate_session(session_token)
         
         # Set httpOnly cookie
         response.set_cookie(
@@ -213,6 +242,7 @@ async def logout(response: Response, request: Request, db: AsyncIOMotorDatabase
     if session_token:
         # Delete session from database
         await db.user_sessions.delete_one({"session_token": session_token})
+        await auth_cache.invalidate_session(session_token)
     
     # Clear cookie
     response.delete_cookie(key="session_token", path="/")
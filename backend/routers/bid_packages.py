@@ -0,0 +1,150 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import FileResponse
+from typing import List, Dict, Any, Optional
+from pydantic import BaseModel
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.bid_packages import bid_package_assembler, InvalidSectionPDF
+from routers.auth import get_current_user, get_db
+from models import User
+import logging
+
+class BidPackageSection(BaseModel):
+    title: str
+    file_path: Optional[str] = None
+    template: Optional[str] = None
+    data: Dict[str, Any] = {}
+
+class BidPackageCreate(BaseModel):
+    name: str
+    tenderId: Optional[str] = None
+    sections: List[BidPackageSection]
+
+class BidPackageSectionsUpdate(BaseModel):
+    sections: List[BidPackageSection]
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/bid-packages", tags=["Bid Packages"])
+
+@router.post("", status_code=201)
+async def create_bid_package(
+    request: BidPackageCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Create a bid package from uploaded PDFs (file_path from /pdf-tools/upload) and
+    generated documents (template: cover_letter, boq or compliance_statement with its data)
+    """
+    try:
+        sections = [section.model_dump() for section in request.sections]
+        return await bid_package_assembler.create_package(db, current_user.id, request.name, sections, request.tenderId)
+    except InvalidSectionPDF as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error creating bid package: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("")
+async def list_bid_packages(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    List the current user's bid packages, most recently edited first
+    """
+    try:
+        return {"packages": await bid_package_assembler.list_packages(db, current_user.id, limit)}
+    except Exception as e:
+        logger.error(f"Error listing bid packages: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{package_id}")
+async def get_bid_package(
+    package_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Package manifest with per-section keys, page ranges and the last build's stats
+    """
+    package = await bid_package_assembler.get_package(db, current_user.id, package_id)
+    if package is None:
+        raise HTTPException(status_code=404, detail="Bid package not found")
+    return package
+
+@router.put("/{package_id}/sections")
+async def update_bid_package_sections(
+    package_id: str,
+    request: BidPackageSectionsUpdate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Replace the section list (add, remove, reorder or swap annexures)
+    """
+    try:
+        sections = [section.model_dump() for section in request.sections]
+        package = await bid_package_assembler.update_sections(db, current_user.id, package_id, sections)
+    except InvalidSectionPDF as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating bid package: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if package is None:
+        raise HTTPException(status_code=404, detail="Bid package not found")
+    return package
+
+@router.post("/{package_id}/build")
+async def build_bid_package(
+    package_id: str,
+    force: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Assemble the bookmarked package PDF; only new or changed sections are processed
+    """
+    try:
+        result = await bid_package_assembler.build(db, current_user.id, package_id, force)
+    except InvalidSectionPDF as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error building bid package: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Bid package not found")
+    return result
+
+@router.get("/{package_id}/download")
+async def download_bid_package(
+    package_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Download the last assembled package PDF
+    """
+    path = await bid_package_assembler.output_file(db, current_user.id, package_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Bid package has not been built")
+    return FileResponse(path, media_type="application/pdf", filename=f"bid_package_{package_id}.pdf")
+
+@router.delete("/{package_id}")
+async def delete_bid_package(
+    package_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Delete a package, its output and any stored sections no other package uses
+    """
+    if not await bid_package_assembler.delete_package(db, current_user.id, package_id):
+        raise HTTPException(status_code=404, detail="Bid package not found")
+    return {"success": True}
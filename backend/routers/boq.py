@@ -1,29 +1,64 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import io
+import math
+import numpy as np
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
+from typing import Optional, List
+from pydantic import TypeAdapter, ValidationError
 import sys
 sys.path.append('/app/backend')
-from models_extended import BOQ, BOQCreate
+from models_extended import BOQ, BOQCreate, BOQLineItem, BOQScenarioRequest
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.dashboard_rollups import dashboard_rollups
+from services.executors import executors
+from services.boq_calculator import boq_calculator, BOQ_DEFAULT_GST_PERCENT, BOQ_MAX_SCENARIOS
+from services.boq_versions import boq_versions, VersionConflict
+from services.product_matcher import product_matcher, PRODUCT_MATCH_TOP_K, PRODUCT_MATCH_MIN_SCORE
+from utils.boq_export import export_boq, EXPORT_FORMATS
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("boqs", "id")
+index_registry.register("boqs", [("tenderId", 1), ("userId", 1), ("version", -1)])
+
+# Fields derived from lineItems; client-sent values are replaced
+CALCULATED_FIELDS = {"lineItems", "totalOurValue", "totalGstValue", "grandTotal", "totalEstimatedValue"}
+# Fields owned by the server that updates may not overwrite
+PROTECTED_FIELDS = {"_id", "id", "userId", "version", "createdAt"}
+
+_line_items_adapter = TypeAdapter(List[BOQLineItem])
+
+def _parse_dates(boq: dict) -> dict:
+    for date_field in ['approvedAt', 'createdAt', 'updatedAt']:
+        if boq.get(date_field) and isinstance(boq[date_field], str):
+            boq[date_field] = datetime.fromisoformat(boq[date_field])
+    return boq
+
 @router.get("/tender/{tender_id}")
 async def get_boqs_by_tender(
     tender_id: str,
+    include_line_items: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    boqs_cursor = db.boqs.find({"tenderId": tender_id, "userId": current_user.id}, {"_id": 0}).sort("version", -1)
-    boqs = await boqs_cursor.to_list(length=100)
-    
-    for boq in boqs:
-        for date_field in ['approvedAt', 'createdAt', 'updatedAt']:
-            if boq.get(date_field) and isinstance(boq[date_field], str):
-                boq[date_field] = datetime.fromisoformat(boq[date_field])
-    
-    return {"data": boqs}
+    """
+    BOQs of a tender, newest version first. Line items are replaced by
+    lineItemCount unless include_line_items is set; fetch /boq/{id} for one BOQ's lines.
+    """
+    pipeline = [
+        {"$match": {"tenderId": tender_id, "userId": current_user.id}},
+        {"$sort": {"version": -1}},
+        {"$limit": 100},
+        {"$addFields": {"lineItemCount": {"$size": {"$ifNull": ["$lineItems", []]}}}},
+        {"$project": {"_id": 0} if include_line_items else {"_id": 0, "lineItems": 0}}
+    ]
+    boqs = await db.boqs.aggregate(pipeline).to_list(length=100)
+    return {"data": [_parse_dates(boq) for boq in boqs]}
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_boq(
@@ -31,7 +66,8 @@ async def create_boq(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    boq = BOQ(**boq_data.model_dump(), userId=current_user.id)
+    # Line amounts and totals are computed here rather than trusted from the client
+    boq = BOQ(**boq_calculator.apply_totals(boq_data.model_dump()), userId=current_user.id)
     boq_dict = boq.model_dump()
     
     for date_field in ['approvedAt', 'createdAt', 'updatedAt']:
@@ -39,6 +75,9 @@ async def create_boq(
             boq_dict[date_field] = boq_dict[date_field].isoformat()
     
     await db.boqs.insert_one(boq_dict)
+    boq_dict.pop("_id", None)
+    await boq_versions.record_snapshot(db, boq_dict)
+    await dashboard_rollups.record_change(db, "boqs", current_user.id, None, boq_dict)
     return boq
 
 @router.get("/{boq_id}")
@@ -51,11 +90,136 @@ async def get_boq(
     if not boq_doc:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
     
-    for date_field in ['approvedAt', 'createdAt', 'updatedAt']:
-        if boq_doc.get(date_field) and isinstance(boq_doc[date_field], str):
-            boq_doc[date_field] = datetime.fromisoformat(boq_doc[date_field])
+    return BOQ(**_parse_dates(boq_doc))
+
+@router.get("/{boq_id}/versions")
+async def list_boq_versions(
+    boq_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Recorded versions of a BOQ with what each edit changed, newest first"""
+    boq_doc = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0, "version": 1})
+    if not boq_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
+    versions = await boq_versions.list_versions(db, current_user.id, boq_id)
+    return {"current_version": boq_doc.get("version", 1), "data": versions}
+
+@router.get("/{boq_id}/versions/{version}")
+async def get_boq_version(
+    boq_id: str,
+    version: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """A past version of a BOQ, rebuilt from its snapshot and deltas"""
+    boq_doc = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0})
+    if not boq_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
+    try:
+        return BOQ(**_parse_dates(await boq_versions.get_version(db, current_user.id, boq_id, version, boq_doc)))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.get("/{boq_id}/diff")
+async def diff_boq_versions(
+    boq_id: str,
+    from_version: int = Query(...),
+    to_version: Optional[int] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Field and line-item changes between two versions; to_version defaults to the current one"""
+    boq_doc = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0})
+    if not boq_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
+    if to_version is None:
+        to_version = boq_doc.get("version", 1)
+    try:
+        return await boq_versions.diff(db, current_user.id, boq_id, from_version, to_version, boq_doc)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.get("/{boq_id}/export")
+async def export_boq_document(
+    boq_id: str,
+    format: str = Query("xlsx"),
+    include_estimates: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Download a BOQ as xlsx, pdf or docx; set include_estimates=false for submission copies"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format '{format}', expected one of {', '.join(EXPORT_FORMATS)}"
+        )
+    boq_doc = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0})
+    if not boq_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
     
-    return BOQ(**boq_doc)
+    tender = await db.tenders.find_one({"id": boq_doc.get("tenderId"), "userId": current_user.id}, {"_id": 0, "tenderNumber": 1})
+    if tender:
+        boq_doc["tenderNumber"] = tender.get("tenderNumber")
+    
+    # Large BOQs take seconds to lay out as PDF, so exports run on the process pool
+    result = await executors.cpu.run(export_boq, boq_doc, format, None, include_estimates)
+    filename = f"boq_{boq_doc.get('boqNumber') or boq_id}".replace("/", "_").replace('"', "")
+    return StreamingResponse(
+        io.BytesIO(result["content"]),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
+
+@router.post("/{boq_id}/scenarios")
+async def evaluate_boq_scenarios(
+    boq_id: str,
+    request: BOQScenarioRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Price the BOQ at every margin x discount combination in one pass"""
+    margins = request.margins
+    if margins is None:
+        if request.marginStop is None or request.marginStep <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide margins, or marginStop with a positive marginStep")
+        # Size the range before building it, so a tiny step cannot allocate an enormous array
+        count = math.ceil((request.marginStop + request.marginStep / 2 - request.marginStart) / request.marginStep)
+        if count * max(len(request.discounts), 1) > BOQ_MAX_SCENARIOS:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {BOQ_MAX_SCENARIOS} scenarios can be evaluated at once")
+        margins = np.arange(request.marginStart, request.marginStop + request.marginStep / 2, request.marginStep).round(4).tolist()
+    
+    boq_doc = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0, "lineItems": 1})
+    if not boq_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
+    
+    gst_percentage = BOQ_DEFAULT_GST_PERCENT if request.gstPercentage is None else request.gstPercentage
+    try:
+        return await executors.cpu.run(
+            boq_calculator.scenarios, boq_doc.get("lineItems") or [], margins, request.discounts, gst_percentage
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/{boq_id}/product-matches")
+async def match_boq_products(
+    boq_id: str,
+    top_k: int = Query(PRODUCT_MATCH_TOP_K),
+    min_score: float = Query(PRODUCT_MATCH_MIN_SCORE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Catalog candidates for every line of a BOQ. Nothing is written; set a
+    chosen productId on the line with PATCH /boq/{id}.
+    """
+    boq_doc = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0, "lineItems": 1})
+    if not boq_doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
+    try:
+        return await product_matcher.match_lines(db, current_user.id, boq_doc.get("lineItems") or [], top_k, min_score)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.patch("/{boq_id}")
 async def update_boq(
@@ -64,19 +228,47 @@ async def update_boq(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    existing = await db.boqs.find_one({"id": boq_id, "userId": current_user.id})
+    existing = await db.boqs.find_one({"id": boq_id, "userId": current_user.id}, {"_id": 0})
     if not existing:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
     
+    updates = {field: value for field, value in updates.items() if field not in PROTECTED_FIELDS}
+    if "lineItems" in updates:
+        try:
+            updates["lineItems"] = _line_items_adapter.dump_python(_line_items_adapter.validate_python(updates["lineItems"] or []))
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in ("lineItems", *error["loc"]))
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {location}: {error['msg']}")
+    if CALCULATED_FIELDS.intersection(updates):
+        merged = boq_calculator.apply_totals({**existing, **updates})
+        for field in CALCULATED_FIELDS | {"marginPercentage"}:
+            if field in merged:
+                updates[field] = merged[field]
+    
     updates["updatedAt"] = datetime.now(timezone.utc).isoformat()
-    await db.boqs.update_one({"id": boq_id}, {"$set": updates})
+    updates["version"] = existing.get("version", 1) + 1
     
-    updated = await db.boqs.find_one({"id": boq_id}, {"_id": 0})
-    for date_field in ['approvedAt', 'createdAt', 'updatedAt']:
-        if updated.get(date_field) and isinstance(updated[date_field], str):
-            updated[date_field] = datetime.fromisoformat(updated[date_field])
+    # The version record is written first; its unique index rejects a concurrent edit of the same version
+    conflict = HTTPException(status_code=status.HTTP_409_CONFLICT, detail="BOQ was modified by another request, reload and retry")
+    try:
+        await boq_versions.record_update(db, existing, {**existing, **updates})
+    except VersionConflict:
+        raise conflict
+    # The head only moves from the version the record was based on; otherwise the record is withdrawn
+    try:
+        result = await db.boqs.update_one(
+            {"id": boq_id, "userId": current_user.id, "version": existing.get("version")},
+            {"$set": updates}
+        )
+    except Exception:
+        await boq_versions.discard_update(db, boq_id, updates["version"])
+        raise
+    if result.matched_count == 0:
+        await boq_versions.discard_update(db, boq_id, updates["version"])
+        raise conflict
     
-    return BOQ(**updated)
+    return BOQ(**_parse_dates({**existing, **updates}))
 
 @router.delete("/{boq_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_boq(
@@ -84,7 +276,9 @@ async def delete_boq(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    result = await db.boqs.delete_one({"id": boq_id, "userId": current_user.id})
-    if result.deleted_count == 0:
+    deleted = await db.boqs.find_one_and_delete({"id": boq_id, "userId": current_user.id}, {"_id": 0, "id": 1})
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="BOQ not found")
+    await boq_versions.delete_history(db, current_user.id, boq_id)
+    await dashboard_rollups.record_change(db, "boqs", current_user.id, deleted, None)
     return None
\ No newline at end of file
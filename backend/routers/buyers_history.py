@@ -2,10 +2,10 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from pydantic import BaseModel
 from services.buyers_history_service import buyers_history_service
-from routers.auth import get_current_user
+from routers.auth import get_current_user, get_db
+from services.executors import executors
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 class BuyersAnalysisRequest(BaseModel):
     keywords: List[str]
@@ -14,10 +14,6 @@ class BuyersAnalysisRequest(BaseModel):
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/buyers", tags=["Buyers History"])
 
-# MongoDB connection
-client = AsyncIOMotorClient(os.getenv('MONGO_URL'))
-db = client[os.getenv('DB_NAME', 'test_database')]
-
 @router.post("/analyze")
 async def analyze_buyers(
     request: BuyersAnalysisRequest,
@@ -27,19 +23,22 @@ async def analyze_buyers(
     Analyze buyer organizations based on keywords
     """
     try:
-        analysis = buyers_history_service.analyze_buyers_for_keywords(request.keywords, request.days)
+        analysis = await executors.io.run(buyers_history_service.analyze_buyers_for_keywords, request.keywords, request.days)
         
         return {
             "success": True,
             "analysis": analysis
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing buyers: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/recommendations")
 async def get_buyer_recommendations(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get buyer recommendations based on user's company profile
@@ -60,13 +59,15 @@ async def get_buyer_recommendations(
             'categories': company.get('productCategories', [])
         }
         
-        recommendations = buyers_history_service.get_buyer_recommendations(company_profile)
+        recommendations = await executors.io.run(buyers_history_service.get_buyer_recommendations, company_profile)
         
         return {
             "success": True,
             "total_recommendations": len(recommendations),
             "recommendations": recommendations
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting buyer recommendations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -74,7 +75,8 @@ async def get_buyer_recommendations(
 @router.get("/insights")
 async def get_buyers_insights(
     keywords: List[str] = None,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get insights about buyer market
@@ -88,12 +90,14 @@ async def get_buyers_insights(
             else:
                 keywords = ['IT', 'Hardware']
         
-        analysis = buyers_history_service.analyze_buyers_for_keywords(keywords)
+        analysis = await executors.io.run(buyers_history_service.analyze_buyers_for_keywords, keywords)
         
         return {
             "success": True,
             "insights": analysis['insights']
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting insights: {e}")
         raise HTTPException(status_code=500, detail=str(e))
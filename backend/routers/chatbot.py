@@ -6,6 +6,7 @@ from emergentintegrations.llm.chat import LlmChat, UserMessage
 import os
 import uuid
 from dotenv import load_dotenv
+from services.database import get_db
 
 load_dotenv()
 
@@ -15,10 +16,6 @@ class ChatMessage(BaseModel):
     message: str
     sessionId: str
 
-def get_db():
-    from server import db
-    return db
-
 # Marketing chatbot system message
 MARKETING_SYSTEM_MESSAGE = """You are HexaBid's AI Marketing Assistant. You help potential customers understand HexaBid's features and benefits.
 
@@ -5,9 +5,16 @@ from datetime import datetime, timezone
 import uuid
 from models import CompanyProfile, CompanyProfileCreate, CompanyProfileUpdate, TeamMember, TeamMemberInvite, User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.auth_cache import auth_cache
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("companies", "userId")
+index_registry.register("team_members", [("companyId", 1), ("invitedAt", -1)])
+index_registry.register("team_members", "id")
+
 @router.get("/profile", response_model=CompanyProfile)
 async def get_company_profile(
     current_user: User = Depends(get_current_user),
@@ -48,6 +55,7 @@ async def create_company_profile(
         {"id": current_user.id},
         {"$set": {"hasCompletedProfile": True}}
     )
+    await auth_cache.invalidate_user(current_user.id)
     
     return profile
 
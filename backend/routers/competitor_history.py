@@ -2,10 +2,11 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from pydantic import BaseModel
 from services.competitor_history_service import competitor_history_service
-from routers.auth import get_current_user
+from routers.auth import get_current_user, get_db
+from services.executors import executors
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.index_registry import index_registry
 
 class CompetitorComparisonRequest(BaseModel):
     competitor_names: List[str]
@@ -13,23 +14,21 @@ class CompetitorComparisonRequest(BaseModel):
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/competitor-history", tags=["Competitor History"])
 
-# MongoDB connection
-client = AsyncIOMotorClient(os.getenv('MONGO_URL'))
-db = client[os.getenv('DB_NAME', 'test_database')]
+# Indexes
+index_registry.register("competitor_history", "competitor_name")
 
 @router.get("/fetch/{competitor_name}")
 async def fetch_competitor_history(
     competitor_name: str,
     days: int = 180,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Fetch competitor bidding history from GeM portal
     """
     try:
-        history = competitor_history_service.fetch_competitor_history_from_gem(
-            competitor_name, days
-        )
+        history = await executors.io.run(competitor_history_service.fetch_competitor_history_from_gem, competitor_name, days)
         
         # Save to database
         await db.competitor_history.update_one(
@@ -42,6 +41,8 @@ async def fetch_competitor_history(
             "success": True,
             "history": history
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching competitor history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -49,7 +50,8 @@ async def fetch_competitor_history(
 @router.post("/compare")
 async def compare_with_competitors(
     request: CompetitorComparisonRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Compare our performance with competitors
@@ -75,14 +77,14 @@ async def compare_with_competitors(
             'avg_bid_value': our_stats[0]['avg_bid_value'] if our_stats else 0
         }
         
-        comparison = competitor_history_service.compare_with_competitors(
-            our_data, request.competitor_names
-        )
+        comparison = await executors.io.run(competitor_history_service.compare_with_competitors, our_data, request.competitor_names)
         
         return {
             "success": True,
             "comparison": comparison
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error comparing competitors: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -90,7 +92,8 @@ async def compare_with_competitors(
 @router.get("/trends/{competitor_name}")
 async def get_competitor_trends(
     competitor_name: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get trending patterns for a competitor
@@ -101,7 +104,7 @@ async def get_competitor_trends(
         
         if not history:
             # Fetch fresh data
-            history = competitor_history_service.fetch_competitor_history_from_gem(competitor_name)
+            history = await executors.io.run(competitor_history_service.fetch_competitor_history_from_gem, competitor_name)
         
         return {
             "success": True,
@@ -114,6 +117,8 @@ async def get_competitor_trends(
                 "active_categories": history.get('statistics', {}).get('active_categories', [])
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting trends: {e}")
         raise HTTPException(status_code=500, detail=str(e))
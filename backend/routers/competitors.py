@@ -2,30 +2,37 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Dict, Any, Optional
 from models_gem import CompetitorProfile
 from services.gem_scraper import gem_scraper
-from routers.auth import get_current_user
+from routers.auth import get_current_user, get_db
+from services.executors import executors
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.index_registry import index_registry
+from services.pagination import paginate
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/competitors", tags=["Competitor Analysis"])
 
-# MongoDB connection
-client = AsyncIOMotorClient(os.getenv('MONGO_URL'))
-db = client[os.getenv('DB_NAME', 'test_database')]
+# Indexes
+index_registry.register("competitors", "company_name")
+index_registry.register("competitors", "competitor_id")
+index_registry.register("competitors", [("win_rate", -1), ("_id", -1)])
+index_registry.register("competitors", [("total_bids", -1), ("_id", -1)])
+index_registry.register("competitors", [("won_bids", -1), ("_id", -1)])
+index_registry.register("competitors", [("avg_bid_amount", 1), ("_id", 1)])
 
 @router.get("/analysis")
 async def get_competitor_analysis(
     category: Optional[str] = None,
     days: int = 90,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get competitor analysis data
     """
     try:
         # Fetch competitor data from GEM
-        competitor_data = gem_scraper.get_competitor_bids(category, days)
+        competitor_data = await executors.io.run(gem_scraper.get_competitor_bids, category, days)
         
         # Save/update in database
         for competitor in competitor_data:
@@ -40,6 +47,8 @@ async def get_competitor_analysis(
             "total_competitors": len(competitor_data),
             "competitors": competitor_data
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching competitor analysis: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -49,29 +58,34 @@ async def list_competitors(
     page: int = 1,
     limit: int = 20,
     sort_by: str = "win_rate",
-    current_user: dict = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     List all tracked competitors
     """
     try:
-        skip = (page - 1) * limit
-        
         # Sort options
         sort_order = -1 if sort_by in ['win_rate', 'total_bids', 'won_bids'] else 1
         
-        cursor = db.competitors.find().sort(sort_by, sort_order).skip(skip).limit(limit)
-        competitors = await cursor.to_list(length=limit)
-        
-        total = await db.competitors.count_documents({})
+        result = await paginate(db.competitors, {}, [(sort_by, sort_order)], limit, cursor, page, {"_id": 0}, include_total)
         
         return {
             "success": True,
-            "total": total,
+            "total": result["total"],
+            "total_is_estimate": result["total_is_estimate"],
             "page": page,
             "limit": limit,
-            "competitors": competitors
+            "next_cursor": result["next_cursor"],
+            "has_more": result["has_more"],
+            "competitors": result["items"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing competitors: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -79,7 +93,8 @@ async def list_competitors(
 @router.get("/{competitor_id}/profile")
 async def get_competitor_profile(
     competitor_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get detailed profile of a competitor
@@ -103,7 +118,8 @@ async def get_competitor_profile(
 @router.get("/compare/{tender_id}")
 async def compare_competitors_for_tender(
     tender_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Compare competitors who bid on a specific tender
@@ -143,13 +159,16 @@ async def compare_competitors_for_tender(
             "total_bidders": len(comparison),
             "comparison": comparison
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error comparing competitors: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/dashboard/insights")
 async def get_competitor_insights(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get key insights about competitors
@@ -189,6 +208,8 @@ async def get_competitor_insights(
                 "most_active": active_competitors
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching competitor insights: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List
 from services.cpp_portal_scraper import cpp_scraper
 from routers.auth import get_current_user
+from services.executors import executors
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,7 @@ async def search_cpp_tenders(
     Search for tenders on CPP Portal
     """
     try:
-        tenders = cpp_scraper.search_tenders(keywords, category, max_results)
+        tenders = await executors.io.run(cpp_scraper.search_tenders, keywords, category, max_results)
         
         return {
             "success": True,
@@ -26,6 +27,8 @@ async def search_cpp_tenders(
             "total": len(tenders),
             "tenders": tenders
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching CPP tenders: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -39,7 +42,7 @@ async def get_ministry_tenders(
     Get all active tenders from a specific ministry
     """
     try:
-        tenders = cpp_scraper.get_ministry_tenders(ministry_name)
+        tenders = await executors.io.run(cpp_scraper.get_ministry_tenders, ministry_name)
         
         return {
             "success": True,
@@ -47,6 +50,8 @@ async def get_ministry_tenders(
             "total": len(tenders),
             "tenders": tenders
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching ministry tenders: {e}")
         raise HTTPException(status_code=500, detail=str(e))
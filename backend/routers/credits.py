@@ -6,9 +6,14 @@ sys.path.append('/app/backend')
 from models_ai import CreditBalance, CreditTransaction
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("credit_balances", "userId")
+index_registry.register("credit_transactions", [("userId", 1), ("createdAt", -1)])
+
 @router.get("/balance")
 async def get_balance(
     current_user: User = Depends(get_current_user),
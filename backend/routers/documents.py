@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import List, Dict, Any
+from pydantic import BaseModel
+from services.document_generation import document_generator, MEDIA_TYPES
+from routers.auth import get_current_user
+from models import User
+import logging
+
+class DocumentRenderRequest(BaseModel):
+    template: str
+    format: str = "docx"
+    context: Dict[str, Any]
+
+class DocumentBatchRequest(BaseModel):
+    template: str
+    format: str = "docx"
+    contexts: List[Dict[str, Any]]
+    in_memory: bool = False
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/documents", tags=["Documents"])
+
+def _download(result: Dict[str, Any]) -> StreamingResponse:
+    return StreamingResponse(
+        result["buffer"],
+        media_type=result["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{result["file_name"]}"'}
+    )
+
+@router.get("/templates")
+async def list_document_templates(current_user: User = Depends(get_current_user)):
+    """
+    Available templates with the fields and table rows each one reads
+    """
+    return {"templates": document_generator.templates()}
+
+@router.post("/render")
+async def render_document(
+    request: DocumentRenderRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Render one document and stream it back without writing it to disk
+    """
+    try:
+        return _download(await document_generator.render(request.template, request.format, request.context))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering document: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/batch")
+async def render_document_batch(
+    request: DocumentBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Render one document per context. Files are written to the user's document area
+    (download them via /documents/batches/{batch_id}/{file_name}); with in_memory
+    the whole batch is streamed back as a zip instead.
+    """
+    try:
+        result = await document_generator.render_batch(
+            current_user.id, request.template, request.format, request.contexts, request.in_memory
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering document batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return _download(result) if request.in_memory else result
+
+@router.get("/batches/{batch_id}/{file_name}")
+async def download_batch_document(
+    batch_id: str,
+    file_name: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download one document of a rendered batch
+    """
+    try:
+        path = document_generator.batch_file(current_user.id, batch_id, file_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return FileResponse(path, media_type=MEDIA_TYPES.get(file_name.rsplit(".", 1)[-1], "application/octet-stream"), filename=file_name)
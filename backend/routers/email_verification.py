@@ -4,9 +4,14 @@ from datetime import datetime, timedelta, timezone
 import uuid
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.auth_cache import auth_cache
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("email_verification_tokens", "token")
+
 @router.post("/send-verification")
 async def send_verification_email(
     current_user: User = Depends(get_current_user),
@@ -61,6 +66,7 @@ async def verify_email(
         {"id": token_doc["userId"]},
         {"$set": {"emailVerified": True}}
     )
+    await auth_cache.invalidate_user(token_doc["userId"])
     
     # Delete token
     await db.email_verification_tokens.delete_one({"token": token})
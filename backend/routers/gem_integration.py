@@ -1,18 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
 from models_gem import BidSubmission, BidResult
 from services.gem_scraper import gem_scraper
-from routers.auth import get_current_user
+from services.gem_crawler import gem_crawler
+from routers.auth import get_current_user, get_db
+from services.executors import executors
 import logging
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.index_registry import index_registry
+from services.pagination import paginate
+from services.data_export import data_exporter, EXPORT_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/gem", tags=["GEM Integration"])
 
-# MongoDB connection
-client = AsyncIOMotorClient(os.getenv('MONGO_URL'))
-db = client[os.getenv('DB_NAME', 'test_database')]
+# Indexes
+index_registry.register("bid_submissions", [("user_id", 1), ("_id", -1)])
+index_registry.register("bid_submissions", [("user_id", 1), ("status", 1), ("_id", -1)])
+index_registry.register("bid_submissions", [("user_id", 1), ("result_status", 1)])
+index_registry.register("bid_submissions", "bid_id")
+index_registry.register("bid_submissions", "tender_id")
+index_registry.register("bid_results", "tender_number")
 
 @router.get("/tenders/search")
 async def search_gem_tenders(
@@ -25,17 +34,52 @@ async def search_gem_tenders(
     Search for tenders on GeM portal
     """
     try:
-        tenders = gem_scraper.search_tenders(keywords, category, max_results)
+        tenders = await gem_crawler.search_tenders(keywords, category, max_results)
         
         return {
             "success": True,
             "total": len(tenders),
             "tenders": tenders
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching tenders: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/tenders/sync")
+async def sync_gem_tenders(
+    keywords: str,
+    max_results: int = 200,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Crawl GeM for a keyword search and upsert the results into my tenders
+    """
+    try:
+        result = await gem_crawler.sync_tenders(db, current_user.id, keywords, max_results)
+        
+        return {
+            "success": True,
+            **result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error syncing GeM tenders: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/crawler/stats")
+async def get_crawler_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Request, retry and conditional-fetch counters for the GeM crawler
+    """
+    return {
+        "success": True,
+        "stats": gem_crawler.get_stats()
+    }
+
 @router.get("/tenders/{tender_number}/details")
 async def get_tender_details(
     tender_number: str,
@@ -45,7 +89,7 @@ async def get_tender_details(
     Get detailed information about a tender
     """
     try:
-        details = gem_scraper.get_tender_details(tender_number)
+        details = await executors.io.run(gem_scraper.get_tender_details, tender_number)
         
         if not details:
             raise HTTPException(status_code=404, detail="Tender not found")
@@ -63,7 +107,8 @@ async def get_tender_details(
 @router.post("/bids/submit")
 async def submit_bid(
     bid: BidSubmission,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Submit a bid for a tender
@@ -84,47 +129,82 @@ async def submit_bid(
             "message": "Bid submitted successfully",
             "bid_id": bid.bid_id
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error submitting bid: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _bid_query(user_id: str, status: Optional[str]) -> Dict[str, Any]:
+    """Filters shared by the bid list and export"""
+    query = {"user_id": user_id}
+    if status:
+        query["status"] = status
+    return query
+
 @router.get("/bids/my-bids")
 async def get_my_bids(
     status: str = None,
     page: int = 1,
     limit: int = 20,
-    current_user: dict = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
-    Get all bids submitted by current user
+    Get all bids submitted by current user, newest first
     """
     try:
-        query = {"user_id": current_user.id}
-        if status:
-            query["status"] = status
-        
-        skip = (page - 1) * limit
+        query = _bid_query(current_user.id, status)
         
-        bids_cursor = db.bid_submissions.find(query).skip(skip).limit(limit)
-        bids = await bids_cursor.to_list(length=limit)
-        
-        total = await db.bid_submissions.count_documents(query)
+        result = await paginate(db.bid_submissions, query, [("_id", -1)], limit, cursor, page, {"_id": 0}, include_total)
         
         return {
             "success": True,
-            "total": total,
+            "total": result["total"],
             "page": page,
             "limit": limit,
-            "bids": bids
+            "next_cursor": result["next_cursor"],
+            "has_more": result["has_more"],
+            "bids": result["items"]
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching bids: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/bids/export")
+async def export_my_bids(
+    format: str = Query("csv"),
+    status: str = None,
+    fields: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE),
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Stream all of the user's bids matching the my-bids filters as csv,
+    xlsx, ndjson or parquet; fields is an optional comma-separated column list
+    """
+    try:
+        plan = data_exporter.prepare("bids", format, fields, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        data_exporter.stream(db, plan, _bid_query(current_user.id, status)),
+        media_type=plan["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{plan["file_name"]}"'}
+    )
+
 @router.get("/bids/{bid_id}/status")
 async def track_bid_status(
     bid_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Track the status of a submitted bid
@@ -137,7 +217,7 @@ async def track_bid_status(
             raise HTTPException(status_code=404, detail="Bid not found")
         
         # Get live status from GEM
-        status = gem_scraper.track_bid_status(bid_id)
+        status = await executors.io.run(gem_scraper.track_bid_status, bid_id)
         
         # Update database
         await db.bid_submissions.update_one(
@@ -163,13 +243,14 @@ async def track_bid_status(
 @router.get("/results/{tender_number}")
 async def get_bid_results(
     tender_number: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get results for a tender
     """
     try:
-        results = gem_scraper.get_bid_results(tender_number)
+        results = await executors.io.run(gem_scraper.get_bid_results, tender_number)
         
         if not results:
             raise HTTPException(status_code=404, detail="Results not available")
@@ -193,7 +274,8 @@ async def get_bid_results(
 
 @router.get("/dashboard/stats")
 async def get_bid_dashboard_stats(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """
     Get dashboard statistics for bids
@@ -232,6 +314,8 @@ async def get_bid_dashboard_stats(
                 "status_breakdown": status_counts
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
-from services.pdf_tools_service import pdf_tools_service
-from routers.auth import get_current_user
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.pdf_tools_service import pdf_tools_service, UploadTooLarge, DocumentNotFound
+from services.pdf_jobs import pdf_jobs, ACTIVE_STATUSES
+from services.pdf_rendering import pdf_renderer, PDF_RENDER_DPI, RENDER_FORMATS
+from utils.ocr_service import ocr_service, OCR_DPI
+from routers.auth import get_current_user, get_db
+from models import User
+import asyncio
 import logging
 import os
+import json
+import time
 
 class PDFMergeRequest(BaseModel):
     file_paths: List[str]
@@ -32,35 +41,62 @@ class PDFProtectRequest(BaseModel):
 
 class PDFExtractTextRequest(BaseModel):
     file_path: str
+    mode: str = "hybrid"
+
+class PDFOCRRequest(BaseModel):
+    file_path: str
+    first_page: int = 1
+    last_page: Optional[int] = None
+    dpi: int = OCR_DPI
+    lang: str = "eng"
+    psm: Optional[int] = None
+    mode: str = "ocr"
+
+class PDFJobRequest(BaseModel):
+    operation: str
+    params: Dict[str, Any]
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/pdf-tools", tags=["PDF Tools"])
 
+def _owned_path(file_path: str, owner_id: str) -> str:
+    """Resolve a request's file path within the user's own directory"""
+    try:
+        return pdf_tools_service.resolve_owned_path(file_path, owner_id)
+    except DocumentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/upload")
 async def upload_pdf(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Upload PDF file for processing
+    Upload PDF file for processing. The file is streamed to a content-addressed
+    path in the user's upload directory; the original filename is only echoed back.
     """
     try:
-        # Save uploaded file
-        file_path = os.path.join(pdf_tools_service.UPLOAD_DIR, file.filename)
-        
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        stored = await pdf_tools_service.save_upload(file.file, current_user.id, file.size)
         
         # Get PDF info
-        info = await pdf_tools_service.get_pdf_info(file_path)
+        info = await pdf_tools_service.get_pdf_info(stored["file_path"])
         
         return {
             "success": True,
             "filename": file.filename,
-            "file_path": file_path,
+            "file_path": stored["file_path"],
+            "sha256": stored["sha256"],
+            "size": stored["size"],
             "info": info.get('info', {})
         }
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -68,14 +104,17 @@ async def upload_pdf(
 @router.post("/merge")
 async def merge_pdfs(
     request: PDFMergeRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Merge multiple PDF files
     """
+    file_paths = [_owned_path(path, current_user.id) for path in request.file_paths]
     try:
-        result = await pdf_tools_service.merge_pdfs(request.file_paths)
+        result = await pdf_tools_service.merge_pdfs(file_paths, pdf_tools_service.output_dir(current_user.id))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error merging PDFs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -83,14 +122,17 @@ async def merge_pdfs(
 @router.post("/split")
 async def split_pdf(
     request: PDFSplitRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Split PDF into multiple files
     """
+    file_path = _owned_path(request.file_path, current_user.id)
     try:
-        result = await pdf_tools_service.split_pdf(request.file_path, request.page_ranges)
+        result = await pdf_tools_service.split_pdf(file_path, request.page_ranges, pdf_tools_service.output_dir(current_user.id))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error splitting PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -98,14 +140,19 @@ async def split_pdf(
 @router.post("/compress")
 async def compress_pdf(
     request: PDFCompressRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Compress PDF file
     """
+    file_path = _owned_path(request.file_path, current_user.id)
     try:
-        result = await pdf_tools_service.compress_pdf(request.file_path, request.quality)
+        result = await pdf_tools_service.compress_pdf(file_path, request.quality, pdf_tools_service.output_dir(current_user.id))
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error compressing PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -113,14 +160,17 @@ async def compress_pdf(
 @router.post("/rotate")
 async def rotate_pdf(
     request: PDFRotateRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Rotate PDF pages
     """
+    file_path = _owned_path(request.file_path, current_user.id)
     try:
-        result = await pdf_tools_service.rotate_pdf(request.file_path, request.angle, request.pages)
+        result = await pdf_tools_service.rotate_pdf(file_path, request.angle, request.pages, pdf_tools_service.output_dir(current_user.id))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error rotating PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -128,14 +178,17 @@ async def rotate_pdf(
 @router.post("/watermark")
 async def add_watermark(
     request: PDFWatermarkRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Add watermark to PDF
     """
+    file_path = _owned_path(request.file_path, current_user.id)
     try:
-        result = await pdf_tools_service.add_watermark(request.file_path, request.watermark_text)
+        result = await pdf_tools_service.add_watermark(file_path, request.watermark_text, pdf_tools_service.output_dir(current_user.id))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding watermark: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -143,14 +196,17 @@ async def add_watermark(
 @router.post("/protect")
 async def protect_pdf(
     request: PDFProtectRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Password protect PDF
     """
+    file_path = _owned_path(request.file_path, current_user.id)
     try:
-        result = await pdf_tools_service.protect_pdf(request.file_path, request.password)
+        result = await pdf_tools_service.protect_pdf(file_path, request.password, pdf_tools_service.output_dir(current_user.id))
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error protecting PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -158,44 +214,247 @@ async def protect_pdf(
 @router.post("/extract-text")
 async def extract_text(
     request: PDFExtractTextRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Extract text from PDF
+    Extract text from PDF. mode: "hybrid" (text layer first, OCR for pages
+    without usable text), "text" (text layer only) or "ocr" (every page)
     """
+    file_path = _owned_path(request.file_path, current_user.id)
     try:
-        result = await pdf_tools_service.extract_text(request.file_path)
+        result = await pdf_tools_service.extract_text(file_path, request.mode)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error extracting text: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ocr")
+async def ocr_pdf(
+    request: PDFOCRRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    OCR a scanned PDF, streaming one NDJSON line per page as soon as it is ready,
+    followed by a summary line. mode "hybrid" skips OCR for pages with a usable text layer.
+    """
+    file_path = _owned_path(request.file_path, current_user.id)
+    if request.mode not in ("ocr", "hybrid"):
+        raise HTTPException(status_code=400, detail=f"Unsupported OCR mode '{request.mode}'")
+    
+    async def ndjson_pages():
+        started = time.monotonic()
+        pages = 0
+        methods: Dict[str, int] = {}
+        try:
+            async for page in ocr_service.stream_pdf_pages(
+                file_path, request.first_page, request.last_page, request.dpi, request.lang, request.psm, request.mode
+            ):
+                pages += 1
+                methods[page["method"]] = methods.get(page["method"], 0) + 1
+                yield json.dumps(page) + "\n"
+            yield json.dumps({
+                "done": True,
+                "pages": pages,
+                "methods": methods,
+                "duration_ms": round((time.monotonic() - started) * 1000)
+            }) + "\n"
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band
+            logger.error(f"Error running OCR: {e}")
+            yield json.dumps({"done": False, "pages": pages, "error": str(e)}) + "\n"
+    
+    return StreamingResponse(ndjson_pages(), media_type="application/x-ndjson")
+
 @router.post("/to-images")
 async def pdf_to_images(
     file_path: str,
-    current_user: dict = Depends(get_current_user)
+    dpi: int = PDF_RENDER_DPI,
+    fmt: str = "png",
+    thumbnail: bool = False,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    as_zip: bool = False,
+    current_user: User = Depends(get_current_user)
 ):
     """
-    Convert PDF to images
+    Convert PDF to images. Returns per-page URLs, or with as_zip streams the
+    rendered pages as a zip archive while they are produced.
     """
     try:
-        result = await pdf_tools_service.pdf_to_images(file_path)
-        return result
+        if not as_zip:
+            result = await pdf_tools_service.pdf_to_images(file_path, current_user.id, dpi, fmt, thumbnail, first_page, last_page)
+            for page in result.get("pages", []):
+                page["url"] = _page_url(result["sha256"], page["page"], dpi, fmt, thumbnail)
+            return result
+        
+        pdf_renderer.variant(dpi, fmt, thumbnail)
+        document = await pdf_tools_service.ensure_upload(file_path, current_user.id)
+        pages = pdf_renderer.render_pages(document["file_path"], first_page, last_page, dpi, fmt, thumbnail, document["sha256"])
+        return StreamingResponse(
+            pdf_renderer.stream_zip(pages),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{document["sha256"][:12]}-pages.zip"'}
+        )
+    except DocumentNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error converting PDF: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _page_url(sha256: str, page: int, dpi: int, fmt: str, thumbnail: bool) -> str:
+    if thumbnail:
+        return f"/api/pdf-tools/documents/{sha256}/thumbnails/{page}?fmt={fmt}"
+    return f"/api/pdf-tools/documents/{sha256}/pages/{page}?dpi={dpi}&fmt={fmt}"
+
+async def _serve_page(owner_id: str, sha256: str, page: int, dpi: int, fmt: str, thumbnail: bool) -> FileResponse:
+    try:
+        pdf_path = pdf_tools_service.upload_path(owner_id, sha256)
+        pdf_renderer.variant(dpi, fmt, thumbnail)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not os.path.isfile(pdf_path):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    path = await pdf_renderer.page_image(pdf_path, page, dpi, fmt, thumbnail, sha256) if page >= 1 else None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    # Documents are content-addressed, so a page image never changes
+    return FileResponse(path, media_type=RENDER_FORMATS[fmt][2], headers={"Cache-Control": "private, max-age=604800, immutable"})
+
+@router.get("/documents/{sha256}/pages/{page}")
+async def get_page_image(
+    sha256: str,
+    page: int,
+    dpi: int = PDF_RENDER_DPI,
+    fmt: str = "png",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    One rendered page of an uploaded document, served from the render cache
+    """
+    return await _serve_page(current_user.id, sha256, page, dpi, fmt, False)
+
+@router.get("/documents/{sha256}/thumbnails/{page}")
+async def get_page_thumbnail(
+    sha256: str,
+    page: int,
+    fmt: str = "jpeg",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Preview-size thumbnail of one page, cached per document hash
+    """
+    return await _serve_page(current_user.id, sha256, page, PDF_RENDER_DPI, fmt, True)
+
 @router.get("/info")
 async def get_pdf_info(
     file_path: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Get PDF metadata and information
     """
+    file_path = _owned_path(file_path, current_user.id)
     try:
         result = await pdf_tools_service.get_pdf_info(file_path)
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting PDF info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/jobs", status_code=202)
+async def submit_pdf_job(
+    request: PDFJobRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Queue a merge / split / compress / rotate job. params are the same fields as the
+    matching synchronous endpoint; file paths must come from this user's uploads or earlier jobs.
+    """
+    try:
+        return await pdf_jobs.submit(db, current_user.id, request.operation, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting PDF job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs")
+async def list_pdf_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    List the current user's recent PDF jobs
+    """
+    try:
+        return {"jobs": await pdf_jobs.list_jobs(db, current_user.id, limit)}
+    except Exception as e:
+        logger.error(f"Error listing PDF jobs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_pdf_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Poll a PDF job's status, page progress and result
+    """
+    job = await pdf_jobs.get_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def pdf_job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Server-sent events for a PDF job: one event per status or progress change,
+    ending with the completed or failed job
+    """
+    job = await pdf_jobs.get_job(db, current_user.id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last = None
+        idle = 0.0
+        current = job
+        while True:
+            snapshot = (current["status"], current["progress"]["done"], current["progress"]["total"])
+            if snapshot != last:
+                last = snapshot
+                idle = 0.0
+                yield f"event: {current['status']}\ndata: {json.dumps(current)}\n\n"
+            elif idle >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            if current["status"] not in ACTIVE_STATUSES:
+                return
+            await asyncio.sleep(1)
+            idle += 1
+            current = await pdf_jobs.get_job(db, current_user.id, job_id)
+            if current is None:
+                return
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,25 +1,40 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
 from typing import Optional
 import sys
 sys.path.append('/app/backend')
-from models_extended import Product, ProductCreate, ProductCategory
+from models_extended import Product, ProductCreate, ProductCategory, ProductMatchRequest
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.pagination import paginate, page_meta
+from services.dashboard_rollups import dashboard_rollups
+from services.typeahead_index import typeahead_index
+from services.product_matcher import product_matcher
+from services.bulk_import import bulk_importer
+from services.pdf_tools_service import UploadTooLarge
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("products", "id")
+index_registry.register("products", [("userId", 1), ("productCode", 1)], unique=True)
+index_registry.register("products", [("userId", 1), ("isActive", 1), ("productName", 1), ("_id", 1)])
+index_registry.register("products", [("userId", 1), ("isActive", 1), ("category", 1), ("productName", 1), ("_id", 1)])
+
 @router.get("/")
 async def get_products(
     page: int = Query(1, ge=1),
     limit: int = Query(50, ge=1, le=200),
     category: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    skip = (page - 1) * limit
     query = {"userId": current_user.id, "isActive": True}
     
     if category:
@@ -31,9 +46,11 @@ async def get_products(
             {"brand": {"$regex": search, "$options": "i"}}
         ]
     
-    total = await db.products.count_documents(query)
-    products_cursor = db.products.find(query, {"_id": 0}).skip(skip).limit(limit).sort("productName", 1)
-    products = await products_cursor.to_list(length=limit)
+    try:
+        result = await paginate(db.products, query, [("productName", 1)], limit, cursor, page, {"_id": 0}, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    products = result["items"]
     
     for product in products:
         for date_field in ['createdAt', 'updatedAt']:
@@ -42,7 +59,7 @@ async def get_products(
     
     return {
         "data": products,
-        "pagination": {"page": page, "limit": limit, "total": total, "totalPages": (total + limit - 1) // limit}
+        "pagination": page_meta(result, page, limit)
     }
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -51,11 +68,6 @@ async def create_product(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    # Check if product code already exists
-    existing = await db.products.find_one({"productCode": product_data.productCode, "userId": current_user.id})
-    if existing:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product code already exists")
-    
     product = Product(**product_data.model_dump(), userId=current_user.id)
     product_dict = product.model_dump()
     
@@ -63,9 +75,47 @@ async def create_product(
         if product_dict.get(date_field):
             product_dict[date_field] = product_dict[date_field].isoformat()
     
-    await db.products.insert_one(product_dict)
+    # Duplicate codes are rejected by the unique (userId, productCode) index
+    try:
+        await db.products.insert_one(product_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product code already exists")
+    typeahead_index.on_change(current_user.id, "products", None, product.productName)
+    product_matcher.invalidate(current_user.id)
+    await dashboard_rollups.record_change(db, "products", current_user.id, None, product_dict)
     return product
 
+@router.post("/match")
+async def match_products(
+    request: ProductMatchRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Top catalog candidates, with scores, for each line's description and specification"""
+    try:
+        return await product_matcher.match_lines(db, current_user.id, request.lineItems, request.topK, request.minScore)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.post("/import")
+async def import_products(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None),
+    on_duplicate: str = Query("skip"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Bulk-create products from a CSV, XLSX or NDJSON file. Rows whose productCode already
+    exists are skipped, or updated with on_duplicate=update; the response lists every rejected row.
+    """
+    try:
+        return await bulk_importer.import_upload(db, current_user.id, "products", file, format, on_duplicate)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 @router.get("/{product_id}")
 async def get_product(
     product_id: str,
@@ -106,6 +156,13 @@ async def update_product(
     await db.products.update_one({"id": product_id}, {"$set": updates})
     
     updated = await db.products.find_one({"id": product_id}, {"_id": 0})
+    typeahead_index.on_change(
+        current_user.id, "products",
+        existing.get("productName") if existing.get("isActive") else None,
+        updated.get("productName") if updated.get("isActive") else None
+    )
+    product_matcher.invalidate(current_user.id)
+    await dashboard_rollups.record_change(db, "products", current_user.id, existing, updated)
     for date_field in ['createdAt', 'updatedAt']:
         if updated.get(date_field) and isinstance(updated[date_field], str):
             updated[date_field] = datetime.fromisoformat(updated[date_field])
@@ -119,10 +176,15 @@ async def delete_product(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     # Soft delete
-    result = await db.products.update_one(
+    existing = await db.products.find_one_and_update(
         {"id": product_id, "userId": current_user.id},
-        {"$set": {"isActive": False, "updatedAt": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"isActive": False, "updatedAt": datetime.now(timezone.utc).isoformat()}},
+        {"_id": 0, "productName": 1, "isActive": 1}
     )
-    if result.modified_count == 0:
+    if existing is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    if existing.get("isActive"):
+        typeahead_index.on_change(current_user.id, "products", existing.get("productName"), None)
+        product_matcher.invalidate(current_user.id)
+        await dashboard_rollups.record_change(db, "products", current_user.id, existing, None)
     return None
@@ -1,32 +1,44 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from datetime import datetime, timezone
 from models import RFQ, RFQCreate, RFQUpdate, VendorQuote, VendorQuoteCreate, User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.pagination import paginate, page_meta
+from services.dashboard_rollups import dashboard_rollups
+from services.document_generation import document_generator
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("rfqs", "id")
+index_registry.register("rfqs", [("userId", 1), ("createdAt", -1), ("_id", -1)])
+index_registry.register("rfqs", [("userId", 1), ("status", 1), ("createdAt", -1), ("_id", -1)])
+index_registry.register("vendor_quotes", [("rfqId", 1), ("userId", 1), ("createdAt", -1)])
+
 @router.get("/", response_model=dict)
 async def get_rfqs(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     status_filter: Optional[str] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    skip = (page - 1) * limit
     query = {"userId": current_user.id}
     
     if status_filter:
         query["status"] = status_filter
     
-    # Get total count
-    total = await db.rfqs.count_documents(query)
-    
     # Get RFQs
-    rfqs_cursor = db.rfqs.find(query, {"_id": 0}).skip(skip).limit(limit).sort("createdAt", -1)
-    rfqs = await rfqs_cursor.to_list(length=limit)
+    try:
+        result = await paginate(db.rfqs, query, [("createdAt", -1)], limit, cursor, page, {"_id": 0}, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    rfqs = result["items"]
     
     # Parse dates
     for rfq in rfqs:
@@ -41,12 +53,7 @@ async def get_rfqs(
     
     return {
         "data": rfqs,
-        "pagination": {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": (total + limit - 1) // limit
-        }
+        "pagination": page_meta(result, page, limit)
     }
 
 @router.get("/{rfq_id}", response_model=RFQ)
@@ -90,6 +97,7 @@ async def create_rfq(
     rfq_dict["dueDate"] = rfq_dict["dueDate"].isoformat()
     
     await db.rfqs.insert_one(rfq_dict)
+    await dashboard_rollups.record_change(db, "rfqs", current_user.id, None, rfq_dict)
     
     # Update vendor stats
     for vendor_id in rfq_data.vendorIds:
@@ -126,6 +134,7 @@ async def update_rfq(
     
     # Get updated RFQ
     updated_rfq = await db.rfqs.find_one({"id": rfq_id}, {"_id": 0})
+    await dashboard_rollups.record_change(db, "rfqs", current_user.id, existing_rfq, updated_rfq)
     
     # Parse dates
     if isinstance(updated_rfq.get('createdAt'), str):
@@ -145,13 +154,67 @@ async def delete_rfq(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    result = await db.rfqs.delete_one({"id": rfq_id, "userId": current_user.id})
+    deleted = await db.rfqs.find_one_and_delete({"id": rfq_id, "userId": current_user.id}, {"_id": 0, "status": 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RFQ not found")
+    await dashboard_rollups.record_change(db, "rfqs", current_user.id, deleted, None)
     
     return None
 
+@router.post("/{rfq_id}/letters")
+async def generate_rfq_letters(
+    rfq_id: str,
+    format: str = Query("docx"),
+    in_memory: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Render the RFQ letter for every vendor on the RFQ in one batch"""
+    rfq = await db.rfqs.find_one({"id": rfq_id, "userId": current_user.id}, {"_id": 0})
+    if not rfq:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="RFQ not found")
+    
+    vendors = await db.vendors.find(
+        {"id": {"$in": rfq.get("vendorIds", [])}, "userId": current_user.id}, {"_id": 0}
+    ).to_list(length=None)
+    if not vendors:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="RFQ has no vendors")
+    company = await db.companies.find_one({"userId": current_user.id}, {"_id": 0}) or {}
+    
+    due_date = rfq.get("dueDate")
+    if isinstance(due_date, str):
+        due_date = datetime.fromisoformat(due_date)
+    base = {
+        **rfq,
+        "dueDate": due_date,
+        "companyName": company.get("companyName", ""),
+        "senderName": company.get("authorizedPersonName", "")
+    }
+    contexts = [
+        {
+            **base,
+            "vendorName": vendor.get("companyName", ""),
+            "vendorAddress": ", ".join(part for part in (vendor.get("address"), vendor.get("city"), vendor.get("state")) if part),
+            "contactPerson": vendor.get("primaryContactName") or "Sir/Madam"
+        }
+        for vendor in vendors
+    ]
+    
+    try:
+        result = await document_generator.render_batch(current_user.id, "rfq_letter", format, contexts, in_memory)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if in_memory:
+        return StreamingResponse(
+            result["buffer"],
+            media_type=result["media_type"],
+            headers={"Content-Disposition": f'attachment; filename="rfq_letters_{rfq_id}.zip"'}
+        )
+    for document, vendor in zip(result["files"], vendors):
+        document["vendorId"] = vendor["id"]
+    return result
+
 # Vendor Quotes
 @router.get("/{rfq_id}/quotes", response_model=List[VendorQuote])
 async def get_rfq_quotes(
@@ -4,13 +4,13 @@ from pydantic import BaseModel, HttpUrl
 from typing import Optional, List
 from datetime import datetime, timezone
 from models import User
-from routers.auth import get_current_user
+from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
 
 router = APIRouter()
 
-def get_db():
-    from server import db
-    return db
+# Indexes
+index_registry.register("platform_settings", "type")
 
 class SocialMediaLink(BaseModel):
     platform: str  # facebook, twitter, linkedin, instagram, youtube
@@ -7,9 +7,21 @@ sys.path.append('/app/backend')
 from models_tenant import Tenant, TenantStatus, TenantPlan, AdminAction, PLAN_PRICING
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.pagination import paginate, page_meta
+from services.dashboard_rollups import dashboard_rollups
+from services.tender_ingestion import tender_ingestion
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("tenants", [("created_at", -1), ("_id", -1)])
+index_registry.register("tenants", [("status", 1), ("created_at", -1), ("_id", -1)])
+index_registry.register("tenants", [("plan", 1), ("created_at", -1), ("_id", -1)])
+index_registry.register("tenant_usage", "month")
+index_registry.register("tenant_billing", [("tenant_id", 1), ("billing_date", -1)])
+index_registry.register("admin_actions", [("performed_at", -1)])
+
 # Super Admin User IDs (hardcoded for now - should be in env/config)
 SUPER_ADMIN_IDS = ["super_admin_user_id"]  # Update with actual super admin user IDs
 
@@ -32,12 +44,13 @@ async def list_all_tenants(
     limit: int = Query(50, ge=1, le=200),
     status_filter: Optional[str] = None,
     plan_filter: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     admin: User = Depends(require_super_admin),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """List all tenants (Super Admin)"""
     
-    skip = (page - 1) * limit
     query = {}
     
     if status_filter:
@@ -45,8 +58,11 @@ async def list_all_tenants(
     if plan_filter:
         query["plan"] = plan_filter
     
-    total = await db.tenants.count_documents(query)
-    tenants = await db.tenants.find(query, {"_id": 0}).skip(skip).limit(limit).sort("created_at", -1).to_list(length=limit)
+    try:
+        result = await paginate(db.tenants, query, [("created_at", -1)], limit, cursor, page, {"_id": 0}, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    tenants = result["items"]
     
     # Add member count and usage for each tenant
     for tenant in tenants:
@@ -62,7 +78,7 @@ async def list_all_tenants(
     
     return {
         "tenants": tenants,
-        "pagination": {"page": page, "limit": limit, "total": total, "totalPages": (total + limit - 1) // limit}
+        "pagination": page_meta(result, page, limit)
     }
 
 @router.get("/tenants/{tenant_id}")
@@ -271,3 +287,42 @@ async def get_admin_actions(
         "actions": actions,
         "pagination": {"page": page, "limit": limit, "total": total}
     }
+
+@router.post("/dashboard-rollups/rebuild")
+async def rebuild_dashboard_rollups(
+    admin: User = Depends(require_super_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Backfill every user's dashboard rollup (Super Admin)"""
+    
+    result = await dashboard_rollups.rebuild_all(db)
+    return {"message": "Dashboard rollups rebuilt", **result}
+
+@router.post("/ingestion/run")
+async def run_tender_ingestion(
+    source: Optional[str] = None,
+    admin: User = Depends(require_super_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Run incremental portal tender ingestion now, for one source or all (Super Admin)"""
+    
+    if source:
+        try:
+            runs = [await tender_ingestion.run_source(db, source)]
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    else:
+        runs = await tender_ingestion.run_all(db)
+    
+    return {"runs": runs}
+
+@router.get("/ingestion/runs")
+async def get_ingestion_runs(
+    source: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    admin: User = Depends(require_super_admin),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Recent ingestion runs with throughput stats (Super Admin)"""
+    
+    return {"runs": await tender_ingestion.recent_runs(db, source, limit)}
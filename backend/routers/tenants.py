@@ -6,9 +6,16 @@ sys.path.append('/app/backend')
 from models_tenant import Tenant, TenantMember, TenantUsage, TenantRole, TenantStatus, PLAN_LIMITS
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("tenants", "id")
+index_registry.register("tenant_members", [("user_id", 1), ("is_active", 1)])
+index_registry.register("tenant_members", [("tenant_id", 1), ("is_active", 1)])
+index_registry.register("tenant_usage", [("tenant_id", 1), ("month", -1)])
+
 @router.post("/", status_code=status.HTTP_201_CREATED)
 async def create_tenant(
     tenant_data: dict,
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, status
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
 from typing import Optional
 import sys
@@ -7,33 +9,53 @@ sys.path.append('/app/backend')
 from models_extended import Tender, TenderCreate, TenderStatus
 from models import User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.pagination import paginate, page_meta
+from services.dashboard_rollups import dashboard_rollups
+from services.typeahead_index import typeahead_index
+from services.bulk_import import bulk_importer
+from services.data_export import data_exporter, EXPORT_BATCH_SIZE
+from services.pdf_tools_service import UploadTooLarge
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("tenders", "id")
+index_registry.register("tenders", [("userId", 1), ("createdAt", -1), ("_id", -1)])
+index_registry.register("tenders", [("userId", 1), ("status", 1), ("createdAt", -1), ("_id", -1)])
+
+def _tender_query(user_id: str, tender_status: Optional[str], search: Optional[str]) -> dict:
+    """Filters shared by the tender list and export"""
+    query = {"userId": user_id}
+    
+    if tender_status:
+        query["status"] = tender_status
+    if search:
+        query["$or"] = [
+            {"title": {"$regex": search, "$options": "i"}},
+            {"tenderNumber": {"$regex": search, "$options": "i"}},
+            {"organization": {"$regex": search, "$options": "i"}}
+        ]
+    return query
+
 @router.get("/")
 async def get_tenders(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
-    status: Optional[str] = None,
+    tender_status: Optional[str] = Query(None, alias="status"),
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    skip = (page - 1) * limit
-    query = {"userId": current_user.id}
+    query = _tender_query(current_user.id, tender_status, search)
     
-    if status:
-        query["status"] = status
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"tenderNumber": {"$regex": search, "$options": "i"}},
-            {"organization": {"$regex": search, "$options": "i"}}
-        ]
-    
-    total = await db.tenders.count_documents(query)
-    tenders_cursor = db.tenders.find(query, {"_id": 0}).skip(skip).limit(limit).sort("createdAt", -1)
-    tenders = await tenders_cursor.to_list(length=limit)
+    try:
+        result = await paginate(db.tenders, query, [("createdAt", -1)], limit, cursor, page, {"_id": 0}, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    tenders = result["items"]
     
     for tender in tenders:
         for date_field in ['publishDate', 'submissionDeadline', 'createdAt', 'updatedAt']:
@@ -42,7 +64,7 @@ async def get_tenders(
     
     return {
         "data": tenders,
-        "pagination": {"page": page, "limit": limit, "total": total, "totalPages": (total + limit - 1) // limit}
+        "pagination": page_meta(result, page, limit)
     }
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -58,9 +80,57 @@ async def create_tender(
         if tender_dict.get(date_field):
             tender_dict[date_field] = tender_dict[date_field].isoformat()
     
-    await db.tenders.insert_one(tender_dict)
+    try:
+        await db.tenders.insert_one(tender_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tender number already exists")
+    typeahead_index.on_change(current_user.id, "tenders", None, tender.title)
+    await dashboard_rollups.record_change(db, "tenders", current_user.id, None, tender_dict)
     return tender
 
+@router.post("/import")
+async def import_tenders(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None),
+    on_duplicate: str = Query("skip"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Bulk-create tenders from a CSV, XLSX or NDJSON file. Rows whose tenderNumber already
+    exists are skipped, or updated with on_duplicate=update; the response lists every rejected row.
+    """
+    try:
+        return await bulk_importer.import_upload(db, current_user.id, "tenders", file, format, on_duplicate)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/export")
+async def export_tenders(
+    format: str = Query("csv"),
+    tender_status: Optional[str] = Query(None, alias="status"),
+    search: Optional[str] = None,
+    fields: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Stream every tender matching the list filters as csv, xlsx, ndjson or
+    parquet; fields is an optional comma-separated column list
+    """
+    try:
+        plan = data_exporter.prepare("tenders", format, fields, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(
+        data_exporter.stream(db, plan, _tender_query(current_user.id, tender_status, search)),
+        media_type=plan["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{plan["file_name"]}"'}
+    )
+
 @router.get("/{tender_id}")
 async def get_tender(
     tender_id: str,
@@ -89,9 +159,14 @@ async def update_tender(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tender not found")
     
     updates["updatedAt"] = datetime.now(timezone.utc).isoformat()
-    await db.tenders.update_one({"id": tender_id}, {"$set": updates})
+    try:
+        await db.tenders.update_one({"id": tender_id}, {"$set": updates})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tender number already exists")
     
     updated = await db.tenders.find_one({"id": tender_id}, {"_id": 0})
+    typeahead_index.on_change(current_user.id, "tenders", existing.get("title"), updated.get("title"))
+    await dashboard_rollups.record_change(db, "tenders", current_user.id, existing, updated)
     for date_field in ['publishDate', 'submissionDeadline', 'createdAt', 'updatedAt']:
         if updated.get(date_field) and isinstance(updated[date_field], str):
             updated[date_field] = datetime.fromisoformat(updated[date_field])
@@ -104,7 +179,9 @@ async def delete_tender(
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    result = await db.tenders.delete_one({"id": tender_id, "userId": current_user.id})
-    if result.deleted_count == 0:
+    deleted = await db.tenders.find_one_and_delete({"id": tender_id, "userId": current_user.id}, {"_id": 0, "title": 1, "status": 1, "tenderValue": 1})
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tender not found")
+    typeahead_index.on_change(current_user.id, "tenders", deleted.get("title"), None)
+    await dashboard_rollups.record_change(db, "tenders", current_user.id, deleted, None)
     return None
\ No newline at end of file
@@ -1,36 +1,59 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
 from models import Vendor, VendorCreate, VendorUpdate, User
 from routers.auth import get_current_user, get_db
+from services.index_registry import index_registry
+from services.pagination import paginate, page_meta
+from services.dashboard_rollups import dashboard_rollups
+from services.typeahead_index import typeahead_index
+from services.bulk_import import bulk_importer
+from services.data_export import data_exporter, EXPORT_BATCH_SIZE
+from services.pdf_tools_service import UploadTooLarge
 
 router = APIRouter()
 
+# Indexes
+index_registry.register("vendors", "companyName")
+index_registry.register("vendors", "id")
+index_registry.register("vendors", [("userId", 1), ("isActive", 1), ("companyName", 1), ("_id", 1)])
+index_registry.register("vendors", [("userId", 1), ("isActive", 1), ("categories", 1), ("companyName", 1), ("_id", 1)])
+# One vendor per GSTIN; vendors without one are not deduplicated
+index_registry.register("vendors", [("userId", 1), ("gstin", 1)], unique=True, partialFilterExpression={"gstin": {"$gt": ""}})
+
+def _vendor_query(user_id: str, search: Optional[str], category: Optional[str]) -> dict:
+    """Filters shared by the vendor list and export"""
+    query = {"userId": user_id, "isActive": True}
+    
+    if search:
+        query["companyName"] = {"$regex": search, "$options": "i"}
+    
+    if category:
+        query["categories"] = category
+    return query
+
 @router.get("/", response_model=dict)
 async def get_vendors(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     search: Optional[str] = None,
     category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    skip = (page - 1) * limit
-    query = {"userId": current_user.id, "isActive": True}
-    
-    if search:
-        query["companyName"] = {"$regex": search, "$options": "i"}
-    
-    if category:
-        query["categories"] = category
-    
-    # Get total count
-    total = await db.vendors.count_documents(query)
+    query = _vendor_query(current_user.id, search, category)
     
     # Get vendors
-    vendors_cursor = db.vendors.find(query, {"_id": 0}).skip(skip).limit(limit).sort("companyName", 1)
-    vendors = await vendors_cursor.to_list(length=limit)
+    try:
+        result = await paginate(db.vendors, query, [("companyName", 1)], limit, cursor, page, {"_id": 0}, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    vendors = result["items"]
     
     # Parse dates
     for vendor in vendors:
@@ -41,14 +64,33 @@ async def get_vendors(
     
     return {
         "data": vendors,
-        "pagination": {
-            "page": page,
-            "limit": limit,
-            "total": total,
-            "totalPages": (total + limit - 1) // limit
-        }
+        "pagination": page_meta(result, page, limit)
     }
 
+@router.get("/export")
+async def export_vendors(
+    format: str = Query("csv"),
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+    fields: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Stream every active vendor matching the list filters as csv, xlsx,
+    ndjson or parquet; fields is an optional comma-separated column list
+    """
+    try:
+        plan = data_exporter.prepare("vendors", format, fields, batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return StreamingResponse(
+        data_exporter.stream(db, plan, _vendor_query(current_user.id, search, category)),
+        media_type=plan["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{plan["file_name"]}"'}
+    )
+
 @router.get("/{vendor_id}", response_model=Vendor)
 async def get_vendor(
     vendor_id: str,
@@ -78,10 +120,34 @@ async def create_vendor(
     vendor_dict["createdAt"] = vendor_dict["createdAt"].isoformat()
     vendor_dict["updatedAt"] = vendor_dict["updatedAt"].isoformat()
     
-    await db.vendors.insert_one(vendor_dict)
+    try:
+        await db.vendors.insert_one(vendor_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A vendor with this GSTIN already exists")
+    typeahead_index.on_change(current_user.id, "vendors", None, vendor.companyName)
+    await dashboard_rollups.record_change(db, "vendors", current_user.id, None, vendor_dict)
     
     return vendor
 
+@router.post("/import")
+async def import_vendors(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None),
+    on_duplicate: str = Query("skip"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Bulk-create vendors from a CSV, XLSX or NDJSON file. Rows whose GSTIN already
+    exists are skipped, or updated with on_duplicate=update; the response lists every rejected row.
+    """
+    try:
+        return await bulk_importer.import_upload(db, current_user.id, "vendors", file, format, on_duplicate)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 @router.patch("/{vendor_id}", response_model=Vendor)
 async def update_vendor(
     vendor_id: str,
@@ -98,10 +164,19 @@ async def update_vendor(
     update_data = {k: v for k, v in vendor_data.model_dump(exclude_unset=True).items()}
     update_data["updatedAt"] = datetime.now(timezone.utc).isoformat()
     
-    await db.vendors.update_one({"id": vendor_id}, {"$set": update_data})
+    try:
+        await db.vendors.update_one({"id": vendor_id}, {"$set": update_data})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A vendor with this GSTIN already exists")
     
     # Get updated vendor
     updated_vendor = await db.vendors.find_one({"id": vendor_id}, {"_id": 0})
+    typeahead_index.on_change(
+        current_user.id, "vendors",
+        existing_vendor.get("companyName") if existing_vendor.get("isActive") else None,
+        updated_vendor.get("companyName") if updated_vendor.get("isActive") else None
+    )
+    await dashboard_rollups.record_change(db, "vendors", current_user.id, existing_vendor, updated_vendor)
     
     # Parse dates
     if isinstance(updated_vendor.get('createdAt'), str):
@@ -118,12 +193,16 @@ async def delete_vendor(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     # Soft delete - set isActive to False
-    result = await db.vendors.update_one(
+    existing_vendor = await db.vendors.find_one_and_update(
         {"id": vendor_id, "userId": current_user.id},
-        {"$set": {"isActive": False, "updatedAt": datetime.now(timezone.utc).isoformat()}}
+        {"$set": {"isActive": False, "updatedAt": datetime.now(timezone.utc).isoformat()}},
+        {"_id": 0, "companyName": 1, "isActive": 1}
     )
     
-    if result.matched_count == 0:
+    if existing_vendor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vendor not found")
+    if existing_vendor.get("isActive"):
+        typeahead_index.on_change(current_user.id, "vendors", existing_vendor.get("companyName"), None)
+        await dashboard_rollups.record_change(db, "vendors", current_user.id, existing_vendor, None)
     
     return None
\ No newline at end of file
@@ -2,22 +2,29 @@ from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from datetime import datetime, timezone
 
 # Import routers
-from routers import auth, vendors, rfq, company_profile, email_verification, settings, feedback, tenders, boq, products, alerts, analytics, credits, payments, tenants, super_admin, gem_integration, search, competitors, cpp_portal, buyers_history, competitor_history, pdf_tools, email_client, office365
+from routers import auth, vendors, rfq, company_profile, email_verification, settings, feedback, tenders, boq, products, alerts, analytics, credits, payments, tenants, super_admin, gem_integration, search, competitors, cpp_portal, buyers_history, competitor_history, pdf_tools, email_client, office365, bid_packages, documents
+from services.database import database_service
+from services.index_registry import index_registry
+from services.auth_cache import auth_cache
+from services.gem_crawler import gem_crawler
+from services.tender_ingestion import tender_ingestion
+from services.executors import executors
+from services.extraction_cache import extraction_cache
+from services.pdf_jobs import pdf_jobs
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection (single shared client and pool for the whole process)
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = database_service.client
+db = database_service.db
 
 # Create the main app
 app = FastAPI(title="HexaBid API", version="1.0.0")
@@ -39,6 +46,30 @@ async def health_check():
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
+@api_router.get("/health/database")
+async def database_health():
+    return database_service.pool_stats()
+
+@api_router.get("/health/auth-cache")
+async def auth_cache_health():
+    return auth_cache.get_stats()
+
+@api_router.get("/health/executors")
+async def executor_health():
+    return executors.get_stats()
+
+@api_router.get("/health/extraction-cache")
+async def extraction_cache_health():
+    return await executors.io.run(extraction_cache.get_stats)
+
+@api_router.get("/health/pdf-jobs")
+async def pdf_jobs_health():
+    return pdf_jobs.get_stats()
+
+@api_router.get("/health/indexes")
+async def index_health():
+    return await index_registry.report(db)
+
 # Include all routers
 api_router.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 api_router.include_router(vendors.router, prefix="/vendors", tags=["Vendors"])
@@ -73,6 +104,8 @@ api_router.include_router(competitor_history.router)
 api_router.include_router(pdf_tools.router)
 api_router.include_router(email_client.router)
 api_router.include_router(office365.router)
+api_router.include_router(bid_packages.router)
+api_router.include_router(documents.router)
 
 # Include the API router in the main app
 app.include_router(api_router)
@@ -97,16 +130,28 @@ logger = logging.getLogger(__name__)
 async def startup_db_client():
     logger.info("Starting HexaBid API...")
     logger.info(f"Connected to MongoDB at {mongo_url}")
-    # Create indexes
-    await db.users.create_index("email", unique=True)
-    await db.vendors.create_index("companyName")
-    await db.companies.create_index("userId")
-    logger.info("Database indexes created")
+    # Create indexes registered by the routers (disable for large deployments and run manage_indexes.py instead)
+    if os.environ.get('APPLY_INDEXES_ON_STARTUP', 'true').lower() == 'true':
+        await index_registry.apply(db)
+        logger.info("Database indexes ensured")
+    # Duplicate products, tenders and vendors are only rejected by their unique indexes
+    missing_unique = await index_registry.missing_unique(db)
+    if missing_unique:
+        raise RuntimeError(
+            f"Unique indexes not in place: {', '.join(missing_unique)}. "
+            "Run 'python manage_indexes.py migrate' (and remove any duplicates it reports) before starting the API"
+        )
+    tender_ingestion.start(db)
+    pdf_jobs.start(db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     logger.info("Shutting down HexaBid API...")
-    client.close()
+    await tender_ingestion.stop()
+    await pdf_jobs.stop(db)
+    await gem_crawler.close()
+    executors.shutdown()
+    database_service.close()
 
 # Export db for use in routers
 app.state.db = db
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+from typing import Dict, Any, Optional
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_TTL_SECONDS = int(os.getenv('AUTH_CACHE_TTL_SECONDS', '60'))
+AUTH_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv('AUTH_CACHE_NEGATIVE_TTL_SECONDS', '10'))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv('AUTH_CACHE_MAX_ENTRIES', '10000'))
+# When a shared backend is configured the per-worker layer only absorbs bursts,
+# so a stale entry on another worker lives at most this long after invalidation
+AUTH_CACHE_LOCAL_TTL_SECONDS = int(os.getenv('AUTH_CACHE_LOCAL_TTL_SECONDS', '5'))
+AUTH_CACHE_REDIS_URL = os.getenv('AUTH_CACHE_REDIS_URL', '')
+
+CACHE_MISS = object()
+_NEGATIVE = "__none__"
+
+class LocalCacheBackend:
+    """In-process TTL + LRU cache (cachetools.TTLCache evicts least recently used entries when full)"""
+
+    def __init__(self, maxsize: int, ttl: int, negative_ttl: int):
+        self._positive = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._negative = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+
+    async def get(self, key: str) -> Any:
+        if key in self._negative:
+            return None
+        return self._positive.get(key, CACHE_MISS)
+
+    async def set(self, key: str, value: Optional[Dict[str, Any]]):
+        if value is None:
+            self._positive.pop(key, None)
+            self._negative[key] = True
+        else:
+            self._negative.pop(key, None)
+            self._positive[key] = value
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._positive.pop(key, None)
+            self._negative.pop(key, None)
+
+    def size(self) -> int:
+        return len(self._positive) + len(self._negative)
+
+class RedisCacheBackend:
+    """Shared cache on any Redis-compatible server so all workers see the same entries and invalidations"""
+
+    PREFIX = "hexabid:auth:"
+
+    def __init__(self, url: str, ttl: int, negative_ttl: int):
+        import redis.asyncio as redis_asyncio
+
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+
+    async def get(self, key: str) -> Any:
+        raw = await self._redis.get(self.PREFIX + key)
+        if raw is None:
+            return CACHE_MISS
+        if raw == _NEGATIVE:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Optional[Dict[str, Any]]):
+        if value is None:
+            await self._redis.set(self.PREFIX + key, _NEGATIVE, ex=self._negative_ttl)
+        else:
+            await self._redis.set(self.PREFIX + key, json.dumps(value, default=str), ex=self._ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._redis.delete(*[self.PREFIX + key for key in keys])
+
+class AuthCache:
+    """
+    Cache for the authentication dependency.
+
+    Session tokens map to {"user_id", "expires_at"} and user ids map to the
+    user document (without password hash). Lookups that found nothing are
+    cached briefly as negative entries so invalid tokens do not hit MongoDB.
+    """
+
+    def __init__(self):
+        self.shared = None
+        local_ttl = AUTH_CACHE_TTL_SECONDS
+
+        if AUTH_CACHE_REDIS_URL:
+            try:
+                self.shared = RedisCacheBackend(AUTH_CACHE_REDIS_URL, AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_NEGATIVE_TTL_SECONDS)
+                local_ttl = min(AUTH_CACHE_TTL_SECONDS, AUTH_CACHE_LOCAL_TTL_SECONDS)
+                logger.info("Auth cache using shared Redis backend")
+            except ImportError:
+                logger.warning("redis package not installed - auth cache is per-worker only")
+
+        self.local = LocalCacheBackend(
+            AUTH_CACHE_MAX_ENTRIES,
+            max(1, local_ttl),
+            max(1, min(local_ttl, AUTH_CACHE_NEGATIVE_TTL_SECONDS))
+        )
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "invalidations": 0, "shared_errors": 0}
+
+    async def _get(self, key: str) -> Any:
+        value = await self.local.get(key)
+
+        if value is CACHE_MISS and self.shared is not None:
+            try:
+                value = await self.shared.get(key)
+            except Exception as e:
+                self.stats["shared_errors"] += 1
+                logger.warning(f"Shared auth cache read failed: {e}")
+                value = CACHE_MISS
+            if value is not CACHE_MISS:
+                await self.local.set(key, value)
+
+        if value is CACHE_MISS:
+            self.stats["misses"] += 1
+        elif value is None:
+            self.stats["negative_hits"] += 1
+        else:
+            self.stats["hits"] += 1
+        return value
+
+    async def _set(self, key: str, value: Optional[Dict[str, Any]]):
+        await self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, value)
+            except Exception as e:
+                self.stats["shared_errors"] += 1
+                logger.warning(f"Shared auth cache write failed: {e}")
+
+    async def _delete(self, key: str):
+        self.stats["invalidations"] += 1
+        await self.local.delete(key)
+        if self.shared is not None:
+            try:
+                await self.shared.delete(key)
+            except Exception as e:
+                self.stats["shared_errors"] += 1
+                logger.warning(f"Shared auth cache delete failed: {e}")
+
+    async def get_user(self, user_id: str) -> Any:
+        """Cached user document, None for a known-missing user, or CACHE_MISS"""
+        return await self._get(f"user:{user_id}")
+
+    async def set_user(self, user_id: str, user_doc: Optional[Dict[str, Any]]):
+        await self._set(f"user:{user_id}", user_doc)
+
+    async def get_session(self, session_token: str) -> Any:
+        """Cached session, None for a known-invalid token, or CACHE_MISS"""
+        return await self._get(f"session:{session_token}")
+
+    async def set_session(self, session_token: str, session: Optional[Dict[str, Any]]):
+        await self._set(f"session:{session_token}", session)
+
+    async def invalidate_user(self, user_id: str):
+        """Call after any write to the users document (profile, verification, ...)"""
+        await self._delete(f"user:{user_id}")
+
+    async def invalidate_session(self, session_token: str):
+        """Call after a session is created or deleted"""
+        await self._delete(f"session:{session_token}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round((self.stats["hits"] + self.stats["negative_hits"]) / lookups, 3) if lookups else 0.0,
+            "local_entries": self.local.size(),
+            "shared_backend": "redis" if self.shared is not None else None
+        }
+
+# Global instance
+auth_cache = AuthCache()
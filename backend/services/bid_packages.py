@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.executors import executors, ExecutorSaturated
+from services.extraction_cache import extraction_cache
+from services.index_registry import index_registry
+from services.pdf_tools_service import pdf_tools_service, cached_reader
+from utils.document_templates import template_engine
+
+logger = logging.getLogger(__name__)
+
+# Section files and assembled packages live outside the upload directory, so the upload TTL sweep does not touch them
+BID_PACKAGE_DIR = os.getenv('BID_PACKAGE_DIR', '/tmp/hexabid_bid_packages')
+
+PACKAGES_COLLECTION = "bid_packages"
+
+index_registry.register(PACKAGES_COLLECTION, "id", unique=True)
+index_registry.register(PACKAGES_COLLECTION, [("userId", 1), ("updated_at", -1)])
+
+TEMPLATE_SECTIONS = ("cover_letter", "boq", "compliance_statement")
+
+class InvalidSectionPDF(Exception):
+    """Raised when a section's file cannot be read as a PDF"""
+
+class PackageBuildError(Exception):
+    """Raised when the package PDF could not be assembled"""
+
+def render_template_section(document_type: str, data: Dict[str, Any], output_path: str) -> int:
+    """Render a DocumentTemplateEngine PDF and return its page count. Runs inside process-pool workers."""
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        template_engine.generate_pdf(document_type, data, tmp_path)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(cached_reader(output_path).pages)
+
+def section_page_count(file_path: str) -> int:
+    """Parse a section once, leaving its reader in the worker's cache for the merge"""
+    return len(cached_reader(file_path).pages)
+
+def store_section(source_path: str, section_dir: str) -> Dict[str, Any]:
+    """Copy a component PDF into the section store under its content hash"""
+    sha256 = extraction_cache.file_digest(source_path)
+    path = os.path.join(section_dir, sha256[:2], f"{sha256}.pdf")
+    if not os.path.isfile(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, path)
+    return {"key": sha256, "path": path}
+
+def template_key(document_type: str, data: Dict[str, Any]) -> str:
+    """Key for a generated section: the same template and data render the same PDF"""
+    payload = json.dumps({"template": document_type, "data": data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class BidPackageAssembler:
+    """
+    Incremental bid package assembly.
+
+    A package is a manifest of titled sections, each an uploaded PDF or a
+    DocumentTemplateEngine document (cover letter, BOQ, compliance
+    statement). Sections are stored once per user by content hash (generated
+    ones by a hash of template and data), so editing one annexure only
+    re-hashes, re-renders and re-parses that section. Building merges the
+    stored sections with PDFToolsService._merge_pdfs, one bookmark per
+    section; pool workers keep parsed readers of unchanged sections between
+    builds, and a build whose manifest matches the last output is skipped.
+    """
+
+    def __init__(self):
+        self._build_locks: Dict[str, asyncio.Lock] = {}
+
+    def _user_dir(self, user_id: str) -> str:
+        if not user_id or os.path.basename(user_id) != user_id or user_id.startswith("."):
+            raise ValueError("Invalid package owner")
+        return os.path.join(BID_PACKAGE_DIR, user_id)
+
+    def _section_path(self, user_id: str, key: str) -> str:
+        return os.path.join(self._user_dir(user_id), "sections", key[:2], f"{key}.pdf")
+
+    def _output_path(self, user_id: str, package_id: str) -> str:
+        return os.path.join(self._user_dir(user_id), "packages", package_id, "package.pdf")
+
+    async def _run_cpu(self, fn, *args, **kwargs):
+        while True:
+            try:
+                return await executors.cpu.run(fn, *args, **kwargs)
+            except ExecutorSaturated:
+                await asyncio.sleep(0.5)
+
+    async def _page_count(self, title: str, path: str) -> int:
+        try:
+            return await self._run_cpu(section_page_count, path)
+        except Exception as e:
+            raise InvalidSectionPDF(f"Section '{title}' is not a readable PDF: {e}")
+
+    def _validate_sections(self, user_id: str, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not sections:
+            raise ValueError("A bid package needs at least one section")
+        validated = []
+        for idx, section in enumerate(sections, 1):
+            title = (section.get("title") or "").strip()
+            if not title:
+                raise ValueError(f"Section {idx} needs a title")
+            if bool(section.get("file_path")) == bool(section.get("template")):
+                raise ValueError(f"Section '{title}' needs exactly one of file_path or template")
+            if section.get("template"):
+                if section["template"] not in TEMPLATE_SECTIONS:
+                    raise ValueError(f"Unknown template '{section['template']}', expected one of {', '.join(TEMPLATE_SECTIONS)}")
+                validated.append({"title": title, "template": section["template"], "data": section.get("data") or {}})
+            else:
+                validated.append({"title": title, "file_path": pdf_tools_service.resolve_owned_path(section["file_path"], user_id)})
+        return validated
+
+    async def _attach(self, user_id: str, section: Dict[str, Any], previous: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Resolve a section to its stored key, reusing the previous manifest entry when the source is unchanged"""
+        if section.get("template"):
+            key = template_key(section["template"], section["data"])
+            old = previous.get(key)
+            return {**section, "key": key, "pages": old["pages"] if old else None}
+
+        stat = os.stat(section["file_path"])
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        for old in previous.values():
+            if old.get("file_path") == section["file_path"] and old.get("source") == source \
+                    and os.path.isfile(self._section_path(user_id, old["key"])):
+                return {**section, "key": old["key"], "pages": old["pages"], "source": source}
+
+        stored = await executors.io.run(store_section, section["file_path"], os.path.join(self._user_dir(user_id), "sections"))
+        old = previous.get(stored["key"])
+        pages = old["pages"] if old else await self._page_count(section["title"], stored["path"])
+        return {**section, "key": stored["key"], "pages": pages, "source": source}
+
+    async def create_package(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        name: str,
+        sections: List[Dict[str, Any]],
+        tender_id: str = None
+    ) -> Dict[str, Any]:
+        """
+        Create a package manifest; uploaded sections are copied into the section store
+
+        Raises:
+            ValueError: If a section is invalid or its file is not accessible
+        """
+        sections = self._validate_sections(user_id, sections)
+        now = datetime.now(timezone.utc).isoformat()
+        package = {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "name": name,
+            "tenderId": tender_id,
+            "sections": list(await asyncio.gather(*[self._attach(user_id, section, {}) for section in sections])),
+            "output": None,
+            "last_build": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await db[PACKAGES_COLLECTION].insert_one(dict(package))
+        return package
+
+    async def update_sections(self, db: AsyncIOMotorDatabase, user_id: str, package_id: str, sections: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Replace a package's section list; unchanged sections keep their stored files and page counts
+
+        Raises:
+            ValueError: If a section is invalid or its file is not accessible
+        """
+        package = await self.get_package(db, user_id, package_id)
+        if package is None:
+            return None
+        sections = self._validate_sections(user_id, sections)
+        previous = {section["key"]: section for section in package["sections"]}
+        package["sections"] = list(await asyncio.gather(*[self._attach(user_id, section, previous) for section in sections]))
+        package["updated_at"] = datetime.now(timezone.utc).isoformat()
+        await db[PACKAGES_COLLECTION].update_one(
+            {"id": package_id, "userId": user_id},
+            {"$set": {"sections": package["sections"], "updated_at": package["updated_at"]}}
+        )
+        await self._collect_garbage(db, user_id)
+        return package
+
+    async def _prepare(self, user_id: str, section: Dict[str, Any]) -> bool:
+        """Make sure a section's PDF is in the store; returns True if it had to be rendered"""
+        path = self._section_path(user_id, section["key"])
+        if os.path.isfile(path):
+            if section["pages"] is None:
+                section["pages"] = await self._page_count(section["title"], path)
+            return False
+        if not section.get("template"):
+            raise ValueError(f"Stored file for section '{section['title']}' is missing; attach the document again")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        section["pages"] = await self._run_cpu(render_template_section, section["template"], section["data"], path)
+        return True
+
+    async def build(self, db: AsyncIOMotorDatabase, user_id: str, package_id: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Assemble the package PDF, rendering only sections that are not stored yet
+
+        Raises:
+            ValueError: If an uploaded section's stored file has gone missing
+            InvalidSectionPDF: If a section cannot be read as a PDF
+            PackageBuildError: If merging the sections failed
+        """
+        lock = self._build_locks.setdefault(package_id, asyncio.Lock())
+        async with lock:
+            package = await self.get_package(db, user_id, package_id)
+            if package is None:
+                return None
+
+            started = time.monotonic()
+            sections = package["sections"]
+            rendered = await asyncio.gather(*[self._prepare(user_id, section) for section in sections])
+            build_digest = hashlib.sha256(
+                "\n".join(f"{section['title']}\0{section['key']}" for section in sections).encode()
+            ).hexdigest()
+
+            output_path = self._output_path(user_id, package_id)
+            output = package.get("output")
+            if not force and output and output.get("build_digest") == build_digest and os.path.isfile(output_path):
+                return {"success": True, "status": "unchanged", "package": package}
+
+            output_dir = os.path.dirname(output_path)
+            os.makedirs(output_dir, exist_ok=True)
+            paths = [self._section_path(user_id, section["key"]) for section in sections]
+            result = await self._run_cpu(
+                pdf_tools_service._merge_pdfs, paths, output_dir=output_dir, outline=[section["title"] for section in sections]
+            )
+            if not result.get("success"):
+                # Name the section at fault if one of them no longer parses
+                for section, path in zip(sections, paths):
+                    await self._page_count(section["title"], path)
+                raise PackageBuildError(f"Could not assemble the package: {result.get('error')}")
+            os.replace(result["output_path"], output_path)
+
+            start_page = 1
+            for section, pages in zip(sections, result["page_counts"]):
+                section["pages"] = pages
+                section["start_page"] = start_page
+                start_page += pages
+
+            now = datetime.now(timezone.utc).isoformat()
+            package["output"] = {"build_digest": build_digest, "pages": start_page - 1, "size": os.path.getsize(output_path), "built_at": now}
+            package["last_build"] = {
+                "sections": len(sections),
+                "sections_rendered": sum(rendered),
+                "sections_reused": len(sections) - sum(rendered),
+                "duration_ms": round((time.monotonic() - started) * 1000)
+            }
+            await db[PACKAGES_COLLECTION].update_one(
+                {"id": package_id, "userId": user_id},
+                {"$set": {"sections": sections, "output": package["output"], "last_build": package["last_build"]}}
+            )
+            return {"success": True, "status": "built", "package": package}
+
+    async def get_package(self, db: AsyncIOMotorDatabase, user_id: str, package_id: str) -> Optional[Dict[str, Any]]:
+        return await db[PACKAGES_COLLECTION].find_one({"id": package_id, "userId": user_id}, {"_id": 0})
+
+    async def list_packages(self, db: AsyncIOMotorDatabase, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        cursor = db[PACKAGES_COLLECTION].find(
+            {"userId": user_id}, {"_id": 0, "sections.data": 0}
+        ).sort("updated_at", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def output_file(self, db: AsyncIOMotorDatabase, user_id: str, package_id: str) -> Optional[str]:
+        """Path of the last assembled PDF, or None if the package was never built"""
+        package = await self.get_package(db, user_id, package_id)
+        if package is None or not package.get("output"):
+            return None
+        path = self._output_path(user_id, package_id)
+        return path if os.path.isfile(path) else None
+
+    async def delete_package(self, db: AsyncIOMotorDatabase, user_id: str, package_id: str) -> bool:
+        result = await db[PACKAGES_COLLECTION].delete_one({"id": package_id, "userId": user_id})
+        if not result.deleted_count:
+            return False
+        shutil.rmtree(os.path.dirname(self._output_path(user_id, package_id)), ignore_errors=True)
+        self._build_locks.pop(package_id, None)
+        await self._collect_garbage(db, user_id)
+        return True
+
+    async def _collect_garbage(self, db: AsyncIOMotorDatabase, user_id: str):
+        """Remove stored sections no package of this user refers to any more"""
+        cursor = db[PACKAGES_COLLECTION].find({"userId": user_id}, {"_id": 0, "sections.key": 1})
+        referenced = {section["key"] for package in await cursor.to_list(length=None) for section in package["sections"]}
+
+        def sweep():
+            # Sections stored moments ago may belong to a manifest that is still being written
+            cutoff = time.time() - 600
+            section_dir = os.path.join(self._user_dir(user_id), "sections")
+            for dirpath, _, filenames in os.walk(section_dir):
+                for filename in filenames:
+                    if filename.endswith(".pdf") and filename[:-4] not in referenced:
+                        path = os.path.join(dirpath, filename)
+                        try:
+                            if os.stat(path).st_mtime < cutoff:
+                                os.remove(path)
+                        except FileNotFoundError:
+                            pass
+
+        await executors.io.run(sweep)
+
+# Global instance
+bid_package_assembler = BidPackageAssembler()
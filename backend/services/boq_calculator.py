@@ -0,0 +1,175 @@
+import logging
+import os
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# GST applied to line items that do not carry their own gstRate
+BOQ_DEFAULT_GST_PERCENT = float(os.getenv('BOQ_DEFAULT_GST_PERCENT', '18'))
+BOQ_MAX_SCENARIOS = int(os.getenv('BOQ_MAX_SCENARIOS', '10000'))
+# Upper bound on scenario x line-item cells evaluated per block, to cap memory
+BOQ_SCENARIO_BLOCK_CELLS = int(os.getenv('BOQ_SCENARIO_BLOCK_CELLS', '2000000'))
+
+def _column(line_items: List[Dict[str, Any]], field: str) -> np.ndarray:
+    return np.fromiter(
+        (np.nan if item.get(field) is None else item[field] for item in line_items), dtype=float, count=len(line_items)
+    )
+
+def _percent(part: float, whole: float) -> Optional[float]:
+    # + 0.0 turns a rounded -0.0 into 0.0
+    return round(part / whole * 100, 2) + 0.0 if whole else None
+
+class BOQCalculator:
+    """
+    Server-side BOQ pricing over NumPy arrays.
+
+    Line items become columns (quantity, cost, estimated and quoted rates,
+    GST) once; line amounts, GST, margins and grand totals are then
+    computed for all lines in one pass. Pricing scenarios evaluate a grid of
+    margin x discount points as a scenario-by-line rate matrix, so 100
+    margins over a 10k-line BOQ is a handful of array operations.
+
+    Margins are over cost: costRate when a line has one, otherwise the
+    line's current quoted rate (so a scenario's margin is then relative to
+    today's pricing).
+    """
+
+    def line_arrays(self, line_items: List[Dict[str, Any]], default_gst_percent: float = BOQ_DEFAULT_GST_PERCENT) -> Dict[str, np.ndarray]:
+        quantity = np.nan_to_num(_column(line_items, "quantity"))
+        our_rate = _column(line_items, "ourRate")
+        given_amount = _column(line_items, "totalAmount")
+        # Lines priced only by amount get their implied rate
+        derived = np.isnan(our_rate) & ~np.isnan(given_amount) & (quantity != 0)
+        our_rate[derived] = given_amount[derived] / quantity[derived]
+        cost_rate = _column(line_items, "costRate")
+        gst_rate = _column(line_items, "gstRate")
+        return {
+            "quantity": quantity,
+            "our_rate": our_rate,
+            "estimated_rate": _column(line_items, "estimatedRate"),
+            "cost_rate": cost_rate,
+            "has_cost": ~np.isnan(cost_rate),
+            "gst": np.where(np.isnan(gst_rate), default_gst_percent, gst_rate) / 100
+        }
+
+    def compute(self, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """Per-line amounts (arrays) and BOQ totals (floats) for the current quoted rates"""
+        quantity = arrays["quantity"]
+        amount = quantity * np.nan_to_num(arrays["our_rate"])
+        gst = amount * arrays["gst"]
+        cost = quantity * np.where(arrays["has_cost"], arrays["cost_rate"], np.nan_to_num(arrays["our_rate"]))
+        has_estimate = ~np.isnan(arrays["estimated_rate"])
+        estimated = quantity * arrays["estimated_rate"]
+
+        total_amount = float(amount.sum())
+        total_cost = float(cost[arrays["has_cost"]].sum())
+        priced_with_cost = float(amount[arrays["has_cost"]].sum())
+        total_estimated = float(np.nansum(estimated))
+        priced_with_estimate = float(amount[has_estimate].sum())
+        return {
+            "amount": amount,
+            "gst": gst,
+            "total_our_value": round(total_amount, 2),
+            "total_gst_value": round(float(gst.sum()), 2),
+            "grand_total": round(total_amount + float(gst.sum()), 2),
+            "total_estimated_value": round(total_estimated, 2),
+            "total_cost_value": round(total_cost, 2) if arrays["has_cost"].any() else None,
+            # Margin over cost is only meaningful for the lines that have one
+            "margin_percentage": _percent(priced_with_cost - total_cost, total_cost),
+            # Compared over the lines that have an estimate
+            "vs_estimate_percentage": _percent(priced_with_estimate - total_estimated, total_estimated),
+            "lines_below_cost": int((np.nan_to_num(arrays["our_rate"]) < arrays["cost_rate"]).sum())
+        }
+
+    def apply_totals(self, boq: Dict[str, Any], default_gst_percent: float = BOQ_DEFAULT_GST_PERCENT) -> Dict[str, Any]:
+        """
+        Fill each line's totalAmount and the BOQ totals from quantities and
+        rates, replacing whatever the client sent. marginPercentage is only
+        recomputed when some lines carry a costRate.
+        """
+        line_items = boq.get("lineItems") or []
+        arrays = self.line_arrays(line_items, default_gst_percent)
+        totals = self.compute(arrays)
+        for item, amount in zip(line_items, np.round(totals["amount"], 2).tolist()):
+            item["totalAmount"] = amount
+        boq["totalOurValue"] = totals["total_our_value"]
+        boq["totalGstValue"] = totals["total_gst_value"]
+        boq["grandTotal"] = totals["grand_total"]
+        boq["totalEstimatedValue"] = totals["total_estimated_value"] or boq.get("totalEstimatedValue")
+        if totals["margin_percentage"] is not None:
+            boq["marginPercentage"] = totals["margin_percentage"]
+        return boq
+
+    def scenarios(
+        self,
+        line_items: List[Dict[str, Any]],
+        margins: List[float],
+        discounts: List[float],
+        default_gst_percent: float = BOQ_DEFAULT_GST_PERCENT
+    ) -> Dict[str, Any]:
+        """
+        Evaluate every margin x discount pair (both in percent). Each line's
+        rate is cost x (1 + margin) x (1 - discount), rounded to paise as it
+        would be quoted. Returns the current totals and one row per scenario.
+
+        Raises:
+            ValueError: If the grid is empty or too large
+        """
+        if not margins or not discounts:
+            raise ValueError("At least one margin and one discount are required")
+        if len(margins) * len(discounts) > BOQ_MAX_SCENARIOS:
+            raise ValueError(f"At most {BOQ_MAX_SCENARIOS} scenarios can be evaluated at once")
+
+        arrays = self.line_arrays(line_items, default_gst_percent)
+        current = self.compute(arrays)
+        quantity = arrays["quantity"]
+        base = np.where(arrays["has_cost"], arrays["cost_rate"], np.nan_to_num(arrays["our_rate"]))
+        estimated_rate = arrays["estimated_rate"]
+        has_estimate = ~np.isnan(estimated_rate)
+        gst_quantity = quantity * arrays["gst"]
+        total_cost = float(quantity @ base)
+        total_estimated = float(np.nansum(quantity * estimated_rate))
+
+        margin_grid, discount_grid = np.meshgrid(np.asarray(margins, dtype=float), np.asarray(discounts, dtype=float), indexing="ij")
+        factors = ((1 + margin_grid / 100) * (1 - discount_grid / 100)).ravel()
+
+        subtotal = np.empty(len(factors))
+        estimated_lines_subtotal = np.empty(len(factors))
+        gst = np.empty(len(factors))
+        above_estimate = np.empty(len(factors), dtype=int)
+        block = max(1, BOQ_SCENARIO_BLOCK_CELLS // max(1, len(base)))
+        for start in range(0, len(factors), block):
+            rates = np.round(np.outer(factors[start:start + block], base), 2)
+            subtotal[start:start + block] = rates @ quantity
+            estimated_lines_subtotal[start:start + block] = rates[:, has_estimate] @ quantity[has_estimate]
+            gst[start:start + block] = rates @ gst_quantity
+            above_estimate[start:start + block] = (rates[:, has_estimate] > estimated_rate[has_estimate]).sum(axis=1)
+
+        margin_amount = subtotal - total_cost
+        rows = [
+            {
+                "margin_percent": margin,
+                "discount_percent": discount,
+                "total_our_value": round(amount, 2),
+                "total_gst_value": round(tax, 2),
+                "grand_total": round(amount + tax, 2),
+                "margin_amount": round(profit, 2),
+                "effective_margin_percent": _percent(profit, total_cost),
+                "vs_estimate_percent": _percent(estimated_lines - total_estimated, total_estimated),
+                "lines_above_estimate": above
+            }
+            for margin, discount, amount, estimated_lines, tax, profit, above in zip(
+                margin_grid.ravel().tolist(), discount_grid.ravel().tolist(), subtotal.tolist(),
+                estimated_lines_subtotal.tolist(), gst.tolist(), margin_amount.tolist(), above_estimate.tolist()
+            )
+        ]
+        return {
+            "line_items": len(line_items),
+            "lines_with_cost": int(arrays["has_cost"].sum()),
+            "current": {key: value for key, value in current.items() if not isinstance(value, np.ndarray)},
+            "scenarios": rows
+        }
+
+# Global instance
+boq_calculator = BOQCalculator()
@@ -0,0 +1,331 @@
+import logging
+import os
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from services.index_registry import index_registry
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_COLLECTION = "boq_versions"
+
+# A full snapshot is stored every N versions so reconstruction replays at most N - 1 deltas
+BOQ_SNAPSHOT_INTERVAL = int(os.getenv('BOQ_SNAPSHOT_INTERVAL', '20'))
+# Edits touching more than this share of line items are stored as a snapshot instead
+BOQ_SNAPSHOT_CHANGE_RATIO = float(os.getenv('BOQ_SNAPSHOT_CHANGE_RATIO', '0.5'))
+# A next-version record this old whose head update never landed is treated as abandoned
+BOQ_ORPHAN_RECORD_SECONDS = int(os.getenv('BOQ_ORPHAN_RECORD_SECONDS', '120'))
+
+index_registry.register(VERSIONS_COLLECTION, [("boqId", 1), ("version", 1)], unique=True)
+
+# Top-level fields that are not part of a version's content
+_NOT_VERSIONED = {"_id", "lineItems"}
+
+class VersionConflict(Exception):
+    """Another edit recorded the same version first"""
+
+def _line_keys(line_items: List[Dict[str, Any]]) -> List[str]:
+    """Stable line keys: the item number, suffixed with #n for repeated numbers"""
+    seen: Dict[str, int] = {}
+    keys = []
+    for item in line_items:
+        number = str(item.get("itemNumber"))
+        seen[number] = seen.get(number, 0) + 1
+        keys.append(number if seen[number] == 1 else f"{number}#{seen[number]}")
+    return keys
+
+def _compare_lines(before: List[Dict[str, Any]], after: List[Dict[str, Any]]) -> Dict[str, Any]:
+    before_lines = dict(zip(_line_keys(before), before))
+    after_keys = _line_keys(after)
+    after_lines = dict(zip(after_keys, after))
+    removed = [key for key in before_lines if key not in after_lines]
+    added = [key for key in after_keys if key not in before_lines]
+    changed = [key for key in after_keys if key in before_lines and before_lines[key] != after_lines[key]]
+    # Order only needs storing when it is not "old order, minus removed, plus added at the end"
+    expected = [key for key in before_lines if key in after_lines] + added
+    return {
+        "before": before_lines,
+        "after": after_lines,
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "order": after_keys if expected != after_keys else None
+    }
+
+def _field_changes(before: Dict[str, Any], after: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    changed = {
+        field: value for field, value in after.items()
+        if field not in _NOT_VERSIONED and before.get(field, object()) != value
+    }
+    unset = [field for field in before if field not in _NOT_VERSIONED and field not in after]
+    return changed, unset
+
+def compute_delta(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+    """Changed top-level fields and changed line items between two BOQ documents"""
+    fields, unset = _field_changes(before, after)
+    lines = _compare_lines(before.get("lineItems") or [], after.get("lineItems") or [])
+    return {
+        "fields": fields,
+        "unset": unset,
+        "lines": {
+            "upserts": [{"key": key, "item": lines["after"][key]} for key in lines["added"] + lines["changed"]],
+            "removed": lines["removed"],
+            "order": lines["order"]
+        },
+        "summary": {
+            "added": len(lines["added"]),
+            "removed": len(lines["removed"]),
+            "changed": len(lines["changed"]),
+            "fields": sorted(set(fields) | set(unset))
+        }
+    }
+
+def apply_delta(boq: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a stored delta to the previous version's document (mutates and returns it)"""
+    for field in delta.get("unset") or []:
+        boq.pop(field, None)
+    boq.update(delta.get("fields") or {})
+
+    line_items = boq.get("lineItems") or []
+    lines = dict(zip(_line_keys(line_items), line_items))
+    for key in delta["lines"]["removed"]:
+        lines.pop(key, None)
+    for upsert in delta["lines"]["upserts"]:
+        # Changed lines keep their position, new ones are appended
+        lines[upsert["key"]] = upsert["item"]
+    order = delta["lines"]["order"]
+    boq["lineItems"] = [lines[key] for key in order] if order is not None else list(lines.values())
+    return boq
+
+class BOQVersionStore:
+    """
+    Version history for BOQs, stored as periodic full snapshots plus
+    compact deltas.
+
+    The boqs document stays the head (latest version) so normal reads are
+    unchanged. Every edit adds one boq_versions record: a delta holding
+    only the changed top-level fields and added/changed/removed line items
+    (keyed by item number), or a full snapshot every BOQ_SNAPSHOT_INTERVAL
+    versions or when most lines changed. Each record names the snapshot it
+    chains from, so any version is rebuilt from one snapshot and at most
+    BOQ_SNAPSHOT_INTERVAL - 1 deltas.
+
+    The unique (boqId, version) index doubles as an optimistic lock: two
+    concurrent edits of the same version cannot both be recorded. An edit
+    whose head update then fails removes its record (discard_update); a
+    record left behind by a crash is replaced once it is older than
+    BOQ_ORPHAN_RECORD_SECONDS, so the BOQ does not stay locked.
+    """
+
+    def _snapshot_record(self, boq: Dict[str, Any], version: int) -> Dict[str, Any]:
+        return {
+            "boqId": boq["id"],
+            "userId": boq["userId"],
+            "version": version,
+            "kind": "snapshot",
+            "base": version,
+            "snapshot": {**{field: value for field, value in boq.items() if field != "_id"}, "version": version},
+            "summary": {"lines": len(boq.get("lineItems") or [])},
+            "createdAt": datetime.now(timezone.utc).isoformat()
+        }
+
+    async def record_snapshot(self, db: AsyncIOMotorDatabase, boq: Dict[str, Any]):
+        """Record a BOQ's current version in full (used on create)"""
+        await db[VERSIONS_COLLECTION].insert_one(self._snapshot_record(boq, boq.get("version", 1)))
+
+    async def record_update(self, db: AsyncIOMotorDatabase, before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Record the edit from before (the current head) to after, whose
+        version must be the next one. Returns the stored record's metadata.
+
+        Raises:
+            VersionConflict: If this version was already recorded by another edit
+        """
+        collection = db[VERSIONS_COLLECTION]
+        version = after["version"]
+        latest = await collection.find_one(
+            {"boqId": before["id"]}, {"_id": 0, "version": 1, "base": 1, "createdAt": 1}, sort=[("version", -1)]
+        )
+        if latest is not None and latest["version"] == version and self._is_orphan(latest):
+            # Recorded by an edit that never updated the head: drop it and record this edit instead
+            logger.warning(f"Replacing orphaned version {version} of BOQ {before['id']}")
+            await collection.delete_one({"boqId": before["id"], "version": version, "createdAt": latest.get("createdAt")})
+            latest = await collection.find_one(
+                {"boqId": before["id"]}, {"_id": 0, "version": 1, "base": 1}, sort=[("version", -1)]
+            )
+        if latest is not None and latest["version"] >= version:
+            raise VersionConflict()
+        if latest is None or latest["version"] != before.get("version", 1):
+            # BOQs created before versioning, or a lost record: restart the chain from the head
+            await collection.update_one(
+                {"boqId": before["id"], "version": before.get("version", 1)},
+                {"$setOnInsert": self._snapshot_record(before, before.get("version", 1))},
+                upsert=True
+            )
+            latest = {"version": before.get("version", 1), "base": before.get("version", 1)}
+
+        delta = compute_delta(before, after)
+        line_count = len(after.get("lineItems") or [])
+        touched = delta["summary"]["added"] + delta["summary"]["changed"] + delta["summary"]["removed"]
+        if version - latest["base"] >= BOQ_SNAPSHOT_INTERVAL or touched > BOQ_SNAPSHOT_CHANGE_RATIO * max(line_count, 1):
+            record = self._snapshot_record(after, version)
+            record["summary"].update(delta["summary"])
+        else:
+            record = {
+                "boqId": after["id"],
+                "userId": after["userId"],
+                "version": version,
+                "kind": "delta",
+                "base": latest["base"],
+                **delta,
+                "createdAt": datetime.now(timezone.utc).isoformat()
+            }
+        try:
+            await collection.insert_one(record)
+        except DuplicateKeyError:
+            raise VersionConflict()
+        return {"version": version, "kind": record["kind"], "summary": record["summary"]}
+
+    @staticmethod
+    def _is_orphan(record: Dict[str, Any]) -> bool:
+        try:
+            created = datetime.fromisoformat(record["createdAt"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return datetime.now(timezone.utc) - created > timedelta(seconds=BOQ_ORPHAN_RECORD_SECONDS)
+
+    async def discard_update(self, db: AsyncIOMotorDatabase, boq_id: str, version: int):
+        """Remove the record of an edit whose head update did not go through"""
+        await db[VERSIONS_COLLECTION].delete_one({"boqId": boq_id, "version": version})
+
+    async def list_versions(self, db: AsyncIOMotorDatabase, user_id: str, boq_id: str) -> List[Dict[str, Any]]:
+        """Version metadata, newest first, without the stored contents"""
+        cursor = db[VERSIONS_COLLECTION].find(
+            {"boqId": boq_id, "userId": user_id},
+            {"_id": 0, "version": 1, "kind": 1, "summary": 1, "createdAt": 1}
+        ).sort("version", -1)
+        return await cursor.to_list(length=None)
+
+    async def _replay(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        boq_id: str,
+        version: int,
+        start: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        collection = db[VERSIONS_COLLECTION]
+        record = await collection.find_one(
+            {"boqId": boq_id, "userId": user_id, "version": version}, {"_id": 0, "kind": 1, "base": 1, "snapshot": 1}
+        )
+        if record is None:
+            raise ValueError(f"Version {version} is not available")
+        if record["kind"] == "snapshot":
+            return record["snapshot"]
+
+        # Continue from an already rebuilt version on the same chain rather than the snapshot
+        if start is not None and record["base"] <= start["version"] < version:
+            boq = start
+        else:
+            snapshot = await collection.find_one(
+                {"boqId": boq_id, "userId": user_id, "version": record["base"]}, {"_id": 0, "snapshot": 1}
+            )
+            if snapshot is None:
+                raise ValueError(f"Version {version} is not available")
+            boq = snapshot["snapshot"]
+
+        cursor = collection.find(
+            {"boqId": boq_id, "userId": user_id, "version": {"$gt": boq["version"], "$lte": version}},
+            {"_id": 0, "boqId": 0, "userId": 0}
+        ).sort("version", 1)
+        async for delta in cursor:
+            if delta["version"] != boq["version"] + 1:
+                raise ValueError(f"Version {version} is not available")
+            boq = delta["snapshot"] if delta["kind"] == "snapshot" else apply_delta(boq, delta)
+        if boq["version"] != version:
+            raise ValueError(f"Version {version} is not available")
+        return boq
+
+    async def get_version(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        boq_id: str,
+        version: int,
+        head: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Rebuild one version of a BOQ. The head document is returned as-is
+        when it is the version asked for.
+
+        Raises:
+            ValueError: If the version was never recorded
+        """
+        if head is not None and head.get("version", 1) == version:
+            return {field: value for field, value in head.items() if field != "_id"}
+        return await self._replay(db, user_id, boq_id, version)
+
+    async def diff(
+        self,
+        db: AsyncIOMotorDatabase,
+        user_id: str,
+        boq_id: str,
+        from_version: int,
+        to_version: int,
+        head: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Structural diff between two versions: changed top-level fields and
+        added, removed and changed line items with per-field old/new values.
+
+        Raises:
+            ValueError: If either version was never recorded
+        """
+        older = await self.get_version(db, user_id, boq_id, min(from_version, to_version), head)
+        if head is not None and head.get("version", 1) == max(from_version, to_version):
+            newer = await self.get_version(db, user_id, boq_id, max(from_version, to_version), head)
+        else:
+            # Rebuilding the newer version can reuse the older one as a starting point
+            newer = await self._replay(db, user_id, boq_id, max(from_version, to_version), dict(older))
+        before, after = (older, newer) if from_version <= to_version else (newer, older)
+
+        fields, unset = _field_changes(before, after)
+        lines = _compare_lines(before.get("lineItems") or [], after.get("lineItems") or [])
+        changed = []
+        for key in lines["changed"]:
+            old, new = lines["before"][key], lines["after"][key]
+            changed.append({
+                "key": key,
+                "itemNumber": new.get("itemNumber"),
+                "changes": {
+                    field: {"from": old.get(field), "to": new.get(field)}
+                    for field in sorted(set(old) | set(new)) if old.get(field) != new.get(field)
+                }
+            })
+        return {
+            "boqId": boq_id,
+            "from_version": from_version,
+            "to_version": to_version,
+            "fields": {
+                field: {"from": before.get(field), "to": after.get(field)}
+                for field in sorted(set(fields) | set(unset)) if field not in ("version", "updatedAt")
+            },
+            "lines": {
+                "added": [lines["after"][key] for key in lines["added"]],
+                "removed": [lines["before"][key] for key in lines["removed"]],
+                "changed": changed,
+                "reordered": lines["order"] is not None
+            },
+            "summary": {
+                "added": len(lines["added"]),
+                "removed": len(lines["removed"]),
+                "changed": len(changed)
+            }
+        }
+
+    async def delete_history(self, db: AsyncIOMotorDatabase, user_id: str, boq_id: str):
+        await db[VERSIONS_COLLECTION].delete_many({"boqId": boq_id, "userId": user_id})
+
+# Global instance
+boq_versions = BOQVersionStore()
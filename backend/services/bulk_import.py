@@ -0,0 +1,411 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterator, Optional, Tuple, BinaryIO
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import TypeAdapter, ValidationError
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from models import Vendor, VendorCreate
+from models_extended import Product, ProductCreate, Tender, TenderCreate
+from services.executors import executors, ExecutorSaturated
+from services.dashboard_rollups import dashboard_rollups
+from services.typeahead_index import typeahead_index
+from services.product_matcher import product_matcher
+from services.pdf_tools_service import UploadTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Rows validated and written per round-trip
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', '100000'))
+IMPORT_MAX_MB = int(os.getenv('IMPORT_MAX_MB', '50'))
+# Row errors listed in the report; later ones are only counted
+IMPORT_MAX_ERRORS = int(os.getenv('IMPORT_MAX_ERRORS', '1000'))
+
+IMPORT_FORMATS = ("csv", "xlsx", "ndjson")
+DUPLICATE_MODES = ("skip", "update")
+
+IMPORT_TARGETS: Dict[str, Dict[str, Any]] = {
+    "products": {"create": ProductCreate, "model": Product, "key": "productCode"},
+    "vendors": {"create": VendorCreate, "model": Vendor, "key": "gstin"},
+    "tenders": {"create": TenderCreate, "model": Tender, "key": "tenderNumber"}
+}
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+_LIST_SEPARATOR = re.compile(r"\s*[,;|]\s*")
+
+class ImportFileError(ValueError):
+    """The file as a whole cannot be read"""
+
+def _header_key(name: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(name).lower())
+
+def _xlsx_column(reference: str) -> int:
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+def _first_sheet(archive: zipfile.ZipFile) -> str:
+    try:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        sheet = workbook.find(f"{_XLSX_NS}sheets/{_XLSX_NS}sheet")
+        relations = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        for relation in relations:
+            if relation.get("Id") == sheet.get(f"{_REL_NS}id"):
+                target = relation.get("Target").lstrip("/")
+                return target if target.startswith("xl/") else f"xl/{target}"
+    except (KeyError, AttributeError, ET.ParseError):
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+def _xlsx_rows(source: BinaryIO) -> Iterator[List[Any]]:
+    """Cell values of the first worksheet, row by row, without loading the sheet"""
+    try:
+        archive = zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise ImportFileError("Not a valid .xlsx file")
+    with archive:
+        shared: List[str] = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            for _, element in ET.iterparse(archive.open("xl/sharedStrings.xml")):
+                if element.tag == f"{_XLSX_NS}si":
+                    shared.append("".join(text.text or "" for text in element.iter(f"{_XLSX_NS}t")))
+                    element.clear()
+        try:
+            sheet = archive.open(_first_sheet(archive))
+        except KeyError:
+            raise ImportFileError("The workbook has no worksheet")
+        for _, element in ET.iterparse(sheet):
+            if element.tag != f"{_XLSX_NS}row":
+                continue
+            values: List[Any] = []
+            for cell in element.findall(f"{_XLSX_NS}c"):
+                column = _xlsx_column(cell.get("r", "")) if cell.get("r") else len(values)
+                kind = cell.get("t")
+                raw = cell.findtext(f"{_XLSX_NS}v")
+                if kind == "s" and raw is not None:
+                    value = shared[int(raw)]
+                elif kind == "inlineStr":
+                    value = "".join(text.text or "" for text in cell.iter(f"{_XLSX_NS}t"))
+                elif kind == "b":
+                    value = raw == "1"
+                elif kind in ("str", "e") or raw is None:
+                    value = raw
+                else:
+                    value = float(raw)
+                values.extend([None] * (column - len(values)))
+                values.append(value)
+            element.clear()
+            yield values
+
+def _records(source: BinaryIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """(row number, dict or error message) for every data row; row 1 is the first record"""
+    if fmt == "ndjson":
+        number = 0
+        for line in io.TextIOWrapper(source, encoding="utf-8-sig"):
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+                yield number, record if isinstance(record, dict) else "Each line must be a JSON object"
+            except json.JSONDecodeError as e:
+                yield number, f"Invalid JSON: {e.msg}"
+        return
+
+    if fmt == "csv":
+        rows = csv.reader(io.TextIOWrapper(source, encoding="utf-8-sig", newline=""))
+    else:
+        rows = _xlsx_rows(source)
+    headers = next(rows, None)
+    if not headers:
+        raise ImportFileError("The file has no header row")
+    headers = [str(header).strip() if header is not None else "" for header in headers]
+    number = 0
+    for row in rows:
+        if not any(value not in (None, "") for value in row):
+            continue
+        number += 1
+        yield number, {header: value for header, value in zip(headers, row) if header}
+
+class _RowMapper:
+    """Maps flat file columns onto a create model's fields"""
+
+    def __init__(self, create_model: type):
+        self.fields = create_model.model_fields
+        self.by_key = {_header_key(name): name for name in self.fields}
+        self.kinds = {name: self._kind(str(info.annotation)) for name, info in self.fields.items()}
+        self.ignored: Dict[str, None] = {}
+
+    @staticmethod
+    def _kind(annotation: str) -> str:
+        for kind, markers in (("list", ("List", "list")), ("dict", ("Dict", "dict")), ("datetime", ("datetime",)), ("text", ("str",))):
+            if any(marker in annotation for marker in markers):
+                return kind
+        return "scalar"
+
+    def _cell(self, field: str, value: Any) -> Any:
+        kind = self.kinds[field]
+        if isinstance(value, str):
+            value = value.strip()
+            if kind == "list":
+                return [item for item in _LIST_SEPARATOR.split(value) if item]
+            if kind == "dict" and value.startswith("{"):
+                try:
+                    return json.loads(value)
+                except json.JSONDecodeError:
+                    return value
+            return value
+        if isinstance(value, float):
+            if kind == "datetime":
+                # Spreadsheet dates are day serials
+                return (_EXCEL_EPOCH + timedelta(days=value)).isoformat()
+            if kind == "text":
+                return str(int(value)) if value.is_integer() else str(value)
+        return value
+
+    def map(self, record: Dict[str, Any], flat: bool) -> Dict[str, Any]:
+        if not flat:
+            self.ignored.update((field, None) for field in record if field not in self.fields)
+            # Explicit nulls (e.g. from an NDJSON export) mean "not set", as empty cells do
+            return {field: value for field, value in record.items() if field in self.fields and value is not None}
+        row: Dict[str, Any] = {}
+        for header, value in record.items():
+            if value is None or value == "":
+                continue
+            # "spec.ram" / "specifications.ram" columns fill a dict field
+            prefix, _, sub_key = header.partition(".")
+            field = self.by_key.get(_header_key(header))
+            if field is None and sub_key:
+                parent = self.by_key.get(_header_key(prefix)) or ("specifications" if _header_key(prefix) == "spec" and "specifications" in self.fields else None)
+                if parent and self.kinds[parent] == "dict":
+                    row.setdefault(parent, {})[sub_key.strip()] = value
+                    continue
+            if field is None:
+                self.ignored[header] = None
+                continue
+            row[field] = self._cell(field, value)
+        return row
+
+class BulkImporter:
+    """
+    Bulk CSV / XLSX / NDJSON import for products, vendors and tenders.
+
+    Files are read as a stream (XLSX sheets with iterparse, not loaded
+    whole) and processed IMPORT_BATCH_SIZE rows at a time: each batch is
+    validated with one Pydantic list validation (falling back to per-row
+    errors only for batches that fail) and written with a single unordered
+    insert_many / bulk_write. Duplicates are caught by the unique
+    (userId, key) indexes instead of a lookup per row: productCode,
+    tenderNumber, and GSTIN for vendors. The result is a count summary
+    plus an error per rejected row.
+    """
+
+    def __init__(self):
+        self._adapters = {
+            target: TypeAdapter(List[spec["model"]]) for target, spec in IMPORT_TARGETS.items()
+        }
+
+    def detect_format(self, filename: Optional[str], fmt: Optional[str]) -> str:
+        """
+        Raises:
+            ValueError: If the format is unsupported or cannot be inferred
+        """
+        fmt = (fmt or os.path.splitext(filename or "")[1].lstrip(".")).lower()
+        fmt = {"jsonl": "ndjson"}.get(fmt, fmt)
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format '{fmt}', expected one of {', '.join(IMPORT_FORMATS)}")
+        return fmt
+
+    def _error(self, report: Dict[str, Any], row: int, message: str, duplicate: bool = False):
+        report["duplicates" if duplicate else "failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row, "error": message})
+        else:
+            report["errors_truncated"] = True
+
+    def _next_batch(
+        self,
+        records: Iterator[Tuple[int, Any]],
+        target: str,
+        mapper: _RowMapper,
+        flat: bool,
+        owner_id: str,
+        report: Dict[str, Any]
+    ) -> Optional[List[Tuple[int, Dict[str, Any], set]]]:
+        """Read and validate the next batch: [(row number, document, fields given)], or None when done"""
+        rows: List[Tuple[int, Dict[str, Any]]] = []
+        for number, record in records:
+            if number > IMPORT_MAX_ROWS:
+                report["truncated"] = True
+                break
+            report["received"] += 1
+            if isinstance(record, str):
+                self._error(report, number, record)
+            else:
+                rows.append((number, mapper.map(record, flat)))
+            if len(rows) >= IMPORT_BATCH_SIZE:
+                break
+        if not rows:
+            return None
+
+        adapter = self._adapters[target]
+        payload = [{**row, "userId": owner_id} for _, row in rows]
+        try:
+            models = adapter.validate_python(payload)
+        except ValidationError as e:
+            problems: Dict[int, List[str]] = {}
+            for error in e.errors():
+                location = ".".join(str(part) for part in error["loc"][1:])
+                problems.setdefault(error["loc"][0], []).append(f"{location}: {error['msg']}" if location else error["msg"])
+            for position, messages in problems.items():
+                self._error(report, rows[position][0], "; ".join(messages))
+            rows = [row for position, row in enumerate(rows) if position not in problems]
+            payload = [payload[position] for position in range(len(payload)) if position not in problems]
+            models = adapter.validate_python(payload) if payload else []
+
+        documents = []
+        for (number, row), model in zip(rows, models):
+            document = model.model_dump()
+            for field, value in document.items():
+                if isinstance(value, datetime):
+                    document[field] = value.isoformat()
+            documents.append((number, document, set(row)))
+        return documents
+
+    async def _read(self, *args) -> Optional[List[Tuple[int, Dict[str, Any], set]]]:
+        # Parsing and validation run on the io pool so large files do not stall the event loop
+        while True:
+            try:
+                return await executors.io.run(self._next_batch, *args)
+            except ExecutorSaturated:
+                await asyncio.sleep(0.2)
+
+    async def _write(
+        self,
+        db: AsyncIOMotorDatabase,
+        target: str,
+        owner_id: str,
+        batch: List[Tuple[int, Dict[str, Any], set]],
+        on_duplicate: str,
+        report: Dict[str, Any]
+    ):
+        key = IMPORT_TARGETS[target]["key"]
+        if on_duplicate == "update":
+            operations = []
+            for _, document, given in batch:
+                if document.get(key):
+                    updates = {field: document[field] for field in given if field in document}
+                    updates["updatedAt"] = document["updatedAt"]
+                    operations.append(UpdateOne(
+                        {"userId": owner_id, key: document[key]},
+                        {"$set": updates, "$setOnInsert": {field: value for field, value in document.items() if field not in updates}},
+                        upsert=True
+                    ))
+                else:
+                    operations.append(InsertOne(document))
+        else:
+            operations = [InsertOne(document) for _, document, _ in batch]
+
+        try:
+            result = (await db[target].bulk_write(operations, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            for error in result.get("writeErrors", []):
+                number, document, _ = batch[error["index"]]
+                if error.get("code") == 11000:
+                    self._error(report, number, f"Duplicate {key} '{document.get(key)}'", duplicate=True)
+                else:
+                    self._error(report, number, error.get("errmsg", "Write failed"))
+        report["inserted"] += result.get("nInserted", 0) + result.get("nUpserted", 0)
+        report["updated"] += result.get("nModified", 0)
+
+    async def import_file(
+        self,
+        db: AsyncIOMotorDatabase,
+        owner_id: str,
+        target: str,
+        source: BinaryIO,
+        fmt: str,
+        on_duplicate: str = "skip"
+    ) -> Dict[str, Any]:
+        """
+        Import every row of an uploaded file into the owner's collection
+
+        Raises:
+            ValueError: If the target, format or duplicate mode is invalid, or the file is unreadable
+        """
+        if target not in IMPORT_TARGETS:
+            raise ValueError(f"Cannot import into '{target}'")
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format '{fmt}', expected one of {', '.join(IMPORT_FORMATS)}")
+        if on_duplicate not in DUPLICATE_MODES:
+            raise ValueError(f"on_duplicate must be one of {', '.join(DUPLICATE_MODES)}")
+
+        report: Dict[str, Any] = {
+            "format": fmt, "received": 0, "inserted": 0, "updated": 0, "duplicates": 0, "failed": 0,
+            "errors": [], "errors_truncated": False, "truncated": False
+        }
+        mapper = _RowMapper(IMPORT_TARGETS[target]["create"])
+        records = _records(source, fmt)
+        try:
+            while True:
+                batch = await self._read(records, target, mapper, fmt != "ndjson", owner_id, report)
+                if batch is None:
+                    break
+                await self._write(db, target, owner_id, batch, on_duplicate, report)
+        except (UnicodeDecodeError, csv.Error, ET.ParseError) as e:
+            raise ImportFileError(f"Could not read the file after row {report['received']}: {e}")
+        finally:
+            if report["inserted"] or report["updated"]:
+                # Bulk writes bypass the per-document hooks; refresh the derived views instead
+                typeahead_index.invalidate(owner_id)
+                if target == "products":
+                    product_matcher.invalidate(owner_id)
+                await dashboard_rollups.rebuild(db, owner_id)
+
+        report["errors"].sort(key=lambda error: error["row"])
+        report["ignored_columns"] = list(mapper.ignored)[:100]
+        logger.info(
+            f"Imported {target} for {owner_id}: {report['inserted']} inserted, {report['updated']} updated, "
+            f"{report['duplicates']} duplicates, {report['failed']} failed"
+        )
+        return report
+
+    async def import_upload(
+        self,
+        db: AsyncIOMotorDatabase,
+        owner_id: str,
+        target: str,
+        upload: Any,
+        fmt: Optional[str] = None,
+        on_duplicate: str = "skip"
+    ) -> Dict[str, Any]:
+        """
+        Import a FastAPI UploadFile; the format defaults to the file extension
+
+        Raises:
+            UploadTooLarge: If the file exceeds IMPORT_MAX_MB
+            ValueError: If the format or options are invalid, or the file is unreadable
+        """
+        if upload.size is not None and upload.size > IMPORT_MAX_MB * 1024 * 1024:
+            raise UploadTooLarge(f"File exceeds the {IMPORT_MAX_MB} MB import limit")
+        fmt = self.detect_format(upload.filename, fmt)
+        report = await self.import_file(db, owner_id, target, upload.file, fmt, on_duplicate)
+        return {"filename": upload.filename, **report}
+
+# Global instance
+bulk_importer = BulkImporter()
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.index_registry import index_registry
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "dashboard_rollups"
+
+index_registry.register(ROLLUP_COLLECTION, "userId", unique=True)
+
+def _status_key(value: Any) -> str:
+    value = getattr(value, "value", value) or "unknown"
+    return str(value).replace(".", "_").replace("$", "_")
+
+def _contributions(collection: str, doc: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Counters a single document adds to its owner's rollup"""
+    if not doc:
+        return {}
+
+    if collection == "tenders":
+        value = doc.get("tenderValue")
+        return {
+            "tenders.total": 1,
+            f"tenders.byStatus.{_status_key(doc.get('status'))}": 1,
+            "tenders.totalValue": value if isinstance(value, (int, float)) else 0
+        }
+    if collection == "rfqs":
+        return {"rfqs.total": 1, f"rfqs.byStatus.{_status_key(doc.get('status'))}": 1}
+    if collection == "boqs":
+        return {"boqs.total": 1}
+    if collection in ("vendors", "products"):
+        return {f"{collection}.total": 1} if doc.get("isActive", True) else {}
+    return {}
+
+class DashboardRollups:
+    """
+    Materialized per-user dashboard counters.
+
+    Write paths report (before, after) document pairs and the rollup is
+    adjusted with a single $inc. A missing rollup is rebuilt from the source
+    collections on the next read; rebuild_all() backfills every user.
+    """
+
+    async def record_change(
+        self,
+        db: AsyncIOMotorDatabase,
+        collection: str,
+        user_id: str,
+        before: Optional[Dict[str, Any]],
+        after: Optional[Dict[str, Any]]
+    ):
+        """Apply the counter delta between two versions of a document (None = absent)"""
+        delta = _contributions(collection, after)
+        for key, value in _contributions(collection, before).items():
+            delta[key] = delta.get(key, 0) - value
+        delta = {key: value for key, value in delta.items() if value}
+        if not delta:
+            return
+
+        try:
+            # No upsert: a partial rollup would be wrong, the next read rebuilds it instead
+            await db[ROLLUP_COLLECTION].update_one(
+                {"userId": user_id},
+                {"$inc": delta, "$set": {"updatedAt": datetime.now(timezone.utc).isoformat()}}
+            )
+        except Exception as e:
+            logger.error(f"Failed to update dashboard rollup for {user_id}: {e}")
+
+    async def _count_by_status(self, db: AsyncIOMotorDatabase, collection: str, match: Dict[str, Any], value_field: str = None) -> Dict[str, Any]:
+        group = {"_id": "$status", "count": {"$sum": 1}}
+        if value_field:
+            group["value"] = {"$sum": f"${value_field}"}
+
+        by_status, total, total_value = {}, 0, 0.0
+        async for row in db[collection].aggregate([{"$match": match}, {"$group": group}]):
+            by_status[_status_key(row["_id"])] = row["count"]
+            total += row["count"]
+            total_value += row.get("value") or 0
+        return {"total": total, "byStatus": by_status, "totalValue": total_value}
+
+    async def rebuild(self, db: AsyncIOMotorDatabase, user_id: str) -> Dict[str, Any]:
+        """Recompute a user's rollup from the source collections (one round-trip per collection, run concurrently)"""
+        tenders, rfqs, boqs, vendors, products, company = await asyncio.gather(
+            self._count_by_status(db, "tenders", {"userId": user_id}, "tenderValue"),
+            self._count_by_status(db, "rfqs", {"userId": user_id}),
+            db.boqs.count_documents({"userId": user_id}),
+            db.vendors.count_documents({"userId": user_id, "isActive": True}),
+            db.products.count_documents({"userId": user_id, "isActive": True}),
+            db.companies.find_one({"userId": user_id}, {"_id": 0, "teamMembers": 1})
+        )
+
+        rollup = {
+            "userId": user_id,
+            "tenders": tenders,
+            "rfqs": {"total": rfqs["total"], "byStatus": rfqs["byStatus"]},
+            "boqs": {"total": boqs},
+            "vendors": {"total": vendors},
+            "products": {"total": products},
+            "team": {"size": len(company.get("teamMembers", [])) if company else 0},
+            "rebuiltAt": datetime.now(timezone.utc).isoformat(),
+            "updatedAt": datetime.now(timezone.utc).isoformat()
+        }
+        await db[ROLLUP_COLLECTION].replace_one({"userId": user_id}, rollup, upsert=True)
+        return rollup
+
+    async def get(self, db: AsyncIOMotorDatabase, user_id: str) -> Dict[str, Any]:
+        """Read a user's rollup, building it on first access"""
+        rollup = await db[ROLLUP_COLLECTION].find_one({"userId": user_id}, {"_id": 0})
+        if rollup is None:
+            rollup = await self.rebuild(db, user_id)
+        return rollup
+
+    async def rebuild_all(self, db: AsyncIOMotorDatabase, concurrency: int = 8) -> Dict[str, Any]:
+        """Backfill rollups for every user"""
+        semaphore = asyncio.Semaphore(concurrency)
+        rebuilt, failed = 0, 0
+
+        async def _rebuild(user_id: str):
+            nonlocal rebuilt, failed
+            async with semaphore:
+                try:
+                    await self.rebuild(db, user_id)
+                    rebuilt += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Failed to rebuild dashboard rollup for {user_id}: {e}")
+
+        batch = []
+        async for user in db.users.find({}, {"_id": 0, "id": 1}):
+            batch.append(_rebuild(user["id"]))
+            if len(batch) >= concurrency * 10:
+                await asyncio.gather(*batch)
+                batch = []
+        await asyncio.gather(*batch)
+
+        logger.info(f"Rebuilt {rebuilt} dashboard rollups ({failed} failed)")
+        return {"rebuilt": rebuilt, "failed": failed}
+
+# Global instance
+dashboard_rollups = DashboardRollups()
@@ -0,0 +1,353 @@
+import csv
+import io
+import json
+import logging
+import os
+import zipfile
+from typing import Dict, Any, List, AsyncIterator, Optional, Union, get_args, get_origin
+from xml.sax.saxutils import escape
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from models import Vendor
+from models_extended import Tender, Alert
+from models_gem import BidSubmission
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Documents fetched per cursor round-trip and written per chunk
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_MAX_BATCH_SIZE = int(os.getenv('EXPORT_MAX_BATCH_SIZE', '10000'))
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# name -> collection, owner field, sort (ending on _id like the list endpoints), row model
+EXPORT_SOURCES: Dict[str, Dict[str, Any]] = {
+    "tenders": {"collection": "tenders", "owner": "userId", "sort": [("createdAt", -1), ("_id", -1)], "model": Tender},
+    "vendors": {"collection": "vendors", "owner": "userId", "sort": [("companyName", 1), ("_id", 1)], "model": Vendor},
+    "bids": {"collection": "bid_submissions", "owner": "user_id", "sort": [("_id", -1)], "model": BidSubmission},
+    "alerts": {"collection": "alerts", "owner": "userId", "sort": [("createdAt", -1), ("_id", -1)], "model": Alert}
+}
+
+def _column_type(annotation: Any) -> str:
+    # Optional[X] is Union[X, None]
+    if get_origin(annotation) is Union:
+        annotation = next((arg for arg in get_args(annotation) if arg is not type(None)), str)
+    if annotation is bool:
+        return "bool"
+    if annotation in (int, float):
+        return "number"
+    return "text"
+
+def source_columns(source: str) -> Dict[str, str]:
+    """Exportable fields of a source and their column types"""
+    spec = EXPORT_SOURCES[source]
+    return {
+        field: _column_type(info.annotation)
+        for field, info in spec["model"].model_fields.items() if field != spec["owner"]
+    }
+
+def _text(value: Any) -> Optional[str]:
+    """Flat-file rendering of a stored value: lists joined with '; ', objects as JSON"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return "; ".join(json.dumps(item, default=str) if isinstance(item, (dict, list)) else str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, default=str)
+    return str(value)
+
+# Leading characters that make spreadsheet apps evaluate a CSV cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_cell(value: Any) -> Optional[str]:
+    """Flat-file text with formula-like strings prefixed by ' so they open as text (portal data is untrusted)"""
+    text = _text(value)
+    if text and not isinstance(value, (int, float)) and text.startswith(_FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+class _Sink(io.RawIOBase):
+    """Write-only stream whose contents are handed out chunk by chunk"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class _CsvWriter:
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = list(columns)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def _take(self) -> bytes:
+        data = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def start(self) -> bytes:
+        # BOM so spreadsheet apps open the file as UTF-8
+        self.writer.writerow(self.columns)
+        return b"\xef\xbb\xbf" + self._take()
+
+    def rows(self, documents: List[Dict[str, Any]]) -> bytes:
+        self.writer.writerows([_csv_cell(document.get(column)) for column in self.columns] for document in documents)
+        return self._take()
+
+    def finish(self) -> bytes:
+        return b""
+
+class _NdjsonWriter:
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = list(columns)
+
+    def start(self) -> bytes:
+        return b""
+
+    def rows(self, documents: List[Dict[str, Any]]) -> bytes:
+        return "".join(
+            json.dumps({column: document.get(column) for column in self.columns}, default=str) + "\n"
+            for document in documents
+        ).encode("utf-8")
+
+    def finish(self) -> bytes:
+        return b""
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Cell styles: 0 general, 1 bold (header row)
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+}
+
+def _xlsx_cell(value: Any, kind: str) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if kind == "number" and isinstance(value, (int, float)) and not isinstance(value, bool) and value == value:
+        return f"<c><v>{value!r}</v></c>"
+    if kind == "bool" and isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_text(value))}</t></is></c>'
+
+class _XlsxWriter:
+    """SpreadsheetML written into a zip on a non-seekable sink, so each batch can be sent as it is compressed"""
+
+    def __init__(self, columns: Dict[str, str], sheet_name: str):
+        self.columns = columns
+        self.sheet_name = sheet_name
+        self.sink = _Sink()
+
+    def start(self) -> bytes:
+        self.package = zipfile.ZipFile(self.sink, "w", zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_PARTS.items():
+            self.package.writestr(name, content)
+        self.package.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(self.sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        self.sheet = self.package.open("xl/worksheets/sheet1.xml", "w")
+        header = "".join(
+            f'<c t="inlineStr" s="1"><is><t>{escape(column)}</t></is></c>' for column in self.columns
+        )
+        self.sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+            f'<sheetData><row>{header}</row>'
+        ).encode("utf-8"))
+        return self.sink.drain()
+
+    def rows(self, documents: List[Dict[str, Any]]) -> bytes:
+        self.sheet.write("".join(
+            "<row>" + "".join(_xlsx_cell(document.get(column), kind) for column, kind in self.columns.items()) + "</row>"
+            for document in documents
+        ).encode("utf-8"))
+        return self.sink.drain()
+
+    def finish(self) -> bytes:
+        self.sheet.write(b"</sheetData></worksheet>")
+        self.sheet.close()
+        self.package.close()
+        return self.sink.drain()
+
+class _ParquetWriter:
+    """One row group per batch; text columns hold the flat-file rendering of lists and objects"""
+
+    def __init__(self, columns: Dict[str, str]):
+        self.columns = columns
+        types = {"number": pa.float64(), "bool": pa.bool_(), "text": pa.string()}
+        self.schema = pa.schema([(column, types[kind]) for column, kind in columns.items()])
+        self.sink = _Sink()
+
+    def start(self) -> bytes:
+        self.writer = pq.ParquetWriter(pa.PythonFile(self.sink, mode="w"), self.schema)
+        return self.sink.drain()
+
+    def _value(self, value: Any, kind: str) -> Any:
+        if value is None:
+            return None
+        if kind == "number":
+            return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+        if kind == "bool":
+            return value if isinstance(value, bool) else None
+        return _text(value)
+
+    def rows(self, documents: List[Dict[str, Any]]) -> bytes:
+        table = pa.Table.from_pydict({
+            column: [self._value(document.get(column), kind) for document in documents]
+            for column, kind in self.columns.items()
+        }, schema=self.schema)
+        self.writer.write_table(table)
+        return self.sink.drain()
+
+    def finish(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+class DataExporter:
+    """
+    Streaming exports of a user's tenders, vendors, bids and alerts.
+
+    Documents are read from a Motor cursor batch_size at a time, with a
+    projection limited to the requested columns, and each batch is encoded
+    and handed to the response before the next is fetched, so memory stays
+    bounded by one batch whatever the result size. CSV and NDJSON are
+    plain text; XLSX is SpreadsheetML compressed straight into a zip on a
+    non-seekable sink; Parquet writes one row group per batch and needs
+    pyarrow.
+    """
+
+    def prepare(
+        self,
+        source: str,
+        fmt: str,
+        fields: Optional[str] = None,
+        batch_size: int = EXPORT_BATCH_SIZE
+    ) -> Dict[str, Any]:
+        """
+        Validate an export request and resolve its columns; fields is a
+        comma-separated list and defaults to every field of the source
+
+        Raises:
+            ValueError: If the format, fields or batch size is invalid
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+        if fmt == "parquet" and pa is None:
+            raise ValueError("Parquet export is not available on this server (pyarrow is not installed)")
+        if not 1 <= batch_size <= EXPORT_MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {EXPORT_MAX_BATCH_SIZE}")
+        available = source_columns(source)
+        fields = [field.strip() for field in (fields or "").split(",") if field.strip()]
+        if fields:
+            unknown = [field for field in fields if field not in available]
+            if unknown:
+                raise ValueError(f"Unknown {source} fields: {', '.join(unknown)}")
+            columns = {field: available[field] for field in dict.fromkeys(fields)}
+        else:
+            columns = available
+        return {
+            "source": source,
+            "format": fmt,
+            "columns": columns,
+            "batch_size": batch_size,
+            "media_type": EXPORT_FORMATS[fmt],
+            "file_name": f"{source}.{fmt}"
+        }
+
+    def _writer(self, plan: Dict[str, Any]):
+        if plan["format"] == "csv":
+            return _CsvWriter(plan["columns"])
+        if plan["format"] == "ndjson":
+            return _NdjsonWriter(plan["columns"])
+        if plan["format"] == "xlsx":
+            return _XlsxWriter(plan["columns"], plan["source"].capitalize())
+        return _ParquetWriter(plan["columns"])
+
+    async def stream(self, db: AsyncIOMotorDatabase, plan: Dict[str, Any], query: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Encoded export chunks for every document matching query (which must already scope the owner)"""
+        spec = EXPORT_SOURCES[plan["source"]]
+        projection = {"_id": 0, **{column: 1 for column in plan["columns"]}}
+        cursor = db[spec["collection"]].find(query, projection).sort(spec["sort"]).batch_size(plan["batch_size"])
+        writer = self._writer(plan)
+        exported = 0
+        try:
+            yield writer.start()
+            batch: List[Dict[str, Any]] = []
+            async for document in cursor:
+                batch.append(document)
+                if len(batch) >= plan["batch_size"]:
+                    yield writer.rows(batch)
+                    exported += len(batch)
+                    batch = []
+            if batch:
+                yield writer.rows(batch)
+                exported += len(batch)
+            yield writer.finish()
+        finally:
+            # The client may disconnect mid-stream
+            await cursor.close()
+            logger.info(f"Exported {exported} {plan['source']} as {plan['format']}")
+
+# Global instance
+data_exporter = DataExporter()
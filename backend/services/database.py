@@ -0,0 +1,146 @@
+import logging
+import threading
+from typing import Dict, Any
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from config.mongo_config import (
+    MONGO_URL, DB_NAME, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_READ_PREFERENCE
+)
+
+logger = logging.getLogger(__name__)
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Collects connection pool counters per server address from PyMongo CMAP events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, Dict[str, int]] = {}
+
+    def _server(self, address) -> Dict[str, int]:
+        key = f"{address[0]}:{address[1]}"
+        if key not in self._servers:
+            self._servers[key] = {
+                "open": 0,
+                "checked_out": 0,
+                "waiting": 0,
+                "peak_checked_out": 0,
+                "peak_waiting": 0,
+                "total_checkouts": 0,
+                "checkout_timeouts": 0,
+                "checkout_errors": 0,
+                "pool_clears": 0
+            }
+        return self._servers[key]
+
+    def pool_created(self, event):
+        with self._lock:
+            self._server(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event.address)["pool_clears"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._servers.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._server(event.address)["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["open"] = max(0, server["open"] - 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["waiting"] += 1
+            server["peak_waiting"] = max(server["peak_waiting"], server["waiting"])
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["waiting"] = max(0, server["waiting"] - 1)
+            if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+                server["checkout_timeouts"] += 1
+            else:
+                server["checkout_errors"] += 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            logger.warning(f"MongoDB pool exhausted for {event.address[0]}:{event.address[1]} - checkout timed out")
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["waiting"] = max(0, server["waiting"] - 1)
+            server["checked_out"] += 1
+            server["total_checkouts"] += 1
+            server["peak_checked_out"] = max(server["peak_checked_out"], server["checked_out"])
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            server = self._server(event.address)
+            server["checked_out"] = max(0, server["checked_out"] - 1)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {address: dict(counters) for address, counters in self._servers.items()}
+
+class DatabaseService:
+    """Owns the process-wide MongoDB client and its connection pool"""
+
+    def __init__(self):
+        self.pool_metrics = PoolMetricsListener()
+        self.client = AsyncIOMotorClient(
+            MONGO_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            readPreference=MONGO_READ_PREFERENCE,
+            event_listeners=[self.pool_metrics]
+        )
+        self.db: AsyncIOMotorDatabase = self.client[DB_NAME]
+
+    async def ping(self) -> bool:
+        """Check that the database is reachable"""
+        await self.db.command('ping')
+        return True
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool configuration plus live usage counters and saturation per server"""
+        servers = self.pool_metrics.snapshot()
+        for counters in servers.values():
+            counters["saturation"] = round(counters["checked_out"] / MONGO_MAX_POOL_SIZE, 3)
+
+        return {
+            "config": {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "min_pool_size": MONGO_MIN_POOL_SIZE,
+                "max_idle_time_ms": MONGO_MAX_IDLE_TIME_MS,
+                "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                "read_preference": MONGO_READ_PREFERENCE
+            },
+            "servers": servers
+        }
+
+    def close(self):
+        """Close the client and release all pooled connections"""
+        self.client.close()
+        logger.info("MongoDB client closed")
+
+# Global instance
+database_service = DatabaseService()
+
+def get_db() -> AsyncIOMotorDatabase:
+    """FastAPI dependency returning the shared database handle"""
+    return database_service.db
@@ -0,0 +1,142 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import uuid
+import zipfile
+from typing import Dict, Any, List, Optional
+from services.executors import executors, ExecutorSaturated
+from services.pdf_tools_service import pdf_tools_service
+from utils.document_templates import (
+    TEMPLATE_SPECS, TEMPLATE_FORMATS, template_fields, render_documents
+)
+
+logger = logging.getLogger(__name__)
+
+# Documents rendered per process-pool task
+DOCUMENT_BATCH_CHUNK = int(os.getenv('DOCUMENT_BATCH_CHUNK', '25'))
+DOCUMENT_BATCH_MAX = int(os.getenv('DOCUMENT_BATCH_MAX', '1000'))
+
+MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+    "zip": "application/zip"
+}
+
+class DocumentGenerator:
+    """
+    Batch rendering of compiled document templates.
+
+    Batches are split into DOCUMENT_BATCH_CHUNK-sized slices rendered in
+    parallel on the cpu process pool; each worker compiles a template once
+    and reuses it for every later slice. Output goes either to disk under
+    UPLOAD_DIR/<user>/documents/<batch id>/ (so PDFs can be fed straight into
+    the PDF tools and bid packages, and are swept with other uploads) or back
+    to the caller in memory.
+    """
+
+    def templates(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": name, "title": spec["title"], "formats": list(TEMPLATE_FORMATS), **template_fields(name)}
+            for name, spec in TEMPLATE_SPECS.items()
+        ]
+
+    def _validate(self, template: str, fmt: str, contexts: List[Dict[str, Any]]):
+        if template not in TEMPLATE_SPECS:
+            raise ValueError(f"Unknown template '{template}', expected one of {', '.join(TEMPLATE_SPECS)}")
+        if fmt not in TEMPLATE_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(TEMPLATE_FORMATS)}")
+        if not contexts:
+            raise ValueError("Nothing to render")
+        if len(contexts) > DOCUMENT_BATCH_MAX:
+            raise ValueError(f"A batch can render at most {DOCUMENT_BATCH_MAX} documents")
+
+    def batch_dir(self, owner_id: str, batch_id: str) -> str:
+        """
+        Output directory of a batch
+
+        Raises:
+            ValueError: If the owner or batch id is malformed
+        """
+        if not owner_id or os.path.basename(owner_id) != owner_id or owner_id.startswith("."):
+            raise ValueError("Invalid document owner")
+        if not re.fullmatch(r"[0-9a-f-]{36}", batch_id or ""):
+            raise ValueError("Invalid batch id")
+        return os.path.join(pdf_tools_service.UPLOAD_DIR, owner_id, "documents", batch_id)
+
+    async def _render_chunk(self, template: str, fmt: str, contexts: List[Dict[str, Any]], start: int, output_dir: Optional[str]):
+        # Large batches queue behind interactive work instead of failing halfway
+        while True:
+            try:
+                return await executors.cpu.run(render_documents, template, fmt, contexts, start, output_dir)
+            except ExecutorSaturated:
+                await asyncio.sleep(0.5)
+
+    async def _render_all(self, template: str, fmt: str, contexts: List[Dict[str, Any]], output_dir: Optional[str]) -> List[Dict[str, Any]]:
+        chunks = await asyncio.gather(*[
+            self._render_chunk(template, fmt, contexts[start:start + DOCUMENT_BATCH_CHUNK], start, output_dir)
+            for start in range(0, len(contexts), DOCUMENT_BATCH_CHUNK)
+        ])
+        return [result for chunk in chunks for result in chunk]
+
+    async def render(self, template: str, fmt: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Render one document into memory: {'file_name', 'media_type', 'buffer'}
+
+        Raises:
+            ValueError: If the template or format is unknown
+        """
+        self._validate(template, fmt, [context])
+        result = (await self._render_chunk(template, fmt, [context], 0, None))[0]
+        return {"file_name": result["file_name"][5:], "media_type": MEDIA_TYPES[fmt], "buffer": io.BytesIO(result["content"])}
+
+    async def render_batch(
+        self,
+        owner_id: str,
+        template: str,
+        fmt: str,
+        contexts: List[Dict[str, Any]],
+        in_memory: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Render one document per context. On disk, returns the batch id and
+        each file's name, path and size; in memory, returns a zip of all
+        documents in 'buffer' instead.
+
+        Raises:
+            ValueError: If the template, format or batch size is invalid
+        """
+        self._validate(template, fmt, contexts)
+        if in_memory:
+            results = await self._render_all(template, fmt, contexts, None)
+            buffer = io.BytesIO()
+            # DOCX and PDF are already compressed, so entries are stored
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+                for result in results:
+                    archive.writestr(result["file_name"], result["content"])
+            buffer.seek(0)
+            return {"count": len(results), "file_name": f"{template}_{fmt}.zip", "media_type": MEDIA_TYPES["zip"], "buffer": buffer}
+
+        batch_id = str(uuid.uuid4())
+        output_dir = self.batch_dir(owner_id, batch_id)
+        os.makedirs(output_dir, exist_ok=True)
+        results = await self._render_all(template, fmt, contexts, output_dir)
+        for result in results:
+            result["file_path"] = os.path.join(output_dir, result["file_name"])
+        return {"batch_id": batch_id, "template": template, "format": fmt, "count": len(results), "files": results}
+
+    def batch_file(self, owner_id: str, batch_id: str, file_name: str) -> Optional[str]:
+        """
+        Path of a rendered document, or None if it does not exist
+
+        Raises:
+            ValueError: If the batch id or file name is malformed
+        """
+        if os.path.basename(file_name) != file_name or file_name.startswith("."):
+            raise ValueError("Invalid file name")
+        path = os.path.join(self.batch_dir(owner_id, batch_id), file_name)
+        return path if os.path.isfile(path) else None
+
+# Global instance
+document_generator = DocumentGenerator()
@@ -0,0 +1,141 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, Callable, Optional
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_IO_WORKERS = int(os.getenv('EXECUTOR_IO_WORKERS', '16'))
+EXECUTOR_IO_QUEUE_LIMIT = int(os.getenv('EXECUTOR_IO_QUEUE_LIMIT', '64'))
+EXECUTOR_NOTIFICATION_WORKERS = int(os.getenv('EXECUTOR_NOTIFICATION_WORKERS', '4'))
+EXECUTOR_NOTIFICATION_QUEUE_LIMIT = int(os.getenv('EXECUTOR_NOTIFICATION_QUEUE_LIMIT', '200'))
+EXECUTOR_CPU_WORKERS = int(os.getenv('EXECUTOR_CPU_WORKERS', str(os.cpu_count() or 2)))
+EXECUTOR_CPU_QUEUE_LIMIT = int(os.getenv('EXECUTOR_CPU_QUEUE_LIMIT', '16'))
+# spawn avoids forking a process that holds Motor's threads and sockets
+EXECUTOR_PROCESS_START_METHOD = os.getenv('EXECUTOR_PROCESS_START_METHOD', 'spawn')
+EXECUTOR_RETRY_AFTER_SECONDS = int(os.getenv('EXECUTOR_RETRY_AFTER_SECONDS', '5'))
+
+class ExecutorSaturated(HTTPException):
+    """Raised when a pool's queue is full; surfaces to the client as 429 Too Many Requests"""
+
+    def __init__(self, pool: str):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Server is busy ({pool} workers saturated), please retry shortly",
+            headers={"Retry-After": str(EXECUTOR_RETRY_AFTER_SECONDS)}
+        )
+        self.pool = pool
+
+class BoundedPool:
+    """
+    Thread or process pool with a cap on queued work.
+
+    At most max_workers calls run at once and at most max_queue more wait
+    for a worker; anything beyond that is rejected immediately instead of
+    piling up behind a slow job.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        self.in_flight = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "peak_queue_depth": 0}
+        self._busy_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(EXECUTOR_PROCESS_START_METHOD)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"hexabid-{self.name}")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) on the pool and await its result.
+        Process pools need fn and its arguments to be picklable.
+
+        Raises:
+            ExecutorSaturated: If the pool and its queue are full
+        """
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.stats["rejected"] += 1
+            logger.warning(f"Executor pool '{self.name}' saturated ({self.in_flight} in flight)")
+            raise ExecutorSaturated(self.name)
+
+        self.in_flight += 1
+        self.stats["submitted"] += 1
+        self.stats["peak_queue_depth"] = max(self.stats["peak_queue_depth"], self.queue_depth)
+        started = time.monotonic()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+            self.stats["completed"] += 1
+            return result
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._busy_seconds += time.monotonic() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        finished = self.stats["completed"] + self.stats["failed"]
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(self.in_flight, self.max_workers),
+            "queue_depth": self.queue_depth,
+            **self.stats,
+            "avg_latency_ms": round(self._busy_seconds / finished * 1000, 1) if finished else 0.0
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+class ExecutorPools:
+    """
+    Pools for keeping blocking work off the event loop.
+
+    io: scrapers and synchronous analytics services
+    notifications: SMTP / WhatsApp sends, kept apart so a slow mail server cannot starve io
+    cpu: process pool for PDF and OCR work
+    """
+
+    def __init__(self):
+        self.io = BoundedPool("io", "thread", EXECUTOR_IO_WORKERS, EXECUTOR_IO_QUEUE_LIMIT)
+        self.notifications = BoundedPool("notifications", "thread", EXECUTOR_NOTIFICATION_WORKERS, EXECUTOR_NOTIFICATION_QUEUE_LIMIT)
+        self.cpu = BoundedPool("cpu", "process", EXECUTOR_CPU_WORKERS, EXECUTOR_CPU_QUEUE_LIMIT)
+
+    def pools(self) -> Dict[str, BoundedPool]:
+        return {pool.name: pool for pool in (self.io, self.notifications, self.cpu)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: pool.get_stats() for name, pool in self.pools().items()}
+
+    def shutdown(self):
+        for pool in self.pools().values():
+            pool.shutdown()
+
+# Global instance
+executors = ExecutorPools()
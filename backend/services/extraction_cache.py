@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Iterable
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', '/tmp/hexabid_extraction_cache')
+EXTRACTION_CACHE_MAX_MB = int(os.getenv('EXTRACTION_CACHE_MAX_MB', '1024'))
+
+_MANIFEST = "document.json"
+
+class ExtractionCache:
+    """
+    Content-addressed cache of per-page extraction results on disk.
+
+    Entries live under <sha256 of file bytes>/<engine + parameters>/page-N.json
+    (page-N.png and the like for rendered pages), so the same document uploaded
+    by different users, or under a different name, is only extracted once per
+    engine configuration. Total size is capped with least-recently-used eviction.
+
+    Each API worker keeps its own LRU index of the shared directory (rebuilt
+    from file mtimes on first use), so the cap is enforced approximately when
+    several workers write at once.
+    """
+
+    def __init__(self, root: str = EXTRACTION_CACHE_DIR, max_bytes: int = EXTRACTION_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._index: Optional[OrderedDict] = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def file_digest(file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def variant(engine: str, params: Dict[str, Any]) -> str:
+        """Directory name for an engine configuration, e.g. tesseract-dpi=200-lang=eng-psm=None"""
+        return "-".join([engine] + [f"{key}={params[key]}" for key in sorted(params)]).replace(os.sep, "_")
+
+    def _dir(self, digest: str, engine: str, params: Dict[str, Any]) -> str:
+        return os.path.join(self.root, digest[:2], digest, self.variant(engine, params))
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((path, size) for _, path, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+
+    def _touch(self, path: str):
+        if path in self._index:
+            self._index.move_to_end(path)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                self._total_bytes -= self._index.pop(path)
+
+    def _read(self, path: str) -> Optional[Any]:
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        self._touch(path)
+        return value
+
+    def _write(self, path: str, value: Any):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        self._total_bytes += size - self._index.pop(path, 0)
+        self._index[path] = size
+        self.stats["writes"] += 1
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            path, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_pages(self, digest: str, engine: str, params: Dict[str, Any], pages: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Cached results for the requested pages (missing pages are left out)"""
+        with self._lock:
+            self._load_index()
+            directory = self._dir(digest, engine, params)
+            found = {}
+            for page in pages:
+                value = self._read(os.path.join(directory, f"page-{page}.json"))
+                if value is None:
+                    self.stats["misses"] += 1
+                else:
+                    self.stats["hits"] += 1
+                    found[page] = value
+            return found
+
+    def set_pages(self, digest: str, engine: str, params: Dict[str, Any], results: List[Dict[str, Any]]):
+        """Store per-page results (each carries its 'page' number)"""
+        with self._lock:
+            self._load_index()
+            directory = self._dir(digest, engine, params)
+            for result in results:
+                self._write(os.path.join(directory, f"page-{result['page']}.json"), result)
+            self._evict()
+
+    def get_document(self, digest: str, engine: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Every page of a document, or None unless the whole document is cached"""
+        with self._lock:
+            self._load_index()
+            manifest = self._read(os.path.join(self._dir(digest, engine, params), _MANIFEST))
+        if manifest is None:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        pages = self.get_pages(digest, engine, params, range(1, manifest["num_pages"] + 1))
+        if len(pages) < manifest["num_pages"]:
+            return None
+        return [pages[page] for page in sorted(pages)]
+
+    def set_document(self, digest: str, engine: str, params: Dict[str, Any], results: List[Dict[str, Any]]):
+        """Store a whole document's pages plus a manifest recording its page count"""
+        self.set_pages(digest, engine, params, results)
+        with self._lock:
+            self._write(os.path.join(self._dir(digest, engine, params), _MANIFEST), {"num_pages": len(results)})
+            self._evict()
+
+    def get_files(self, digest: str, engine: str, params: Dict[str, Any], names: Iterable[str]) -> Dict[str, str]:
+        """Paths of cached binary artifacts (e.g. rendered pages) by file name; missing names are left out"""
+        with self._lock:
+            self._load_index()
+            directory = self._dir(digest, engine, params)
+            found = {}
+            for name in names:
+                path = os.path.join(directory, name)
+                if path in self._index and os.path.exists(path):
+                    self._touch(path)
+                    self.stats["hits"] += 1
+                    found[name] = path
+                else:
+                    self.stats["misses"] += 1
+            return found
+
+    def put_file(self, digest: str, engine: str, params: Dict[str, Any], name: str, source_path: str) -> str:
+        """Move a finished artifact into the cache and return its cached path"""
+        with self._lock:
+            self._load_index()
+            path = os.path.join(self._dir(digest, engine, params), name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.move(source_path, path)
+            size = os.path.getsize(path)
+            self._total_bytes += size - self._index.pop(path, 0)
+            self._index[path] = size
+            self.stats["writes"] += 1
+            self._evict()
+            return path
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._load_index()
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+# Global instance
+extraction_cache = ExtractionCache()
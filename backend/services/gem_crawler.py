@@ -0,0 +1,448 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+import httpx
+from cachetools import LRUCache
+from lxml import etree
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from models_extended import Tender, TenderSource
+from services.dashboard_rollups import dashboard_rollups
+from services.executors import executors
+from services.gem_scraper import gem_scraper
+from services.index_registry import index_registry
+from services.typeahead_index import typeahead_index
+
+logger = logging.getLogger(__name__)
+
+# Off by default: development and tests use the mock data in gem_scraper
+GEM_CRAWLER_ENABLED = os.getenv('GEM_CRAWLER_ENABLED', 'false').lower() == 'true'
+GEM_CRAWLER_BASE_URL = os.getenv('GEM_CRAWLER_BASE_URL', 'https://bidplus.gem.gov.in')
+GEM_CRAWLER_MAX_CONNECTIONS = int(os.getenv('GEM_CRAWLER_MAX_CONNECTIONS', '20'))
+GEM_CRAWLER_PER_HOST_CONCURRENCY = int(os.getenv('GEM_CRAWLER_PER_HOST_CONCURRENCY', '4'))
+GEM_CRAWLER_RATE_PER_SECOND = float(os.getenv('GEM_CRAWLER_RATE_PER_SECOND', '2'))
+GEM_CRAWLER_BURST = int(os.getenv('GEM_CRAWLER_BURST', '4'))
+GEM_CRAWLER_MAX_RETRIES = int(os.getenv('GEM_CRAWLER_MAX_RETRIES', '4'))
+GEM_CRAWLER_BACKOFF_SECONDS = float(os.getenv('GEM_CRAWLER_BACKOFF_SECONDS', '0.5'))
+GEM_CRAWLER_MAX_BACKOFF_SECONDS = float(os.getenv('GEM_CRAWLER_MAX_BACKOFF_SECONDS', '30'))
+GEM_CRAWLER_TIMEOUT_SECONDS = float(os.getenv('GEM_CRAWLER_TIMEOUT_SECONDS', '20'))
+GEM_CRAWLER_MAX_PAGES = int(os.getenv('GEM_CRAWLER_MAX_PAGES', '10'))
+
+CRAWL_STATE_COLLECTION = "gem_crawl_state"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+index_registry.register(CRAWL_STATE_COLLECTION, "url", unique=True)
+# One tender per (owner, tender number): crawls upsert on it, manual creates and imports are deduplicated by it
+index_registry.register("tenders", [("userId", 1), ("tenderNumber", 1)], unique=True)
+
+_WHITESPACE = re.compile(r"\s+")
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class _HostPolicy:
+    __slots__ = ("semaphore", "bucket")
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(GEM_CRAWLER_PER_HOST_CONCURRENCY)
+        self.bucket = TokenBucket(GEM_CRAWLER_RATE_PER_SECOND, GEM_CRAWLER_BURST)
+
+class GeMListingParser:
+    """
+    Incremental parser for GeM bid listing pages.
+
+    Bytes are fed as they arrive from the network; every bid card is turned
+    into a tender dict as soon as its closing tag is seen and then dropped
+    from the tree, so memory stays flat regardless of page size.
+    """
+
+    CARD_CLASS = "block"
+    DATE_FORMATS = ("%d-%m-%Y %I:%M %p", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y", "%Y-%m-%d")
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._parser = etree.HTMLPullParser(events=("end",), tag="div")
+
+    @staticmethod
+    def _text(element) -> str:
+        return _WHITESPACE.sub(" ", "".join(element.itertext())).strip() if element is not None else ""
+
+    def _is_card(self, element) -> bool:
+        return self.CARD_CLASS in (element.get("class") or "").split()
+
+    def _labelled(self, card, label: str):
+        """Element holding the value that follows a <strong>Label:</strong> caption"""
+        for strong in card.iter("strong"):
+            if self._text(strong).lower().startswith(label.lower()):
+                return strong.getnext() if strong.getnext() is not None else strong.getparent().getnext()
+        return None
+
+    def _date(self, card, css_class: str) -> Optional[str]:
+        spans = card.xpath(f".//span[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]")
+        value = self._text(spans[0]) if spans else ""
+        for fmt in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).isoformat()
+            except ValueError:
+                continue
+        return None
+
+    def _parse_card(self, card) -> Optional[Dict[str, Any]]:
+        links = card.xpath(".//p[contains(@class, 'bid_no')]//a")
+        if not links:
+            return None
+
+        items = self._labelled(card, "Items")
+        quantity = self._labelled(card, "Quantity")
+        address = self._labelled(card, "Department")
+        address_lines = [
+            _WHITESPACE.sub(" ", line).strip()
+            for line in (address.itertext() if address is not None else [])
+            if line.strip()
+        ]
+
+        return {
+            "tender_number": self._text(links[0]),
+            "title": (items.get("data-content") if items is not None else None) or self._text(items),
+            "organization": address_lines[0] if address_lines else "",
+            "department": address_lines[1] if len(address_lines) > 1 else None,
+            "quantity": self._text(quantity) or None,
+            "publish_date": self._date(card, "start_date"),
+            "submission_deadline": self._date(card, "end_date"),
+            "document_url": urljoin(self.base_url, links[0].get("href") or ""),
+            "source": "gem",
+            "status": "open"
+        }
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        self._parser.feed(chunk)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        tenders = []
+        for _, element in self._parser.read_events():
+            if not self._is_card(element):
+                continue
+            tender = self._parse_card(element)
+            if tender:
+                tenders.append(tender)
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        return tenders
+
+class GeMCrawler:
+    """
+    Async GeM crawler.
+
+    One pooled httpx.AsyncClient is shared by all requests. Each host gets
+    its own concurrency limit and token-bucket rate limit, failed requests
+    are retried with full-jitter exponential backoff, and listing pages are
+    fetched conditionally (ETag / Last-Modified) so unchanged pages cost a
+    304 and no parsing. The parsed rows are cached next to the validators
+    and replayed on a 304, so every caller (searches, syncs, ingestion) gets
+    the full page whoever fetched it first.
+
+    base_url and transport are injectable so the crawler can be pointed at a
+    local server replaying recorded pages.
+    """
+
+    LISTING_PATH = "/all-bids"
+
+    def __init__(self, base_url: str = GEM_CRAWLER_BASE_URL, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, _HostPolicy] = {}
+        self._validators: LRUCache = LRUCache(maxsize=5000)
+        self.stats = {"requests": 0, "not_modified": 0, "retries": 0, "failures": 0, "tenders_parsed": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=GEM_CRAWLER_TIMEOUT_SECONDS,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=GEM_CRAWLER_MAX_CONNECTIONS,
+                    max_keepalive_connections=GEM_CRAWLER_MAX_CONNECTIONS
+                ),
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host(self, url: str) -> _HostPolicy:
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = _HostPolicy()
+        return self._hosts[host]
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(GEM_CRAWLER_MAX_BACKOFF_SECONDS, float(retry_after))
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                    return min(GEM_CRAWLER_MAX_BACKOFF_SECONDS, max(0.0, delay))
+                except (TypeError, ValueError):
+                    pass
+        # Full jitter keeps retrying workers from synchronising
+        return random.uniform(0, min(GEM_CRAWLER_MAX_BACKOFF_SECONDS, GEM_CRAWLER_BACKOFF_SECONDS * 2 ** attempt))
+
+    async def fetch_listing(self, url: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch and parse one listing page.
+
+        Returns:
+            Parsed tenders; cached rows when the server reports the page unchanged
+
+        Raises:
+            httpx.HTTPError: When the page still fails after all retries
+        """
+        request_url = str(httpx.URL(url, params=params))
+        policy = self._host(request_url)
+
+        for attempt in range(GEM_CRAWLER_MAX_RETRIES + 1):
+            headers = {}
+            validators = self._validators.get(request_url)
+            if validators:
+                if validators.get("etag"):
+                    headers["If-None-Match"] = validators["etag"]
+                if validators.get("last_modified"):
+                    headers["If-Modified-Since"] = validators["last_modified"]
+
+            retry_after = None
+            try:
+                async with policy.semaphore:
+                    await policy.bucket.acquire()
+                    self.stats["requests"] += 1
+
+                    async with self.client.stream("GET", request_url, headers=headers) as response:
+                        if response.status_code == 304 and validators:
+                            self.stats["not_modified"] += 1
+                            return [dict(tender) for tender in validators["tenders"]]
+                        if response.status_code in RETRYABLE_STATUS:
+                            retry_after = response.headers.get("Retry-After")
+                            raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+                        response.raise_for_status()
+
+                        # Parse while the body is still arriving
+                        parser = GeMListingParser(self.base_url)
+                        tenders = []
+                        async for chunk in response.aiter_bytes():
+                            tenders.extend(parser.feed(chunk))
+                        tenders.extend(parser.close())
+
+                        self._validators[request_url] = {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                            "tenders": [dict(tender) for tender in tenders]
+                        }
+                        self.stats["tenders_parsed"] += len(tenders)
+                        return tenders
+
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code in RETRYABLE_STATUS
+                if not retryable or attempt == GEM_CRAWLER_MAX_RETRIES:
+                    self.stats["failures"] += 1
+                    raise
+                self.stats["retries"] += 1
+                delay = self._backoff(attempt, retry_after)
+                logger.warning(f"GeM fetch failed ({e}), retry {attempt + 1} in {delay:.1f}s: {request_url}")
+                await asyncio.sleep(delay)
+
+    def listing_url(self) -> str:
+        return self.base_url + self.LISTING_PATH
+
+    async def crawl(
+        self,
+        keywords: str,
+        max_pages: int = GEM_CRAWLER_MAX_PAGES,
+        max_results: Optional[int] = None,
+        since: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Crawl listing pages for a keyword search.
+
+        Pages are fetched in windows of the per-host concurrency so the
+        pipeline stays full; crawling stops at the first empty page, or at
+        the first page published entirely before `since` (ISO timestamp).
+        """
+        tenders: List[Dict[str, Any]] = []
+        seen = set()
+        window = max(1, GEM_CRAWLER_PER_HOST_CONCURRENCY)
+
+        for first_page in range(1, max_pages + 1, window):
+            pages = range(first_page, min(first_page + window, max_pages + 1))
+            results = await asyncio.gather(*[
+                self.fetch_listing(self.listing_url(), {"searchedBid": keywords, "page_no": page})
+                for page in pages
+            ])
+
+            exhausted = False
+            for page_tenders in results:
+                if not page_tenders:
+                    exhausted = True
+                    break
+                if since and all((tender.get("publish_date") or "") < since for tender in page_tenders):
+                    exhausted = True
+                for tender in page_tenders:
+                    if tender["tender_number"] not in seen:
+                        seen.add(tender["tender_number"])
+                        tenders.append(tender)
+
+            if exhausted or (max_results and len(tenders) >= max_results):
+                break
+
+        return tenders[:max_results] if max_results else tenders
+
+    async def search_tenders(self, keywords: str, category: str = None, max_results: int = 50) -> List[Dict[str, Any]]:
+        """Live GeM search when the crawler is enabled, mock data otherwise"""
+        if not GEM_CRAWLER_ENABLED:
+            return await executors.io.run(gem_scraper.search_tenders, keywords, category, max_results)
+
+        tenders = await self.crawl(keywords, max_results=None if category else max_results)
+        if category:
+            needle = category.lower()
+            tenders = [t for t in tenders if needle in (t.get("title") or "").lower() or needle in (t.get("category") or "").lower()]
+        return tenders[:max_results]
+
+    async def load_state(self, db: AsyncIOMotorDatabase):
+        """Warm the conditional-request validators and their cached rows from previous crawls"""
+        async for state in db[CRAWL_STATE_COLLECTION].find({}, {"_id": 0}).limit(self._validators.maxsize):
+            # Entries saved without their rows cannot answer a 304 and are refetched in full
+            if "tenders" not in state:
+                continue
+            self._validators[state["url"]] = {
+                "etag": state.get("etag"),
+                "last_modified": state.get("lastModified"),
+                "tenders": state["tenders"]
+            }
+
+    async def save_state(self, db: AsyncIOMotorDatabase):
+        now = datetime.now(timezone.utc).isoformat()
+        operations = [
+            UpdateOne(
+                {"url": url},
+                {"$set": {
+                    "etag": validators.get("etag"),
+                    "lastModified": validators.get("last_modified"),
+                    "tenders": validators["tenders"],
+                    "updatedAt": now
+                }},
+                upsert=True
+            )
+            for url, validators in list(self._validators.items())
+        ]
+        if operations:
+            await db[CRAWL_STATE_COLLECTION].bulk_write(operations, ordered=False)
+
+    def _tender_upsert(self, user_id: str, item: Dict[str, Any]) -> Optional[UpdateOne]:
+        if not item.get("tender_number") or not item.get("title") or not item.get("submission_deadline"):
+            return None
+
+        tender = Tender(
+            tenderNumber=item["tender_number"],
+            title=item["title"],
+            description=item.get("description"),
+            source=TenderSource.gem,
+            organization=item.get("organization") or "Unknown",
+            department=item.get("department"),
+            category=item.get("category"),
+            location=item.get("location"),
+            publishDate=item.get("publish_date"),
+            submissionDeadline=item["submission_deadline"],
+            tenderValue=item.get("tender_value"),
+            emdAmount=item.get("emd_amount"),
+            documentUrl=item.get("document_url"),
+            userId=user_id
+        )
+        tender_dict = tender.model_dump()
+        for date_field in ['publishDate', 'submissionDeadline', 'createdAt', 'updatedAt']:
+            if tender_dict.get(date_field):
+                tender_dict[date_field] = tender_dict[date_field].isoformat()
+
+        # Portal fields are refreshed on every crawl; user-owned fields only set on insert
+        portal_fields = {
+            "title", "description", "organization", "department", "category", "location",
+            "publishDate", "submissionDeadline", "tenderValue", "emdAmount", "documentUrl", "source", "updatedAt"
+        }
+        refreshed = {key: value for key, value in tender_dict.items() if key in portal_fields and value is not None}
+        on_insert = {key: value for key, value in tender_dict.items() if key not in refreshed and key not in ("userId", "tenderNumber")}
+
+        return UpdateOne(
+            {"userId": user_id, "tenderNumber": tender.tenderNumber},
+            {"$set": refreshed, "$setOnInsert": on_insert},
+            upsert=True
+        )
+
+    async def sync_tenders(self, db: AsyncIOMotorDatabase, user_id: str, keywords: str, max_results: int = 200) -> Dict[str, Any]:
+        """Search GeM and bulk-upsert the results into the user's tenders"""
+        started = time.monotonic()
+        if GEM_CRAWLER_ENABLED:
+            await self.load_state(db)
+
+        items = await self.search_tenders(keywords, None, max_results)
+        operations = [op for op in (self._tender_upsert(user_id, item) for item in items) if op is not None]
+
+        inserted = modified = 0
+        if operations:
+            result = await db.tenders.bulk_write(operations, ordered=False)
+            inserted, modified = result.upserted_count, result.modified_count
+
+        if inserted or modified:
+            # Bulk writes bypass the per-document hooks; refresh the derived views instead
+            typeahead_index.invalidate(user_id)
+            await dashboard_rollups.rebuild(db, user_id)
+        if GEM_CRAWLER_ENABLED:
+            await self.save_state(db)
+
+        return {
+            "fetched": len(items),
+            "skipped": len(items) - len(operations),
+            "inserted": inserted,
+            "updated": modified,
+            "duration_ms": round((time.monotonic() - started) * 1000)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "enabled": GEM_CRAWLER_ENABLED, "base_url": self.base_url}
+
+# Global instance
+gem_crawler = GeMCrawler()
@@ -1,4 +1,3 @@
-import requests
 from bs4 import BeautifulSoup
 import logging
 from typing import Dict, List, Any, Optional
@@ -9,18 +8,15 @@ import time
 logger = logging.getLogger(__name__)
 
 class GEMPortalScraper:
-    """Scraper for GeM (Government e-Marketplace) portal"""
+    """
+    Mock GeM (Government e-Marketplace) data for development.
+    Live crawling lives in services.gem_crawler.
+    """
     
     BASE_URL = "https://gem.gov.in"
     SEARCH_URL = "https://gem.gov.in/search"
     BID_URL = "https://gem.gov.in/bid"
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-    
     def search_tenders(self, keywords: str, category: str = None, max_results: int = 50) -> List[Dict[str, Any]]:
         """
         Search for tenders on GeM portal
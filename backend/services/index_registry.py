@@ -0,0 +1,148 @@
+import logging
+from typing import Dict, Any, Iterator, List, Tuple, Union
+from datetime import datetime, timezone
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = Union[str, List[Tuple[str, Any]]]
+
+class IndexRegistry:
+    """Declarative registry of MongoDB indexes, populated by router modules at import time"""
+
+    def __init__(self):
+        self._indexes: Dict[str, Dict[str, IndexModel]] = {}
+        self.last_applied: Dict[str, Any] = {}
+
+    def register(self, collection: str, keys: IndexKeys, **options) -> str:
+        """
+        Register an index for a collection
+
+        Args:
+            collection: Collection name
+            keys: Field name or list of (field, direction) pairs
+            options: Any create_index option (unique, sparse, partialFilterExpression, name, ...)
+
+        Returns:
+            Index name
+        """
+        model = IndexModel(keys, **options)
+        name = model.document["name"]
+        self._indexes.setdefault(collection, {})[name] = model
+        return name
+
+    def registered(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Registered index specifications grouped by collection"""
+        return {
+            collection: [dict(model.document) for model in models.values()]
+            for collection, models in sorted(self._indexes.items())
+        }
+
+    async def apply(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        """
+        Create every registered index. Safe to run repeatedly: existing
+        indexes with the same specification are a no-op on the server.
+        """
+        created, failed = [], []
+
+        for collection, models in self._indexes.items():
+            for name, model in models.items():
+                try:
+                    await db[collection].create_indexes([model])
+                    created.append(f"{collection}.{name}")
+                except OperationFailure as e:
+                    logger.error(f"Failed to create index {collection}.{name}: {e}")
+                    failed.append({"index": f"{collection}.{name}", "error": str(e)})
+
+        self.last_applied = {
+            "applied_at": datetime.now(timezone.utc).isoformat(),
+            "ensured": len(created),
+            "failed": failed
+        }
+        logger.info(f"Ensured {len(created)} indexes ({len(failed)} failed)")
+        return self.last_applied
+
+    def _unique(self) -> Iterator[Tuple[str, str, IndexModel]]:
+        for collection, models in sorted(self._indexes.items()):
+            for name, model in models.items():
+                if model.document.get("unique"):
+                    yield collection, name, model
+
+    async def missing_unique(self, db: AsyncIOMotorDatabase) -> List[str]:
+        """
+        Registered unique indexes that the server does not enforce: absent,
+        or present under the same keys without the unique option
+        """
+        missing = []
+        for collection, name, model in self._unique():
+            keys = list(model.document["key"].items())
+            enforced = False
+            async for index in db[collection].list_indexes():
+                if index.get("unique") and list(index["key"].items()) == keys:
+                    enforced = True
+                    break
+            if not enforced:
+                missing.append(f"{collection}.{name}")
+        return missing
+
+    async def migrate_unique(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        """
+        Prepare collections for indexes that were registered non-unique
+        before they became unique: drop the existing non-unique index on the
+        same keys, and count the duplicate key groups that would still make
+        the unique build fail (they have to be cleaned up by hand).
+        """
+        dropped, duplicates = [], {}
+
+        for collection, name, model in self._unique():
+            keys = list(model.document["key"].items())
+            async for index in db[collection].list_indexes():
+                if not index.get("unique") and (index["name"] == name or list(index["key"].items()) == keys):
+                    await db[collection].drop_index(index["name"])
+                    dropped.append(f"{collection}.{index['name']}")
+                    logger.info(f"Dropped non-unique index {collection}.{index['name']}")
+
+            pipeline = [
+                {"$match": model.document.get("partialFilterExpression", {})},
+                {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field, _ in keys}, "count": {"$sum": 1}}},
+                {"$match": {"count": {"$gt": 1}}},
+                {"$count": "groups"}
+            ]
+            async for result in db[collection].aggregate(pipeline):
+                duplicates[f"{collection}.{name}"] = result["groups"]
+
+        return {"dropped": dropped, "duplicate_groups": duplicates}
+
+    async def report(self, db: AsyncIOMotorDatabase) -> Dict[str, Any]:
+        """Compare registered indexes with the indexes that exist on the server"""
+        collections = {}
+        missing_total = 0
+
+        for collection, models in sorted(self._indexes.items()):
+            existing = set()
+            async for index in db[collection].list_indexes():
+                existing.add(index["name"])
+
+            registered = set(models.keys())
+            missing = sorted(registered - existing)
+            missing_total += len(missing)
+
+            collections[collection] = {
+                "present": sorted(registered & existing),
+                "missing": missing,
+                "unregistered": sorted(existing - registered - {"_id_"})
+            }
+
+        missing_unique = await self.missing_unique(db)
+        return {
+            "status": "ok" if missing_total == 0 and not missing_unique else "missing_indexes",
+            "missing_total": missing_total,
+            "missing_unique": missing_unique,
+            "last_applied": self.last_applied,
+            "collections": collections
+        }
+
+# Global instance
+index_registry = IndexRegistry()
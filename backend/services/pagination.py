@@ -0,0 +1,131 @@
+import base64
+from typing import Dict, Any, List, Optional, Tuple
+from bson import json_util
+from bson.errors import BSONError
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+SortSpec = List[Tuple[str, int]]
+
+# Every keyset sort ends on _id so ties on the sort key still have a strict order
+TIEBREAKER = "_id"
+
+def encode_cursor(sort: SortSpec, doc: Dict[str, Any]) -> str:
+    """Opaque token pointing just past `doc` in the given sort order"""
+    payload = {
+        "s": [field for field, _ in sort],
+        "v": [doc.get(field) for field, _ in sort]
+    }
+    return base64.urlsafe_b64encode(json_util.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(token: str, sort: SortSpec) -> List[Any]:
+    """Sort key values stored in a cursor token. Raises ValueError for malformed or foreign tokens."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json_util.loads(raw.decode())
+    except (ValueError, TypeError, BSONError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+    if not isinstance(payload, dict) or payload.get("s") != [field for field, _ in sort]:
+        raise ValueError("Pagination cursor does not match this listing's sort order")
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+def _after(field: str, direction: int, value: Any) -> List[Dict[str, Any]]:
+    """Conditions for documents strictly after `value` on one sort key (MongoDB orders null lowest)"""
+    if value is None:
+        # Ascending: every non-null value follows null. Descending: nothing does.
+        return [{field: {"$ne": None}}] if direction == 1 else []
+    if direction == 1:
+        return [{field: {"$gt": value}}]
+    if field == TIEBREAKER:
+        return [{field: {"$lt": value}}]
+    return [{field: {"$lt": value}}, {field: None}]
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """
+    Filter selecting documents after the cursor position:
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... for each key's direction
+    """
+    branches = []
+    for position, (field, direction) in enumerate(sort):
+        equal_prefix = {prior: values[i] for i, (prior, _) in enumerate(sort[:position])}
+        for condition in _after(field, direction, values[position]):
+            branches.append({**equal_prefix, **condition})
+    return {"$or": branches} if branches else {TIEBREAKER: {"$exists": False}}
+
+async def paginate(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    sort: SortSpec,
+    limit: int,
+    cursor: Optional[str] = None,
+    page: int = 1,
+    projection: Optional[Dict[str, Any]] = None,
+    include_total: bool = False
+) -> Dict[str, Any]:
+    """
+    Fetch one page of a listing.
+
+    With a cursor the page starts right after the cursor's position (keyset
+    pagination, constant cost at any depth); without one the legacy page
+    number is honoured with skip(). Either way the response carries a
+    next_cursor for the following page.
+
+    Totals are only counted exactly when include_total is set. Unfiltered
+    listings fall back to the collection's metadata estimate; filtered ones
+    report None.
+
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another sort order
+    """
+    sort = list(sort)
+    if sort[-1][0] != TIEBREAKER:
+        sort.append((TIEBREAKER, sort[-1][1]))
+
+    # _id is always fetched for the cursor and stripped from the returned items
+    projection = {key: value for key, value in (projection or {}).items() if key != TIEBREAKER} or None
+
+    find_filter = query
+    if cursor:
+        keyset = keyset_filter(sort, decode_cursor(cursor, sort))
+        find_filter = {"$and": [query, keyset]} if query else keyset
+
+    find_cursor = collection.find(find_filter, projection).sort(sort)
+    if not cursor and page > 1:
+        find_cursor = find_cursor.skip((page - 1) * limit)
+    docs = await find_cursor.limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = encode_cursor(sort, docs[-1]) if has_more else None
+    for doc in docs:
+        doc.pop(TIEBREAKER, None)
+
+    total, estimated = None, False
+    if include_total:
+        total = await collection.count_documents(query)
+    elif not query:
+        total, estimated = await collection.estimated_document_count(), True
+
+    return {
+        "items": docs,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+        "total": total,
+        "total_is_estimate": estimated
+    }
+
+def page_meta(result: Dict[str, Any], page: int, limit: int) -> Dict[str, Any]:
+    """camelCase pagination block used by the tenders/vendors/rfq/products/alerts listings"""
+    total = result["total"]
+    return {
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "totalPages": (total + limit - 1) // limit if total is not None else None,
+        "totalIsEstimate": result["total_is_estimate"],
+        "nextCursor": result["next_cursor"],
+        "hasMore": result["has_more"]
+    }
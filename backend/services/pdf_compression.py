@@ -0,0 +1,310 @@
+import hashlib
+import io
+import logging
+import os
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, EncodedStreamObject, IndirectObject, NameObject,
+    NullObject, NumberObject, StreamObject
+)
+
+logger = logging.getLogger(__name__)
+
+# low = smallest file; the DPI is the resolution images are downsampled to
+COMPRESSION_PROFILES = {
+    "low": {"dpi": 72, "jpeg_quality": 40},
+    "medium": {"dpi": 150, "jpeg_quality": 60},
+    "high": {"dpi": 300, "jpeg_quality": 80}
+}
+PDF_COMPRESS_PAGES_PER_TASK = int(os.getenv('PDF_COMPRESS_PAGES_PER_TASK', '10'))
+# Smaller images are not worth a decode / re-encode round trip
+PDF_COMPRESS_MIN_IMAGE_BYTES = int(os.getenv('PDF_COMPRESS_MIN_IMAGE_BYTES', '10240'))
+
+# Filters PyPDF2 can decode to raw pixels
+_PIXEL_FILTERS = {"/FlateDecode", "/ASCII85Decode", "/ASCIIHexDecode", "/LZWDecode", "/RunLengthDecode"}
+# Text encodings that may wrap a JPEG stream
+_ASCII_FILTERS = {"/ASCII85Decode", "/ASCIIHexDecode"}
+_FONT_FILE_KEYS = ("/FontFile", "/FontFile2", "/FontFile3")
+OBJECT_CLASSES = ("images", "fonts", "content", "other")
+
+def _filters(stream: DictionaryObject) -> List[str]:
+    filters = stream.get("/Filter")
+    if filters is None:
+        return []
+    filters = filters.get_object()
+    return [str(f) for f in filters] if isinstance(filters, ArrayObject) else [str(filters)]
+
+def _fingerprint(value: Any, depth: int = 0) -> Any:
+    """Structure of a PDF value with indirect references resolved, so equal objects match across documents"""
+    if depth > 6:
+        return None
+    if isinstance(value, IndirectObject):
+        value = value.get_object()
+    if isinstance(value, StreamObject):
+        return ("stream", hashlib.sha256(value._data or b"").hexdigest(), _fingerprint(DictionaryObject(value), depth + 1))
+    if isinstance(value, DictionaryObject):
+        return tuple(sorted((str(key), _fingerprint(item, depth + 1)) for key, item in value.items() if key != "/Length"))
+    if isinstance(value, ArrayObject):
+        return tuple(_fingerprint(item, depth + 1) for item in value)
+    return repr(value)
+
+def object_key(value: Any) -> str:
+    """Content key of a (stream) object, independent of object numbering"""
+    return hashlib.sha256(repr(_fingerprint(value)).encode()).hexdigest()
+
+def _walk_resources(resources: Any, seen: set) -> Iterator[Tuple[str, DictionaryObject, str]]:
+    """(class, container, key) for every image XObject and embedded font program reachable from a resource dictionary"""
+    if resources is None:
+        return
+    resources = resources.get_object()
+    if id(resources) in seen:
+        return
+    seen.add(id(resources))
+
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in list(xobjects.keys()):
+            xobject = xobjects[name].get_object()
+            if xobject.get("/Subtype") == "/Image":
+                yield "images", xobjects, name
+            elif xobject.get("/Subtype") == "/Form":
+                yield from _walk_resources(xobject.get("/Resources"), seen)
+
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in list(fonts.keys()):
+            font = fonts[name].get_object()
+            for descendant in font.get("/DescendantFonts", ArrayObject()).get_object():
+                font = descendant.get_object()
+            descriptor = font.get("/FontDescriptor")
+            if descriptor is None:
+                continue
+            descriptor = descriptor.get_object()
+            for key in _FONT_FILE_KEYS:
+                if key in descriptor:
+                    yield "fonts", descriptor, key
+
+def _stream_size(value: Any) -> int:
+    value = value.get_object()
+    return len(value._data or b"") if isinstance(value, StreamObject) else 0
+
+def object_class_sizes(reader: PdfReader, file_size: int) -> Dict[str, int]:
+    """Stream bytes per object class; 'other' is the remainder of the file (structure, metadata, forms)"""
+    sizes = dict.fromkeys(OBJECT_CLASSES, 0)
+    counted = set()
+    seen = set()
+    for page in reader.pages:
+        contents = page.get("/Contents")
+        if contents is not None:
+            for stream in (contents.get_object() if isinstance(contents.get_object(), ArrayObject) else [contents]):
+                ref = getattr(stream, "idnum", id(stream))
+                if ref not in counted:
+                    counted.add(ref)
+                    sizes["content"] += _stream_size(stream)
+        for object_class, container, key in _walk_resources(page.get("/Resources"), seen):
+            ref = container.raw_get(key)
+            ref = getattr(ref, "idnum", id(ref))
+            if ref not in counted:
+                counted.add(ref)
+                sizes[object_class] += _stream_size(container[key])
+    sizes["other"] = max(0, file_size - sizes["images"] - sizes["fonts"] - sizes["content"])
+    return sizes
+
+def _is_jpeg(filters: List[str]) -> bool:
+    return bool(filters) and filters[-1] == "/DCTDecode" and set(filters[:-1]) <= _ASCII_FILTERS
+
+def _eligible(image: StreamObject) -> bool:
+    if image.get("/ImageMask") or "/Mask" in image or "/Decode" in image:
+        return False
+    if image.get("/BitsPerComponent") != 8 or _stream_size(image) < PDF_COMPRESS_MIN_IMAGE_BYTES:
+        return False
+    filters = _filters(image)
+    if _is_jpeg(filters):
+        return True
+    if not set(filters) <= _PIXEL_FILTERS:
+        return False
+    color_space = image.get("/ColorSpace")
+    if color_space is None:
+        return False
+    color_space = color_space.get_object()
+    if isinstance(color_space, ArrayObject):
+        # ICCBased profiles with 1 or 3 components are treated as gray / RGB
+        return color_space[0] == "/ICCBased" and color_space[1].get_object().get("/N") in (1, 3)
+    return color_space in ("/DeviceRGB", "/DeviceGray")
+
+def plan_images(file_path: str) -> Dict[str, Any]:
+    """
+    Unique re-encodable images of a document, keyed by content, with the first
+    page each one appears on (used to split the work across page ranges)
+    """
+    reader = PdfReader(file_path)
+    images: Dict[str, int] = {}
+    for page_number, page in enumerate(reader.pages, start=1):
+        for object_class, container, key in _walk_resources(page.get("/Resources"), set()):
+            if object_class != "images":
+                continue
+            image = container[key].get_object()
+            if _eligible(image):
+                images.setdefault(object_key(image), page_number)
+    return {"num_pages": len(reader.pages), "images": images}
+
+def _decode_image(image: StreamObject) -> Optional[Image.Image]:
+    if _is_jpeg(_filters(image)):
+        # PyPDF2 passes DCT data through undecoded, so get_data() is the JPEG file
+        decoded = Image.open(io.BytesIO(image.get_data()))
+        return decoded if decoded.mode in ("RGB", "L") else None
+    width, height = int(image["/Width"]), int(image["/Height"])
+    data = image.get_data()
+    color_space = image["/ColorSpace"].get_object()
+    components = color_space[1].get_object()["/N"] if isinstance(color_space, ArrayObject) else (3 if color_space == "/DeviceRGB" else 1)
+    mode = "RGB" if components == 3 else "L"
+    if len(data) < width * height * components:
+        return None
+    return Image.frombytes(mode, (width, height), data[:width * height * components])
+
+def recompress_images(file_path: str, first_page: int, last_page: int, keys: List[str], profile: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Downsample and JPEG re-encode the given images, looking them up on pages
+    first_page..last_page. Only results smaller than the original are
+    returned. Runs inside process-pool workers.
+    """
+    settings = COMPRESSION_PROFILES[profile]
+    wanted = set(keys)
+    reader = PdfReader(file_path)
+    results = {}
+    for page_number in range(first_page, last_page + 1):
+        page = reader.pages[page_number - 1]
+        box = page.mediabox
+        page_inches = (float(box.width) / 72, float(box.height) / 72)
+        for object_class, container, key in _walk_resources(page.get("/Resources"), set()):
+            if object_class != "images" or not wanted:
+                continue
+            image = container[key].get_object()
+            image_key = object_key(image)
+            if image_key not in wanted:
+                continue
+            wanted.discard(image_key)
+            try:
+                decoded = _decode_image(image)
+            except Exception as e:
+                logger.warning(f"Skipping undecodable image on page {page_number}: {e}")
+                continue
+            if decoded is None:
+                continue
+
+            # An image is drawn at most page-sized, so this is a lower bound on its real resolution
+            dpi = max(decoded.width / page_inches[0], decoded.height / page_inches[1])
+            if dpi > settings["dpi"] * 1.1:
+                scale = settings["dpi"] / dpi
+                decoded = decoded.resize((max(1, round(decoded.width * scale)), max(1, round(decoded.height * scale))), Image.LANCZOS)
+            output = io.BytesIO()
+            decoded.save(output, "JPEG", quality=settings["jpeg_quality"], optimize=True)
+            if output.tell() < _stream_size(image):
+                results[image_key] = {
+                    "data": output.getvalue(),
+                    "width": decoded.width,
+                    "height": decoded.height,
+                    "color_space": "/DeviceRGB" if decoded.mode == "RGB" else "/DeviceGray"
+                }
+            decoded.close()
+    return results
+
+def _jpeg_stream(original: DictionaryObject, replacement: Dict[str, Any]) -> EncodedStreamObject:
+    stream = EncodedStreamObject()
+    stream._data = replacement["data"]
+    stream.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(replacement["width"]),
+        NameObject("/Height"): NumberObject(replacement["height"]),
+        NameObject("/ColorSpace"): NameObject(replacement["color_space"]),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+        NameObject("/Filter"): NameObject("/DCTDecode")
+    })
+    for key in ("/SMask", "/Interpolate", "/Intent"):
+        if key in original:
+            stream[NameObject(key)] = original.raw_get(key)
+    return stream
+
+def _redirect(value: Any, mapping: Dict[int, IndirectObject]):
+    """Point every reference to a duplicate object at its canonical copy"""
+    if isinstance(value, DictionaryObject):
+        for key in list(value.keys()):
+            item = value.raw_get(key)
+            if isinstance(item, IndirectObject) and item.idnum in mapping:
+                value[key] = mapping[item.idnum]
+            else:
+                _redirect(item, mapping)
+    elif isinstance(value, ArrayObject):
+        for index, item in enumerate(value):
+            if isinstance(item, IndirectObject) and item.idnum in mapping:
+                value[index] = mapping[item.idnum]
+            else:
+                _redirect(item, mapping)
+
+def write_compressed(file_path: str, output_path: str, replacements: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Write the compressed document: flate-compressed content streams,
+    re-encoded images, and one copy of each identical image or font program.
+    Runs inside process-pool workers.
+    """
+    reader = PdfReader(file_path)
+    before = object_class_sizes(reader, os.path.getsize(file_path))
+
+    writer = PdfWriter()
+    for page in reader.pages:
+        page.compress_content_streams()
+        writer.add_page(page)
+
+    canonical: Dict[str, IndirectObject] = {}
+    duplicates: Dict[int, IndirectObject] = {}
+    counts = {"images_recompressed": 0, "images_deduplicated": 0, "fonts_deduplicated": 0}
+    seen = set()
+    for page in writer.pages:
+        for object_class, container, key in _walk_resources(page.get("/Resources"), seen):
+            ref = container.raw_get(key)
+            if not isinstance(ref, IndirectObject) or ref.idnum in duplicates:
+                continue
+            content_key = object_key(ref)
+            first = canonical.setdefault(content_key, ref)
+            if first.idnum != ref.idnum:
+                duplicates[ref.idnum] = first
+                counts[f"{object_class}_deduplicated"] += 1
+            elif object_class == "images" and content_key in replacements:
+                writer._objects[ref.idnum - 1] = _jpeg_stream(ref.get_object(), replacements.pop(content_key))
+                counts["images_recompressed"] += 1
+
+    if duplicates:
+        for obj in writer._objects:
+            _redirect(obj, duplicates)
+        # PyPDF2 numbers objects by position, so dropped duplicates become null objects rather than gaps
+        for idnum in duplicates:
+            writer._objects[idnum - 1] = NullObject()
+
+    with open(output_path, "wb") as output_file:
+        writer.write(output_file)
+
+    after = object_class_sizes(PdfReader(output_path), os.path.getsize(output_path))
+    return {
+        "objects": {
+            object_class: {"before": before[object_class], "after": after[object_class]}
+            for object_class in OBJECT_CLASSES
+        },
+        **counts
+    }
+
+def page_chunks(plan: Dict[str, Any]) -> List[Tuple[int, int, List[str]]]:
+    """(first_page, last_page, image keys) ranges of PDF_COMPRESS_PAGES_PER_TASK pages that have images to re-encode"""
+    by_page: Dict[int, List[str]] = {}
+    for key, page_number in plan["images"].items():
+        by_page.setdefault(page_number, []).append(key)
+    chunks = []
+    for first_page in range(1, plan["num_pages"] + 1, PDF_COMPRESS_PAGES_PER_TASK):
+        last_page = min(first_page + PDF_COMPRESS_PAGES_PER_TASK - 1, plan["num_pages"])
+        keys = [key for page_number in range(first_page, last_page + 1) for key in by_page.get(page_number, [])]
+        chunks.append((first_page, last_page, keys))
+    return chunks
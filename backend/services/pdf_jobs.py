@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.executors import executors, ExecutorSaturated
+from services.index_registry import index_registry
+from services.pdf_compression import COMPRESSION_PROFILES
+from services.pdf_tools_service import pdf_tools_service
+
+logger = logging.getLogger(__name__)
+
+# Jobs running at once per API worker; further jobs wait in 'queued'
+PDF_JOB_CONCURRENCY = int(os.getenv('PDF_JOB_CONCURRENCY', str(executors.cpu.max_workers)))
+# Job records, job outputs and uploads are removed this long after they were written
+PDF_FILE_TTL_HOURS = int(os.getenv('PDF_FILE_TTL_HOURS', '24'))
+PDF_CLEANUP_INTERVAL_MINUTES = int(os.getenv('PDF_CLEANUP_INTERVAL_MINUTES', '30'))
+PDF_JOB_HEARTBEAT_SECONDS = int(os.getenv('PDF_JOB_HEARTBEAT_SECONDS', '5'))
+# A queued or running job whose worker stopped heartbeating for this long is reported as failed
+PDF_JOB_STALE_SECONDS = int(os.getenv('PDF_JOB_STALE_SECONDS', '120'))
+PDF_JOB_PROGRESS_SECONDS = float(os.getenv('PDF_JOB_PROGRESS_SECONDS', '1'))
+
+JOBS_COLLECTION = "pdf_jobs"
+
+index_registry.register(JOBS_COLLECTION, "id", unique=True)
+index_registry.register(JOBS_COLLECTION, [("userId", 1), ("created_at", -1)])
+# expires_at is a BSON date (TTL indexes ignore strings)
+index_registry.register(JOBS_COLLECTION, "expires_at", expireAfterSeconds=0)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# operation -> (PDFToolsService method, required params, optional params with defaults)
+OPERATIONS = {
+    "merge": ("_merge_pdfs", ("file_paths",), {}),
+    "split": ("_split_pdf", ("file_path", "page_ranges"), {}),
+    "compress": ("compress_pdf", ("file_path",), {"quality": "medium"}),
+    "rotate": ("_rotate_pdf", ("file_path", "angle"), {"pages": "all"})
+}
+
+class ProgressFile:
+    """
+    Progress callback handed to process-pool workers. Workers cannot reach
+    MongoDB, so they overwrite a small JSON file that the API worker polls.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._last_write = 0.0
+
+    def __call__(self, done: int, total: int):
+        now = time.monotonic()
+        if done < total and now - self._last_write < PDF_JOB_PROGRESS_SECONDS:
+            return
+        self._last_write = now
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"done": done, "total": total}, f)
+        os.replace(tmp_path, self.path)
+
+    def read(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+def sweep_expired_files(root: str, max_age_seconds: float) -> Dict[str, int]:
+    """Delete files under root older than max_age_seconds, then empty directories that are just as old"""
+    cutoff = time.time() - max_age_seconds
+    removed = {"files": 0, "bytes": 0, "directories": 0}
+    for dirpath, _, filenames in os.walk(root, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime < cutoff:
+                    os.remove(path)
+                    removed["files"] += 1
+                    removed["bytes"] += stat.st_size
+            except FileNotFoundError:
+                continue
+        if dirpath != root:
+            try:
+                if os.stat(dirpath).st_mtime < cutoff and not os.listdir(dirpath):
+                    os.rmdir(dirpath)
+                    removed["directories"] += 1
+            except OSError:
+                continue
+    return removed
+
+def _progress_doc(done: int, total: int) -> Dict[str, Any]:
+    return {"done": done, "total": total, "percent": round(done / total * 100, 1) if total else 0.0}
+
+class PDFJobQueue:
+    """
+    Background PDF operations (merge / split / compress / rotate).
+
+    Submitting a job stores it in pdf_jobs and returns immediately; the job
+    runs on the cpu process pool and its page-level progress is copied into
+    the job record, so clients poll GET /pdf-tools/jobs/{id} or follow the
+    SSE stream instead of holding a request open for the whole operation.
+    Outputs are written to UPLOAD_DIR/<user>/jobs/<job id>/ and, like
+    uploads, are swept after PDF_FILE_TTL_HOURS.
+    """
+
+    def __init__(self):
+        self._slots = asyncio.Semaphore(PDF_JOB_CONCURRENCY)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self.last_sweep: Dict[str, Any] = {}
+
+    def _validate(self, user_id: str, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unsupported PDF operation '{operation}', expected one of {', '.join(OPERATIONS)}")
+        _, required, optional = OPERATIONS[operation]
+        missing = [name for name in required if params.get(name) is None]
+        if missing:
+            raise ValueError(f"Missing parameters for {operation}: {', '.join(missing)}")
+
+        validated = {**optional, **{key: params[key] for key in optional if params.get(key) is not None}}
+        for name in required:
+            validated[name] = params[name]
+        if operation == "compress" and validated["quality"] not in COMPRESSION_PROFILES:
+            raise ValueError(f"Unknown compression quality '{validated['quality']}', expected one of {', '.join(COMPRESSION_PROFILES)}")
+        if "file_paths" in validated:
+            if not isinstance(validated["file_paths"], list) or not validated["file_paths"]:
+                raise ValueError("file_paths must be a non-empty list")
+            validated["file_paths"] = [pdf_tools_service.resolve_owned_path(path, user_id) for path in validated["file_paths"]]
+        if "file_path" in validated:
+            validated["file_path"] = pdf_tools_service.resolve_owned_path(validated["file_path"], user_id)
+        return validated
+
+    async def submit(self, db: AsyncIOMotorDatabase, user_id: str, operation: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a PDF operation and return its job record
+
+        Raises:
+            ValueError: If the operation or its parameters are invalid
+        """
+        params = self._validate(user_id, operation, params)
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "userId": user_id,
+            "operation": operation,
+            "params": params,
+            "status": "queued",
+            "progress": _progress_doc(0, 0),
+            "result": None,
+            "error": None,
+            "created_at": now.isoformat(),
+            "heartbeat_at": now.isoformat(),
+            "expires_at": now + timedelta(hours=PDF_FILE_TTL_HOURS)
+        }
+        await db[JOBS_COLLECTION].insert_one(dict(job))
+        self._tasks[job["id"]] = asyncio.create_task(self._run(db, job))
+        return self._public(job)
+
+    async def _update(self, db: AsyncIOMotorDatabase, job_id: str, updates: Dict[str, Any]):
+        await db[JOBS_COLLECTION].update_one({"id": job_id}, {"$set": updates})
+
+    async def _execute(self, method: str, params: Dict[str, Any], output_dir: str, progress: ProgressFile) -> Dict[str, Any]:
+        # The pool queue is shared with interactive requests; a job waits for room rather than failing
+        while True:
+            try:
+                operation = getattr(pdf_tools_service, method)
+                if asyncio.iscoroutinefunction(operation):
+                    # Operations that fan out over the pool themselves
+                    return await operation(**params, output_dir=output_dir, progress=progress)
+                return await executors.cpu.run(operation, **params, output_dir=output_dir, progress=progress)
+            except ExecutorSaturated:
+                await asyncio.sleep(1)
+
+    async def _run(self, db: AsyncIOMotorDatabase, job: Dict[str, Any]):
+        job_id = job["id"]
+        try:
+            async with self._slots:
+                output_dir = os.path.join(pdf_tools_service.UPLOAD_DIR, job["userId"], "jobs", job_id)
+                os.makedirs(output_dir, exist_ok=True)
+                progress = ProgressFile(os.path.join(output_dir, ".progress.json"))
+                await self._update(db, job_id, {"status": "running", "started_at": datetime.now(timezone.utc).isoformat()})
+
+                method = OPERATIONS[job["operation"]][0]
+                task = asyncio.ensure_future(self._execute(method, job["params"], output_dir, progress))
+                reported = None
+                while not task.done():
+                    await asyncio.wait({task}, timeout=PDF_JOB_PROGRESS_SECONDS)
+                    current = progress.read()
+                    if current and current != reported:
+                        reported = current
+                        await self._update(db, job_id, {"progress": _progress_doc(current["done"], current["total"])})
+
+                result = task.result()
+                finished = datetime.now(timezone.utc)
+                updates = {
+                    "status": "completed" if result.get("success") else "failed",
+                    "result": result if result.get("success") else None,
+                    "error": result.get("error"),
+                    "finished_at": finished.isoformat(),
+                    "expires_at": finished + timedelta(hours=PDF_FILE_TTL_HOURS)
+                }
+                current = progress.read()
+                if current:
+                    done = current["total"] if result.get("success") else current["done"]
+                    updates["progress"] = _progress_doc(done, current["total"])
+                await self._update(db, job_id, updates)
+                if os.path.exists(progress.path):
+                    os.remove(progress.path)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"PDF job {job_id} failed: {e}")
+            await self._update(db, job_id, {
+                "status": "failed",
+                "error": str(e),
+                "finished_at": datetime.now(timezone.utc).isoformat()
+            })
+        finally:
+            self._tasks.pop(job_id, None)
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        job = {key: value for key, value in job.items() if key not in ("_id", "userId", "heartbeat_at")}
+        if isinstance(job.get("expires_at"), datetime):
+            job["expires_at"] = job["expires_at"].isoformat()
+        return job
+
+    async def get_job(self, db: AsyncIOMotorDatabase, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """A user's job, with jobs orphaned by a restarted worker reported as failed"""
+        job = await db[JOBS_COLLECTION].find_one({"id": job_id, "userId": user_id}, {"_id": 0})
+        if job is None:
+            return None
+        if job["status"] in ACTIVE_STATUSES and job_id not in self._tasks:
+            stale_before = (datetime.now(timezone.utc) - timedelta(seconds=PDF_JOB_STALE_SECONDS)).isoformat()
+            if job["heartbeat_at"] < stale_before:
+                updates = {"status": "failed", "error": "Job was interrupted by a server restart", "finished_at": datetime.now(timezone.utc).isoformat()}
+                await db[JOBS_COLLECTION].update_one({"id": job_id, "status": {"$in": list(ACTIVE_STATUSES)}}, {"$set": updates})
+                job.update(updates)
+        return self._public(job)
+
+    async def list_jobs(self, db: AsyncIOMotorDatabase, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        jobs = await db[JOBS_COLLECTION].find({"userId": user_id}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(length=limit)
+        return [self._public(job) for job in jobs]
+
+    async def sweep(self) -> Dict[str, Any]:
+        """Remove uploads and job outputs older than PDF_FILE_TTL_HOURS"""
+        removed = await executors.io.run(sweep_expired_files, pdf_tools_service.UPLOAD_DIR, PDF_FILE_TTL_HOURS * 3600)
+        self.last_sweep = {"swept_at": datetime.now(timezone.utc).isoformat(), **removed}
+        if removed["files"]:
+            logger.info(f"Removed {removed['files']} expired PDF files ({removed['bytes']} bytes)")
+        return self.last_sweep
+
+    async def _loop(self, db: AsyncIOMotorDatabase):
+        next_sweep = 0.0
+        while True:
+            try:
+                if self._tasks:
+                    await db[JOBS_COLLECTION].update_many(
+                        {"id": {"$in": list(self._tasks)}},
+                        {"$set": {"heartbeat_at": datetime.now(timezone.utc).isoformat()}}
+                    )
+                if time.monotonic() >= next_sweep:
+                    next_sweep = time.monotonic() + PDF_CLEANUP_INTERVAL_MINUTES * 60
+                    await self.sweep()
+            except Exception as e:
+                logger.error(f"PDF job maintenance failed: {e}")
+            await asyncio.sleep(PDF_JOB_HEARTBEAT_SECONDS)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_jobs": len(self._tasks),
+            "concurrency": PDF_JOB_CONCURRENCY,
+            "last_sweep": self.last_sweep
+        }
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Start heartbeats for this worker's jobs and the periodic upload directory sweep"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._loop(db))
+
+    async def stop(self, db: AsyncIOMotorDatabase):
+        """Stop maintenance and mark this worker's unfinished jobs as failed"""
+        interrupted = list(self._tasks)
+        tasks = list(self._tasks.values()) + ([self._loop_task] if self._loop_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+        if interrupted:
+            await db[JOBS_COLLECTION].update_many(
+                {"id": {"$in": interrupted}, "status": {"$in": list(ACTIVE_STATUSES)}},
+                {"$set": {"status": "failed", "error": "Job was interrupted by a server shutdown", "finished_at": datetime.now(timezone.utc).isoformat()}}
+            )
+
+# Global instance
+pdf_jobs = PDFJobQueue()
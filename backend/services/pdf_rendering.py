@@ -0,0 +1,217 @@
+import asyncio
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from collections import deque
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+from pdf2image import convert_from_path
+from PyPDF2 import PdfReader
+from services.executors import executors, ExecutorSaturated
+from services.extraction_cache import extraction_cache
+
+logger = logging.getLogger(__name__)
+
+PDF_RENDER_DPI = int(os.getenv('PDF_RENDER_DPI', '150'))
+PDF_RENDER_MAX_DPI = int(os.getenv('PDF_RENDER_MAX_DPI', '300'))
+# Width of the preview tier used by the bid-preparation UI
+PDF_THUMBNAIL_PX = int(os.getenv('PDF_THUMBNAIL_PX', '200'))
+PDF_RENDER_PAGES_PER_TASK = int(os.getenv('PDF_RENDER_PAGES_PER_TASK', '4'))
+PDF_RENDER_STAGING_DIR = os.getenv('PDF_RENDER_STAGING_DIR', os.path.join(tempfile.gettempdir(), 'hexabid_render_staging'))
+
+# format -> (Pillow format, file extension, media type)
+RENDER_FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg")
+}
+
+def render_page_range(
+    pdf_path: str,
+    first_page: int,
+    last_page: int,
+    dpi: int,
+    fmt: str,
+    thumbnail_px: Optional[int],
+    staging_dir: str
+) -> List[Dict[str, Any]]:
+    """
+    Rasterize a page range one page at a time into staging_dir. Thumbnails are
+    rendered straight at their target width rather than downscaled afterwards.
+    Runs inside process-pool workers.
+    """
+    pil_format, extension, _ = RENDER_FORMATS[fmt]
+    results = []
+    for page_number in range(first_page, last_page + 1):
+        images = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=page_number,
+            last_page=page_number,
+            size=(thumbnail_px, None) if thumbnail_px else None
+        )
+        for image in images:
+            try:
+                path = os.path.join(staging_dir, f"page-{page_number}.{extension}")
+                if pil_format == "JPEG" and image.mode != "RGB":
+                    image = image.convert("RGB")
+                image.save(path, pil_format)
+                results.append({"page": page_number, "path": path, "width": image.width, "height": image.height})
+            finally:
+                image.close()
+    return results
+
+def page_count(pdf_path: str) -> int:
+    return len(PdfReader(pdf_path).pages)
+
+class _ZipSink:
+    """Write-only stream that collects what zipfile writes so it can be sent in pieces"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+class PDFRenderer:
+    """
+    Page rasterization for previews and image export.
+
+    Rendered pages are cached per document hash in the extraction cache, one
+    variant per (dpi, format) or thumbnail width, so the bid-preparation UI
+    loads previews from disk instead of re-rendering them. Missing page
+    ranges are rendered in parallel on the cpu process pool.
+    """
+
+    @staticmethod
+    def variant(dpi: int, fmt: str, thumbnail: bool) -> Dict[str, Any]:
+        """
+        Cache parameters for a rendering request
+
+        Raises:
+            ValueError: If the format or resolution is not supported
+        """
+        if fmt not in RENDER_FORMATS:
+            raise ValueError(f"Unsupported image format '{fmt}', expected one of {', '.join(RENDER_FORMATS)}")
+        if thumbnail:
+            return {"width": PDF_THUMBNAIL_PX, "format": fmt}
+        if not 36 <= dpi <= PDF_RENDER_MAX_DPI:
+            raise ValueError(f"dpi must be between 36 and {PDF_RENDER_MAX_DPI}")
+        return {"dpi": dpi, "format": fmt}
+
+    async def _render_chunk(self, pdf_path: str, first_page: int, last_page: int, params: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        os.makedirs(PDF_RENDER_STAGING_DIR, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(dir=PDF_RENDER_STAGING_DIR)
+        try:
+            while True:
+                try:
+                    pages = await executors.cpu.run(
+                        render_page_range, pdf_path, first_page, last_page,
+                        params.get("dpi", PDF_RENDER_DPI), params["format"], params.get("width"), staging_dir
+                    )
+                    return staging_dir, pages
+                except ExecutorSaturated:
+                    # Previews queue behind other work instead of failing halfway through a document
+                    await asyncio.sleep(0.5)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+    async def render_pages(
+        self,
+        pdf_path: str,
+        first_page: int = 1,
+        last_page: int = None,
+        dpi: int = PDF_RENDER_DPI,
+        fmt: str = "png",
+        thumbnail: bool = False,
+        digest: str = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Render pages in page order, yielding {'page', 'path', 'cached'} as each
+        page is available (width and height are included for fresh renders)
+
+        Raises:
+            ValueError: If the format or resolution is not supported
+        """
+        params = self.variant(dpi, fmt, thumbnail)
+        extension = RENDER_FORMATS[fmt][1]
+        total_pages = await executors.io.run(page_count, pdf_path)
+        last_page = min(last_page or total_pages, total_pages)
+        first_page = max(1, first_page)
+        digest = digest or await executors.io.run(extraction_cache.file_digest, pdf_path)
+
+        names = {page: f"page-{page}.{extension}" for page in range(first_page, last_page + 1)}
+        cached = await executors.io.run(extraction_cache.get_files, digest, "render", params, names.values())
+
+        plan = []
+        for page_number, name in names.items():
+            if name in cached:
+                plan.append(("cached", {"page": page_number, "path": cached[name], "cached": True}))
+            elif plan and plan[-1][0] == "chunk" and plan[-1][1][1] - plan[-1][1][0] + 1 < PDF_RENDER_PAGES_PER_TASK:
+                plan[-1] = ("chunk", (plan[-1][1][0], page_number))
+            else:
+                plan.append(("chunk", (page_number, page_number)))
+        chunks = [value for kind, value in plan if kind == "chunk"]
+
+        pending = deque()
+        next_chunk = 0
+        try:
+            for kind, value in plan:
+                while next_chunk < len(chunks) and len(pending) < executors.cpu.max_workers:
+                    start, end = chunks[next_chunk]
+                    pending.append(asyncio.ensure_future(self._render_chunk(pdf_path, start, end, params)))
+                    next_chunk += 1
+
+                if kind == "cached":
+                    yield value
+                    continue
+
+                staging_dir, pages = await pending.popleft()
+                try:
+                    for page in pages:
+                        page["path"] = await executors.io.run(
+                            extraction_cache.put_file, digest, "render", params, names[page["page"]], page["path"]
+                        )
+                        yield {**page, "cached": False}
+                finally:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+        finally:
+            for task in pending:
+                if task.done() and not task.cancelled() and task.exception() is None:
+                    shutil.rmtree(task.result()[0], ignore_errors=True)
+                task.cancel()
+
+    async def page_image(self, pdf_path: str, page: int, dpi: int = PDF_RENDER_DPI, fmt: str = "png", thumbnail: bool = False, digest: str = None) -> Optional[str]:
+        """Path of one rendered page (rendering it if needed), or None when the page does not exist"""
+        async with contextlib.aclosing(self.render_pages(pdf_path, page, page, dpi, fmt, thumbnail, digest)) as rendered:
+            async for result in rendered:
+                return result["path"]
+        return None
+
+    async def stream_zip(self, pages: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        """Zip rendered pages as they arrive; images are already compressed, so entries are stored"""
+        sink = _ZipSink()
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            async for page in pages:
+                await executors.io.run(archive.write, page["path"], os.path.basename(page["path"]))
+                yield sink.drain()
+        yield sink.drain()
+
+# Global instance
+pdf_renderer = PDFRenderer()
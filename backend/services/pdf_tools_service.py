@@ -1,14 +1,60 @@
+import asyncio
 import logging
-from typing import Dict, Any, List
+import hashlib
+import re
+from typing import Dict, Any, List, BinaryIO, Callable, Optional
+from collections import OrderedDict
 import os
 from datetime import datetime
 import uuid
-from PyPDF2 import PdfReader, PdfWriter, PdfMerger
+from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
 import io
+from services.executors import executors, ExecutorSaturated
+from services.extraction_cache import extraction_cache
+from services.pdf_rendering import pdf_renderer, PDF_RENDER_DPI
+from services.pdf_compression import COMPRESSION_PROFILES, plan_images, page_chunks, recompress_images, write_compressed
+from utils.ocr_service import ocr_service, EXTRACTION_MODES
 
 logger = logging.getLogger(__name__)
 
+# progress(done, total) callbacks passed into the page loops by the job queue
+Progress = Optional[Callable[[int, int], None]]
+
+PDF_UPLOAD_MAX_MB = int(os.getenv('PDF_UPLOAD_MAX_MB', '200'))
+PDF_UPLOAD_CHUNK_KB = int(os.getenv('PDF_UPLOAD_CHUNK_KB', '1024'))
+
+# Parsed readers kept per process, so repeated merges of the same files skip re-parsing
+PDF_READER_CACHE_MB = int(os.getenv('PDF_READER_CACHE_MB', '256'))
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds PDF_UPLOAD_MAX_MB"""
+
+class DocumentNotFound(ValueError):
+    """Raised when a referenced file does not exist in the owner's directory"""
+
+_readers: "OrderedDict[tuple, PdfReader]" = OrderedDict()
+
+def cached_reader(file_path: str) -> PdfReader:
+    """
+    PdfReader for a file, reused while the file is unchanged. PdfReader holds
+    the whole file in memory, so the cache is bounded by file size and is
+    local to each (pool worker) process.
+    """
+    stat = os.stat(file_path)
+    key = (os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns)
+    reader = _readers.get(key)
+    if reader is not None:
+        _readers.move_to_end(key)
+        return reader
+
+    reader = PdfReader(file_path)
+    _readers[key] = reader
+    max_bytes = PDF_READER_CACHE_MB * 1024 * 1024
+    while len(_readers) > 1 and sum(size for _, size, _ in _readers) > max_bytes:
+        _readers.popitem(last=False)
+    return reader
+
 class PDFToolsService:
     """Service for all PDF operations - ilovepdf.com features"""
     
@@ -17,47 +63,348 @@ class PDFToolsService:
     def __init__(self):
         os.makedirs(self.UPLOAD_DIR, exist_ok=True)
     
-    async def merge_pdfs(self, file_paths: List[str]) -> Dict[str, Any]:
+    async def save_upload(self, source: BinaryIO, owner_id: str, declared_size: int = None) -> Dict[str, Any]:
+        """
+        Store an uploaded PDF under UPLOAD_DIR/<owner>/<sha256[:2]>/<sha256>.pdf
+        
+        The upload is copied in PDF_UPLOAD_CHUNK_KB chunks on the io pool and
+        hashed as it goes, so memory use does not grow with file size. The
+        client's filename is never used in the path, and identical content
+        uploaded twice by the same owner lands on the same file.
+        
+        Raises:
+            UploadTooLarge: If the upload exceeds PDF_UPLOAD_MAX_MB
+            ValueError: If the upload is empty or not a PDF
+        """
+        owner_dir = self._owner_dir(owner_id)
+        max_bytes = PDF_UPLOAD_MAX_MB * 1024 * 1024
+        if declared_size is not None and declared_size > max_bytes:
+            raise UploadTooLarge(f"File exceeds the {PDF_UPLOAD_MAX_MB} MB upload limit")
+        return await executors.io.run(self._store_upload, source, owner_dir, max_bytes)
+    
+    def _owner_dir(self, owner_id: str) -> str:
+        if not owner_id or os.path.basename(owner_id) != owner_id or owner_id.startswith("."):
+            raise ValueError("Invalid upload owner")
+        return os.path.join(self.UPLOAD_DIR, owner_id)
+    
+    def output_dir(self, owner_id: str) -> str:
+        """Directory for an owner's interactive operation outputs, swept with their uploads"""
+        output_dir = os.path.join(self._owner_dir(owner_id), "outputs")
+        os.makedirs(output_dir, exist_ok=True)
+        return output_dir
+    
+    def upload_path(self, owner_id: str, sha256: str) -> str:
+        """
+        Where save_upload stores a document with this hash for this owner
+        
+        Raises:
+            ValueError: If sha256 is not a hex SHA-256 digest
+        """
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256 or ""):
+            raise ValueError("Invalid document hash")
+        return os.path.join(self.UPLOAD_DIR, owner_id, sha256[:2], f"{sha256}.pdf")
+    
+    async def ensure_upload(self, file_path: str, owner_id: str) -> Dict[str, Any]:
+        """
+        Content-addressed upload for a file the owner can access (e.g. a job
+        output), copying it into the owner's upload directory if needed
+        
+        Raises:
+            ValueError: If the file is not accessible to the owner
+        """
+        file_path = self.resolve_owned_path(file_path, owner_id)
+        sha256 = await executors.io.run(extraction_cache.file_digest, file_path)
+        if os.path.isfile(self.upload_path(owner_id, sha256)):
+            return {"file_path": self.upload_path(owner_id, sha256), "sha256": sha256}
+        with open(file_path, "rb") as source:
+            return await self.save_upload(source, owner_id)
+    
+    def resolve_owned_path(self, file_path: str, owner_id: str) -> str:
+        """
+        Real path of an existing file inside the owner's own directory under
+        UPLOAD_DIR (uploads, operation outputs, job outputs and documents).
+        
+        Raises:
+            DocumentNotFound: If the file does not exist
+            ValueError: If the path is outside the owner's directory
+        """
+        root = os.path.realpath(self._owner_dir(owner_id))
+        real_path = os.path.realpath(file_path)
+        if os.path.commonpath([root, real_path]) != root:
+            raise ValueError(f"File is not accessible: {file_path}")
+        if not os.path.isfile(real_path):
+            raise DocumentNotFound(f"File not found: {file_path}")
+        return real_path
+    
+    # PyPDF2 work is CPU-bound, so every operation runs on the process pool
+    async def merge_pdfs(self, file_paths: List[str], output_dir: str = None) -> Dict[str, Any]:
         """Merge multiple PDF files into one"""
+        return await executors.cpu.run(self._merge_pdfs, file_paths, output_dir)
+    
+    async def split_pdf(self, file_path: str, page_ranges: List[Dict], output_dir: str = None) -> Dict[str, Any]:
+        """Split PDF into multiple files based on page ranges"""
+        return await executors.cpu.run(self._split_pdf, file_path, page_ranges, output_dir)
+    
+    async def compress_pdf(self, file_path: str, quality: str = "medium", output_dir: str = None, progress: Progress = None) -> Dict[str, Any]:
+        """
+        Compress PDF file
+        
+        Embedded images are downsampled and JPEG re-encoded according to the
+        quality profile (low / medium / high), with page ranges processed in
+        parallel on the process pool. Identical images and font programs are
+        stored once, and content streams are flate-compressed. The result
+        reports bytes per object class before and after.
+        
+        Raises:
+            ValueError: If quality is not a known profile
+        """
+        if quality not in COMPRESSION_PROFILES:
+            raise ValueError(f"Unknown compression quality '{quality}', expected one of {', '.join(COMPRESSION_PROFILES)}")
         try:
-            merger = PdfMerger()
+            plan = await executors.cpu.run(plan_images, file_path)
+            slots = asyncio.Semaphore(executors.cpu.max_workers)
+            done = 0
+            
+            async def recompress(first_page: int, last_page: int, keys: List[str]) -> Dict[str, Any]:
+                nonlocal done
+                result = {}
+                if keys:
+                    async with slots:
+                        result = await executors.cpu.run(recompress_images, file_path, first_page, last_page, keys, quality)
+                done += last_page - first_page + 1
+                if progress:
+                    progress(done, plan["num_pages"])
+                return result
+            
+            replacements = {}
+            for result in await asyncio.gather(*[recompress(*chunk) for chunk in page_chunks(plan)]):
+                replacements.update(result)
+            
+            output_filename = f"compressed_{uuid.uuid4()}.pdf"
+            output_path = os.path.join(output_dir or self.UPLOAD_DIR, output_filename)
+            report = await executors.cpu.run(write_compressed, file_path, output_path, replacements)
             
-            for pdf_path in file_paths:
-                merger.append(pdf_path)
+            original_size = os.path.getsize(file_path)
+            compressed_size = os.path.getsize(output_path)
+            
+            return {
+                "success": True,
+                "output_file": output_filename,
+                "output_path": output_path,
+                "quality": quality,
+                "profile": COMPRESSION_PROFILES[quality],
+                "original_size": original_size,
+                "compressed_size": compressed_size,
+                "compression_ratio": f"{((original_size - compressed_size) / original_size * 100):.1f}%",
+                **report,
+                "message": "PDF compressed successfully"
+            }
+        except ExecutorSaturated:
+            raise
+        except Exception as e:
+            logger.error(f"Error compressing PDF: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def rotate_pdf(self, file_path: str, angle: int, pages: str = "all", output_dir: str = None) -> Dict[str, Any]:
+        """Rotate PDF pages"""
+        return await executors.cpu.run(self._rotate_pdf, file_path, angle, pages, output_dir)
+    
+    async def pdf_to_images(
+        self,
+        file_path: str,
+        owner_id: str,
+        dpi: int = PDF_RENDER_DPI,
+        fmt: str = "png",
+        thumbnail: bool = False,
+        first_page: int = 1,
+        last_page: int = None
+    ) -> Dict[str, Any]:
+        """
+        Convert PDF pages to images
+        
+        Pages are rendered into the render cache and described by page number;
+        the images themselves are served per page from the document's hash.
+        
+        Raises:
+            ValueError: If the format or resolution is not supported, or the file is not accessible
+        """
+        pdf_renderer.variant(dpi, fmt, thumbnail)
+        document = await self.ensure_upload(file_path, owner_id)
+        try:
+            pages = []
+            async for page in pdf_renderer.render_pages(document["file_path"], first_page, last_page, dpi, fmt, thumbnail, document["sha256"]):
+                pages.append({key: value for key, value in page.items() if key != "path"})
+            
+            return {
+                "success": True,
+                "sha256": document["sha256"],
+                "pages": pages,
+                "num_pages": len(pages),
+                "message": f"PDF converted to {len(pages)} images"
+            }
+        except ExecutorSaturated:
+            raise
+        except Exception as e:
+            logger.error(f"Error converting PDF to images: {e}")
+            return {"success": False, "error": str(e)}
+    
+    async def add_watermark(self, file_path: str, watermark_text: str, output_dir: str = None) -> Dict[str, Any]:
+        """Add watermark to PDF"""
+        return await executors.cpu.run(self._add_watermark, file_path, watermark_text, output_dir)
+    
+    async def protect_pdf(self, file_path: str, password: str, output_dir: str = None) -> Dict[str, Any]:
+        """Password protect PDF"""
+        return await executors.cpu.run(self._protect_pdf, file_path, password, output_dir)
+    
+    async def extract_text(self, file_path: str, mode: str = "hybrid") -> Dict[str, Any]:
+        """
+        Extract text from PDF, reusing earlier results for identical file contents
+        
+        mode "text" reads only the embedded text layer, "ocr" OCRs every page and
+        "hybrid" uses the text layer where it scores as usable and OCRs the rest.
+        Each page reports the 'method' that produced its text.
+        """
+        if mode not in EXTRACTION_MODES:
+            raise ValueError(f"Unsupported extraction mode '{mode}', expected one of {', '.join(EXTRACTION_MODES)}")
+        if not os.path.isfile(file_path):
+            return {"success": False, "error": f"File not found: {file_path}"}
+        if mode != "text":
+            return await self._extract_text_paged(file_path, mode)
+        
+        try:
+            digest = await executors.io.run(extraction_cache.file_digest, file_path)
+        except OSError as e:
+            return {"success": False, "error": str(e)}
+        
+        cached = await executors.io.run(extraction_cache.get_document, digest, "pypdf2", {})
+        if cached is not None:
+            return {
+                "success": True,
+                "num_pages": len(cached),
+                "content": cached,
+                "cached": True,
+                "message": "Text extracted successfully"
+            }
+        
+        result = await executors.cpu.run(self._extract_text, file_path)
+        if result.get("success"):
+            await executors.io.run(extraction_cache.set_document, digest, "pypdf2", {}, result["content"])
+        return result
+    
+    async def _extract_text_paged(self, file_path: str, mode: str) -> Dict[str, Any]:
+        try:
+            content = [page async for page in ocr_service.stream_pdf_pages(file_path, mode=mode)]
+        except Exception as e:
+            logger.error(f"Error extracting text ({mode}): {e}")
+            return {"success": False, "error": str(e)}
+        
+        methods: Dict[str, List[int]] = {}
+        for page in content:
+            methods.setdefault(page["method"], []).append(page["page"])
+        return {
+            "success": True,
+            "num_pages": len(content),
+            "content": content,
+            "mode": mode,
+            "pages_by_method": methods,
+            "cached": bool(content) and all(page.get("cached") for page in content),
+            "message": "Text extracted successfully"
+        }
+    
+    async def get_pdf_info(self, file_path: str) -> Dict[str, Any]:
+        """Get PDF metadata and information"""
+        return await executors.cpu.run(self._get_pdf_info, file_path)
+    
+    def _store_upload(self, source: BinaryIO, owner_dir: str, max_bytes: int) -> Dict[str, Any]:
+        os.makedirs(owner_dir, exist_ok=True)
+        tmp_path = os.path.join(owner_dir, f".upload-{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as out:
+                for chunk in iter(lambda: source.read(PDF_UPLOAD_CHUNK_KB * 1024), b""):
+                    # The spec allows the header anywhere in the first 1024 bytes
+                    if size == 0 and b"%PDF-" not in chunk[:1024]:
+                        raise ValueError("Uploaded file is not a PDF")
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise UploadTooLarge(f"File exceeds the {PDF_UPLOAD_MAX_MB} MB upload limit")
+                    digest.update(chunk)
+                    out.write(chunk)
+            if size == 0:
+                raise ValueError("Uploaded file is empty")
+            
+            sha256 = digest.hexdigest()
+            file_path = os.path.join(owner_dir, sha256[:2], f"{sha256}.pdf")
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(tmp_path, file_path)
+            return {"file_path": file_path, "sha256": sha256, "size": size}
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _merge_pdfs(
+        self,
+        file_paths: List[str],
+        output_dir: str = None,
+        progress: Progress = None,
+        outline: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Merge multiple PDF files into one, optionally adding a top-level bookmark per file"""
+        try:
+            # PdfWriter.append rather than PdfMerger: PyPDF2 3.0's merger writes outline items with broken page destinations
+            writer = PdfWriter()
+            readers = [cached_reader(pdf_path) for pdf_path in file_paths]
+            page_counts = [len(reader.pages) for reader in readers]
+            total_pages = sum(page_counts)
+            
+            done = 0
+            for idx, reader in enumerate(readers):
+                writer.append(reader, outline_item=outline[idx] if outline else None)
+                done += page_counts[idx]
+                if progress:
+                    progress(done, total_pages)
             
             output_filename = f"merged_{uuid.uuid4()}.pdf"
-            output_path = os.path.join(self.UPLOAD_DIR, output_filename)
+            output_path = os.path.join(output_dir or self.UPLOAD_DIR, output_filename)
             
-            merger.write(output_path)
-            merger.close()
+            writer.write(output_path)
+            writer.close()
             
             return {
                 "success": True,
                 "output_file": output_filename,
                 "output_path": output_path,
+                "page_counts": page_counts,
                 "message": "PDFs merged successfully"
             }
         except Exception as e:
             logger.error(f"Error merging PDFs: {e}")
             return {"success": False, "error": str(e)}
     
-    async def split_pdf(self, file_path: str, page_ranges: List[Dict]) -> Dict[str, Any]:
+    def _split_pdf(self, file_path: str, page_ranges: List[Dict], output_dir: str = None, progress: Progress = None) -> Dict[str, Any]:
         """Split PDF into multiple files based on page ranges"""
         try:
             reader = PdfReader(file_path)
             output_files = []
+            bounds = [
+                (max(0, page_range.get('start', 1) - 1), min(page_range.get('end', len(reader.pages)), len(reader.pages)))
+                for page_range in page_ranges
+            ]
+            total_pages = sum(max(0, end - start) for start, end in bounds)
+            done = 0
             
-            for idx, page_range in enumerate(page_ranges):
+            for idx, (start, end) in enumerate(bounds):
                 writer = PdfWriter()
-                start = page_range.get('start', 1) - 1
-                end = page_range.get('end', len(reader.pages))
                 
                 for page_num in range(start, end):
-                    if page_num < len(reader.pages):
-                        writer.add_page(reader.pages[page_num])
+                    writer.add_page(reader.pages[page_num])
+                    done += 1
+                    if progress:
+                        progress(done, total_pages)
                 
                 output_filename = f"split_{idx}_{uuid.uuid4()}.pdf"
-                output_path = os.path.join(self.UPLOAD_DIR, output_filename)
+                output_path = os.path.join(output_dir or self.UPLOAD_DIR, output_filename)
                 
                 with open(output_path, 'wb') as output_file:
                     writer.write(output_file)
@@ -77,39 +424,7 @@ class PDFToolsService:
             logger.error(f"Error splitting PDF: {e}")
             return {"success": False, "error": str(e)}
     
-    async def compress_pdf(self, file_path: str, quality: str = "medium") -> Dict[str, Any]:
-        """Compress PDF file"""
-        try:
-            reader = PdfReader(file_path)
-            writer = PdfWriter()
-            
-            for page in reader.pages:
-                page.compress_content_streams()
-                writer.add_page(page)
-            
-            output_filename = f"compressed_{uuid.uuid4()}.pdf"
-            output_path = os.path.join(self.UPLOAD_DIR, output_filename)
-            
-            with open(output_path, 'wb') as output_file:
-                writer.write(output_file)
-            
-            original_size = os.path.getsize(file_path)
-            compressed_size = os.path.getsize(output_path)
-            
-            return {
-                "success": True,
-                "output_file": output_filename,
-                "output_path": output_path,
-                "original_size": original_size,
-                "compressed_size": compressed_size,
-                "compression_ratio": f"{((original_size - compressed_size) / original_size * 100):.1f}%",
-                "message": "PDF compressed successfully"
-            }
-        except Exception as e:
-            logger.error(f"Error compressing PDF: {e}")
-            return {"success": False, "error": str(e)}
-    
-    async def rotate_pdf(self, file_path: str, angle: int, pages: str = "all") -> Dict[str, Any]:
+    def _rotate_pdf(self, file_path: str, angle: int, pages: str = "all", output_dir: str = None, progress: Progress = None) -> Dict[str, Any]:
         """Rotate PDF pages"""
         try:
             reader = PdfReader(file_path)
@@ -119,9 +434,11 @@ class PDFToolsService:
                 if pages == "all" or str(idx + 1) in pages.split(','):
                     page.rotate(angle)
                 writer.add_page(page)
+                if progress:
+                    progress(idx + 1, len(reader.pages))
             
             output_filename = f"rotated_{uuid.uuid4()}.pdf"
-            output_path = os.path.join(self.UPLOAD_DIR, output_filename)
+            output_path = os.path.join(output_dir or self.UPLOAD_DIR, output_filename)
             
             with open(output_path, 'wb') as output_file:
                 writer.write(output_file)
@@ -136,24 +453,7 @@ class PDFToolsService:
             logger.error(f"Error rotating PDF: {e}")
             return {"success": False, "error": str(e)}
     
-    async def pdf_to_images(self, file_path: str) -> Dict[str, Any]:
-        """Convert PDF pages to images"""
-        try:
-            # Mock implementation - would use pdf2image in production
-            reader = PdfReader(file_path)
-            num_pages = len(reader.pages)
-            
-            return {
-                "success": True,
-                "message": f"PDF converted to {num_pages} images",
-                "num_pages": num_pages,
-                "note": "Image conversion mock - install pdf2image for actual conversion"
-            }
-        except Exception as e:
-            logger.error(f"Error converting PDF to images: {e}")
-            return {"success": False, "error": str(e)}
-    
-    async def add_watermark(self, file_path: str, watermark_text: str) -> Dict[str, Any]:
+    def _add_watermark(self, file_path: str, watermark_text: str, output_dir: str = None) -> Dict[str, Any]:
         """Add watermark to PDF"""
         try:
             reader = PdfReader(file_path)
@@ -164,7 +464,7 @@ class PDFToolsService:
                 writer.add_page(page)
             
             output_filename = f"watermarked_{uuid.uuid4()}.pdf"
-            output_path = os.path.join(self.UPLOAD_DIR, output_filename)
+            output_path = os.path.join(output_dir or self.UPLOAD_DIR, output_filename)
             
             with open(output_path, 'wb') as output_file:
                 writer.write(output_file)
@@ -180,7 +480,7 @@ class PDFToolsService:
             logger.error(f"Error adding watermark: {e}")
             return {"success": False, "error": str(e)}
     
-    async def protect_pdf(self, file_path: str, password: str) -> Dict[str, Any]:
+    def _protect_pdf(self, file_path: str, password: str, output_dir: str = None) -> Dict[str, Any]:
         """Password protect PDF"""
         try:
             reader = PdfReader(file_path)
@@ -192,7 +492,7 @@ class PDFToolsService:
             writer.encrypt(password)
             
             output_filename = f"protected_{uuid.uuid4()}.pdf"
-            output_path = os.path.join(self.UPLOAD_DIR, output_filename)
+            output_path = os.path.join(output_dir or self.UPLOAD_DIR, output_filename)
             
             with open(output_path, 'wb') as output_file:
                 writer.write(output_file)
@@ -207,7 +507,7 @@ class PDFToolsService:
             logger.error(f"Error protecting PDF: {e}")
             return {"success": False, "error": str(e)}
     
-    async def extract_text(self, file_path: str) -> Dict[str, Any]:
+    def _extract_text(self, file_path: str) -> Dict[str, Any]:
         """Extract text from PDF"""
         try:
             reader = PdfReader(file_path)
@@ -217,7 +517,8 @@ class PDFToolsService:
                 text = page.extract_text()
                 text_content.append({
                     "page": idx + 1,
-                    "text": text
+                    "text": text,
+                    "method": "text_layer"
                 })
             
             return {
@@ -230,7 +531,7 @@ class PDFToolsService:
             logger.error(f"Error extracting text: {e}")
             return {"success": False, "error": str(e)}
     
-    async def get_pdf_info(self, file_path: str) -> Dict[str, Any]:
+    def _get_pdf_info(self, file_path: str) -> Dict[str, Any]:
         """Get PDF metadata and information"""
         try:
             reader = PdfReader(file_path)
@@ -240,7 +541,7 @@ class PDFToolsService:
                 "info": {
                     "num_pages": len(reader.pages),
                     "file_size": os.path.getsize(file_path),
-                    "metadata": dict(reader.metadata) if reader.metadata else {},
+                    "metadata": {key: str(value) for key, value in reader.metadata.items()} if reader.metadata else {},
                     "is_encrypted": reader.is_encrypted
                 }
             }
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+import numpy as np
+from cachetools import LRUCache
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.executors import executors
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_MATCH_TOP_K = int(os.getenv('PRODUCT_MATCH_TOP_K', '5'))
+PRODUCT_MATCH_MIN_SCORE = float(os.getenv('PRODUCT_MATCH_MIN_SCORE', '0.1'))
+PRODUCT_MATCH_MAX_LINES = int(os.getenv('PRODUCT_MATCH_MAX_LINES', '10000'))
+PRODUCT_MATCH_MAX_USERS = int(os.getenv('PRODUCT_MATCH_MAX_USERS', '500'))
+# Other workers' product writes only reach this worker's index through a rebuild
+PRODUCT_MATCH_REBUILD_SECONDS = int(os.getenv('PRODUCT_MATCH_REBUILD_SECONDS', '600'))
+# Upper bound on line x product scores accumulated per block, to cap memory
+PRODUCT_MATCH_BLOCK_CELLS = int(os.getenv('PRODUCT_MATCH_BLOCK_CELLS', '4000000'))
+# Upper bound on (query term, posting) pairs gathered at once; each pair costs ~40 bytes of temporaries
+PRODUCT_MATCH_BLOCK_PAIRS = int(os.getenv('PRODUCT_MATCH_BLOCK_PAIRS', '2000000'))
+# Terms in more than this share of products carry almost no signal and are dropped
+PRODUCT_MATCH_MAX_DF = float(os.getenv('PRODUCT_MATCH_MAX_DF', '0.5'))
+NGRAM = 3
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+# Product fields read to build the index
+PRODUCT_FIELDS = ["id", "productCode", "productName", "brand", "model", "specifications", "tags", "unitPrice", "unit"]
+
+def _features(text: str) -> Counter:
+    """Word tokens ('#word') plus character trigrams within word boundaries"""
+    counts: Counter = Counter()
+    for word in _NON_WORD.sub(" ", text.lower()).split():
+        counts["#" + word] += 1
+        padded = f" {word} "
+        for start in range(len(padded) - NGRAM + 1):
+            counts[padded[start:start + NGRAM]] += 1
+    return counts
+
+def product_text(product: Dict[str, Any]) -> str:
+    specifications = product.get("specifications") or {}
+    spec_text = " ".join(f"{key} {value}" for key, value in specifications.items()) if isinstance(specifications, dict) else str(specifications)
+    # The name is repeated so it outweighs long specification lists
+    return " ".join(str(part) for part in [
+        product.get("productName"), product.get("productName"), product.get("brand"), product.get("model"),
+        spec_text, " ".join(map(str, product.get("tags") or []))
+    ] if part)
+
+def line_text(line: Dict[str, Any]) -> str:
+    return " ".join(str(line.get(field)) for field in ("description", "specification") if line.get(field))
+
+class CatalogIndex:
+    """
+    TF-IDF index of one catalog over word and character-trigram features.
+
+    Product vectors are L2-normalised and stored column-wise as per-term
+    posting lists (CSC: term_ptr / term_products / term_weights), so
+    scoring a batch of BOQ lines is a sparse x sparse product: every
+    (line term, posting) pair is gathered with array indexing and summed
+    into a line x product score block with np.bincount. Both the block
+    (PRODUCT_MATCH_BLOCK_CELLS) and the pairs gathered per pass
+    (PRODUCT_MATCH_BLOCK_PAIRS) are capped, so peak memory does not grow
+    with batch size, line length or catalog size.
+    """
+
+    def __init__(self, products: List[Dict[str, Any]]):
+        self.products = [{field: product.get(field) for field in PRODUCT_FIELDS} for product in products]
+        documents = [_features(product_text(product)) for product in products]
+        document_frequency: Counter = Counter()
+        for features in documents:
+            document_frequency.update(features.keys())
+
+        count = len(documents)
+        max_df = PRODUCT_MATCH_MAX_DF * count if count >= 10 else count
+        self.vocabulary = {
+            term: index for index, term in enumerate(sorted(term for term, df in document_frequency.items() if df <= max_df))
+        }
+        self.idf = np.ones(len(self.vocabulary), dtype=np.float32)
+        for term, index in self.vocabulary.items():
+            self.idf[index] = math.log((1 + count) / (1 + document_frequency[term])) + 1
+
+        rows, terms, weights = self._vectorize(documents)
+        # Row-major (product, term) pairs regrouped into per-term posting lists
+        order = np.argsort(terms, kind="stable")
+        self.term_products = rows[order]
+        self.term_weights = weights[order]
+        self.term_ptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)), out=self.term_ptr[1:])
+        self.built_at = time.monotonic()
+
+    def _vectorize(self, documents: List[Counter]):
+        rows, terms, weights = [], [], []
+        for row, features in enumerate(documents):
+            known = [(self.vocabulary[term], tf) for term, tf in features.items() if term in self.vocabulary]
+            if not known:
+                continue
+            index = np.fromiter((term for term, _ in known), dtype=np.int64, count=len(known))
+            weight = (1 + np.log(np.fromiter((tf for _, tf in known), dtype=np.float32, count=len(known)))) * self.idf[index]
+            rows.append(np.full(len(known), row, dtype=np.int64))
+            terms.append(index)
+            weights.append(weight / np.linalg.norm(weight))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(terms), np.concatenate(weights).astype(np.float32)
+
+    def _score_pairs(self, rows: np.ndarray, terms: np.ndarray, weights: np.ndarray, lengths: np.ndarray, cells: int) -> np.ndarray:
+        """Flat line x product scores contributed by the given query nonzeros"""
+        product_count = len(self.products)
+        # Flat positions of every posting of every query term
+        offsets = np.cumsum(lengths) - lengths
+        postings = np.arange(int(lengths.sum())) + np.repeat(self.term_ptr[terms] - offsets, lengths)
+        return np.bincount(
+            np.repeat(rows, lengths) * product_count + self.term_products[postings],
+            weights=self.term_weights[postings] * np.repeat(weights, lengths),
+            minlength=cells
+        )
+
+    def match(self, texts: List[str], top_k: int = PRODUCT_MATCH_TOP_K, min_score: float = PRODUCT_MATCH_MIN_SCORE) -> List[List[Dict[str, Any]]]:
+        """Top-k products (with cosine scores) for each text"""
+        product_count = len(self.products)
+        results: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        if not product_count or not texts:
+            return results
+
+        rows, terms, weights = self._vectorize([_features(text) for text in texts])
+        # Query nonzeros are row-major, so each block of lines is a contiguous slice
+        line_ptr = np.searchsorted(rows, np.arange(len(texts) + 1))
+        k = min(top_k, product_count)
+        block = max(1, PRODUCT_MATCH_BLOCK_CELLS // product_count)
+        for first in range(0, len(texts), block):
+            last = min(first + block, len(texts))
+            start, end = line_ptr[first], line_ptr[last]
+            if start == end:
+                continue
+            lengths = self.term_ptr[terms[start:end] + 1] - self.term_ptr[terms[start:end]]
+            pair_ends = np.cumsum(lengths)
+            scores = np.zeros((last - first) * product_count)
+            # Query terms are scored in runs of at most PRODUCT_MATCH_BLOCK_PAIRS postings
+            run_start = 0
+            while run_start < end - start:
+                limit = (pair_ends[run_start - 1] if run_start else 0) + PRODUCT_MATCH_BLOCK_PAIRS
+                run_end = max(run_start + 1, int(np.searchsorted(pair_ends, limit, side="right")))
+                scores += self._score_pairs(
+                    rows[start + run_start:start + run_end] - first,
+                    terms[start + run_start:start + run_end],
+                    weights[start + run_start:start + run_end],
+                    lengths[run_start:run_end],
+                    scores.size
+                )
+                run_start = run_end
+            scores = scores.reshape(last - first, product_count)
+
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < product_count else np.tile(np.arange(product_count), (last - first, 1))
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            ranking = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, ranking, axis=1)
+            best_scores = np.take_along_axis(best_scores, ranking, axis=1)
+            for offset, (indices, values) in enumerate(zip(best.tolist(), best_scores.tolist())):
+                results[first + offset] = [
+                    {**self.products[index], "score": round(value, 4)}
+                    for index, value in zip(indices, values) if value >= min_score
+                ]
+        return results
+
+def build_catalog_index(products: List[Dict[str, Any]]) -> CatalogIndex:
+    return CatalogIndex(products)
+
+class ProductMatcher:
+    """
+    Deterministic BOQ line-item to product matching against a tenant's
+    active catalog.
+
+    Catalog indexes are built lazily per user on the cpu process pool,
+    kept in an LRU, dropped on that user's product writes and rebuilt after
+    PRODUCT_MATCH_REBUILD_SECONDS to pick up writes made through other
+    workers. Scoring runs on the io thread pool against the cached index:
+    the NumPy kernels release the GIL, and shipping the index to a worker
+    process would cost far more than the scoring itself.
+    """
+
+    def __init__(self):
+        self._indexes: LRUCache = LRUCache(maxsize=PRODUCT_MATCH_MAX_USERS)
+        self._generations: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def invalidate(self, owner_id: str):
+        """Drop a user's catalog index after one of their products changed"""
+        self._indexes.pop(owner_id, None)
+        self._generations[owner_id] = self._generations.get(owner_id, 0) + 1
+
+    def _fresh(self, index: Optional[CatalogIndex]) -> bool:
+        return index is not None and time.monotonic() - index.built_at < PRODUCT_MATCH_REBUILD_SECONDS
+
+    async def get_index(self, db: AsyncIOMotorDatabase, owner_id: str) -> CatalogIndex:
+        index = self._indexes.get(owner_id)
+        if self._fresh(index):
+            return index
+
+        lock = self._locks.setdefault(owner_id, asyncio.Lock())
+        async with lock:
+            index = self._indexes.get(owner_id)
+            if not self._fresh(index):
+                generation = self._generations.get(owner_id, 0)
+                started = time.monotonic()
+                products = await db.products.find(
+                    {"userId": owner_id, "isActive": True}, {"_id": 0, **{field: 1 for field in PRODUCT_FIELDS}}
+                ).to_list(length=None)
+                index = await executors.cpu.run(build_catalog_index, products)
+                # Monotonic clocks differ between processes, so restamp in this one
+                index.built_at = time.monotonic()
+                # A product write during the build would leave this index stale
+                if self._generations.get(owner_id, 0) == generation:
+                    self._indexes[owner_id] = index
+                logger.info(
+                    f"Built product match index for {owner_id}: {len(products)} products, "
+                    f"{len(index.vocabulary)} terms in {(time.monotonic() - started) * 1000:.0f} ms"
+                )
+        self._locks.pop(owner_id, None)
+        return index
+
+    async def match_lines(
+        self,
+        db: AsyncIOMotorDatabase,
+        owner_id: str,
+        line_items: List[Dict[str, Any]],
+        top_k: int = PRODUCT_MATCH_TOP_K,
+        min_score: float = PRODUCT_MATCH_MIN_SCORE
+    ) -> Dict[str, Any]:
+        """
+        Candidate products for each line's description and specification
+
+        Raises:
+            ValueError: If there are no lines, too many lines, or top_k is out of range
+        """
+        if not line_items:
+            raise ValueError("No line items to match")
+        if len(line_items) > PRODUCT_MATCH_MAX_LINES:
+            raise ValueError(f"At most {PRODUCT_MATCH_MAX_LINES} line items can be matched at once")
+        if not 1 <= top_k <= 50:
+            raise ValueError("top_k must be between 1 and 50")
+
+        index = await self.get_index(db, owner_id)
+        candidates = await executors.io.run(index.match, [line_text(line) for line in line_items], top_k, min_score)
+        return {
+            "products_indexed": len(index.products),
+            "matched": sum(1 for found in candidates if found),
+            "data": [
+                {
+                    "index": position,
+                    "itemNumber": line.get("itemNumber"),
+                    "productId": line.get("productId"),
+                    "candidates": found
+                }
+                for position, (line, found) in enumerate(zip(line_items, candidates))
+            ]
+        }
+
+# Global instance
+product_matcher = ProductMatcher()
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import re
+from typing import Dict, Any, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.index_registry import index_registry
+
+logger = logging.getLogger(__name__)
+
+# Field weights per collection. Each collection gets one compound text index
+# prefixed by its owner field, so every query is scoped to a single tenant
+# and never has to scan other users' documents.
+SEARCH_COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "tenders": {
+        "owner_field": "userId",
+        "weights": {"title": 10, "tenderNumber": 10, "organization": 5, "department": 3, "category": 3, "tags": 3, "description": 1}
+    },
+    "products": {
+        "owner_field": "userId",
+        "weights": {"productName": 10, "productCode": 10, "brand": 5, "model": 5, "category": 3, "tags": 3, "description": 1}
+    },
+    "vendors": {
+        "owner_field": "userId",
+        "weights": {"companyName": 10, "categories": 3, "tags": 3, "city": 2, "state": 1, "notes": 1}
+    },
+    "boqs": {
+        "owner_field": "userId",
+        "weights": {"title": 10, "boqNumber": 10, "lineItems.description": 2, "notes": 1}
+    },
+    "bid_submissions": {
+        "owner_field": "user_id",
+        "weights": {"tender_title": 10, "tender_number": 10, "organization": 5, "remarks": 1}
+    }
+}
+
+COLLECTION_ALIASES = {"boq": "boqs"}
+
+# Counting stops here; larger totals are reported as estimates
+COUNT_ESTIMATE_CAP = 1000
+
+# Tender/bid numbers such as GEM/2025/B/123456 are matched as exact phrases
+# instead of OR-ing their parts, which would match every 2025 tender
+_IDENTIFIER = re.compile(r"^[\w]+(?:[/\-.][\w]+)+$")
+
+for _collection, _spec in SEARCH_COLLECTIONS.items():
+    index_registry.register(
+        _collection,
+        [(_spec["owner_field"], 1)] + [(field, "text") for field in _spec["weights"]],
+        weights=_spec["weights"],
+        default_language="english",
+        language_override="searchLanguage",
+        name=f"{_collection}_search"
+    )
+
+class SearchEngine:
+    """Ranked full-text search over MongoDB text indexes, scoped per user"""
+
+    def build_text_query(self, query: str) -> str:
+        """Turn user input into a $text search string"""
+        terms = []
+        for token in query.split():
+            token = token.replace('"', '')
+            if not token:
+                continue
+            terms.append(f'"{token}"' if _IDENTIFIER.match(token) else token)
+        return " ".join(terms)
+
+    def resolve_collections(self, collection: Optional[str]) -> List[str]:
+        if not collection:
+            return list(SEARCH_COLLECTIONS.keys())
+        collection = COLLECTION_ALIASES.get(collection, collection)
+        if collection not in SEARCH_COLLECTIONS:
+            raise ValueError(f"Collection '{collection}' is not searchable")
+        return [collection]
+
+    async def search_collection(
+        self,
+        db: AsyncIOMotorDatabase,
+        collection_name: str,
+        owner_id: str,
+        query: str,
+        page: int,
+        limit: int
+    ) -> Optional[Dict[str, Any]]:
+        """Search one collection, ordered by text score"""
+        try:
+            spec = SEARCH_COLLECTIONS[collection_name]
+            text_filter = {
+                spec["owner_field"]: owner_id,
+                "$text": {"$search": self.build_text_query(query)}
+            }
+            skip = (page - 1) * limit
+
+            cursor = db[collection_name].find(
+                text_filter,
+                {"_id": 0, "score": {"$meta": "textScore"}}
+            ).sort([("score", {"$meta": "textScore"})]).skip(skip).limit(limit)
+            items = await cursor.to_list(length=limit)
+
+            # A short first page already is the exact total; otherwise count up to the cap
+            if page == 1 and len(items) < limit:
+                total, estimated = len(items), False
+            else:
+                total = await db[collection_name].count_documents(text_filter, limit=COUNT_ESTIMATE_CAP)
+                estimated = total >= COUNT_ESTIMATE_CAP
+
+            return {
+                "total": total,
+                "total_is_estimate": estimated,
+                "page": page,
+                "limit": limit,
+                "items": items
+            }
+        except Exception as e:
+            logger.error(f"Error searching collection {collection_name}: {e}")
+            return None
+
+    async def search(
+        self,
+        db: AsyncIOMotorDatabase,
+        owner_id: str,
+        query: str,
+        collection: Optional[str] = None,
+        page: int = 1,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """Search all (or one) collections concurrently and merge a ranked top list"""
+        collections = self.resolve_collections(collection)
+
+        responses = await asyncio.gather(*[
+            self.search_collection(db, name, owner_id, query, page, limit)
+            for name in collections
+        ])
+
+        results = {name: response for name, response in zip(collections, responses) if response}
+
+        ranked = [
+            {"type": name, "score": item.get("score", 0), "item": item}
+            for name, response in results.items()
+            for item in response["items"]
+        ]
+        ranked.sort(key=lambda hit: hit["score"], reverse=True)
+
+        return {
+            "total_results": sum(r["total"] for r in results.values()),
+            "total_is_estimate": any(r["total_is_estimate"] for r in results.values()),
+            "results": results,
+            "ranked": ranked[:limit]
+        }
+
+# Global instance
+search_engine = SearchEngine()
@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from datetime import datetime, timezone, timedelta
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from services.cpp_portal_scraper import cpp_scraper
+from services.executors import executors
+from services.gem_crawler import gem_crawler, GEM_CRAWLER_ENABLED
+from services.gem_scraper import gem_scraper
+from services.index_registry import index_registry
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the background schedule; runs can still be triggered from the super admin API
+TENDER_INGESTION_INTERVAL_MINUTES = int(os.getenv('TENDER_INGESTION_INTERVAL_MINUTES', '0'))
+TENDER_INGESTION_KEYWORDS = [
+    keyword.strip()
+    for keyword in os.getenv('TENDER_INGESTION_KEYWORDS', 'IT Hardware,Office Equipment,Furniture').split(',')
+    if keyword.strip()
+]
+TENDER_INGESTION_BATCH_SIZE = int(os.getenv('TENDER_INGESTION_BATCH_SIZE', '500'))
+# Listings published shortly before the high-water mark are re-checked to catch late edits
+TENDER_INGESTION_OVERLAP_HOURS = int(os.getenv('TENDER_INGESTION_OVERLAP_HOURS', '24'))
+TENDER_INGESTION_LEASE_SECONDS = int(os.getenv('TENDER_INGESTION_LEASE_SECONDS', '1800'))
+
+CATALOG_COLLECTION = "portal_tenders"
+STATE_COLLECTION = "ingestion_state"
+RUNS_COLLECTION = "ingestion_runs"
+
+index_registry.register(CATALOG_COLLECTION, [("source", 1), ("tender_number", 1)], unique=True)
+index_registry.register(CATALOG_COLLECTION, [("source", 1), ("publish_date", -1)])
+index_registry.register(STATE_COLLECTION, "source", unique=True)
+index_registry.register(RUNS_COLLECTION, [("source", 1), ("started_at", -1)])
+
+# Fields that identify a listing's content; anything else (crawl metadata) does not count as a change
+HASHED_FIELDS = (
+    "tender_number", "title", "organization", "department", "category", "location",
+    "publish_date", "submission_deadline", "tender_value", "emd_amount", "status",
+    "document_url", "description", "type", "quantity"
+)
+
+Fetcher = Callable[[str, Optional[str]], Awaitable[List[Dict[str, Any]]]]
+
+def normalize_date(value: Any) -> Optional[str]:
+    """ISO-8601 UTC string for portal dates ('2025-01-31', ISO strings or datetimes)"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+def content_hash(tender: Dict[str, Any]) -> str:
+    payload = {field: tender.get(field) for field in HASHED_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+async def _fetch_gem(keywords: str, since: Optional[str]) -> List[Dict[str, Any]]:
+    if GEM_CRAWLER_ENABLED:
+        # Validators are shared with searches and syncs; a 304 replays the cached rows, so nothing is skipped here
+        return await gem_crawler.crawl(keywords, since=since)
+    return await executors.io.run(gem_scraper.search_tenders, keywords)
+
+async def _fetch_cppp(keywords: str, since: Optional[str]) -> List[Dict[str, Any]]:
+    return await executors.io.run(cpp_scraper.search_tenders, keywords)
+
+class TenderIngestion:
+    """
+    Incremental ingestion of portal listings into the shared portal_tenders catalog.
+
+    Each run fetches listings published since the source's high-water mark
+    (minus an overlap window), content-hashes them, and writes only new or
+    changed listings in bulk_write batches. A lease in ingestion_state keeps
+    concurrent workers from running the same source twice.
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, Fetcher] = {"gem": _fetch_gem, "cppp": _fetch_cppp}
+        self.worker_id = str(uuid.uuid4())
+        self._task: Optional[asyncio.Task] = None
+
+    async def _acquire_lease(self, db: AsyncIOMotorDatabase, source: str) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        try:
+            return await db[STATE_COLLECTION].find_one_and_update(
+                {"source": source, "$or": [{"lease_until": {"$lt": now.isoformat()}}, {"lease_until": None}]},
+                {"$set": {
+                    "lease_until": (now + timedelta(seconds=TENDER_INGESTION_LEASE_SECONDS)).isoformat(),
+                    "lease_owner": self.worker_id
+                }},
+                upsert=True,
+                return_document=True,
+                projection={"_id": 0}
+            )
+        except DuplicateKeyError:
+            # Another worker holds the lease
+            return None
+
+    async def _release_lease(self, db: AsyncIOMotorDatabase, source: str, updates: Dict[str, Any]):
+        await db[STATE_COLLECTION].update_one(
+            {"source": source, "lease_owner": self.worker_id},
+            {"$set": {**updates, "lease_until": None, "lease_owner": None}}
+        )
+
+    async def _write_batch(self, db: AsyncIOMotorDatabase, source: str, batch: List[Dict[str, Any]], now: str) -> Dict[str, int]:
+        hashes = {tender["tender_number"]: content_hash(tender) for tender in batch}
+        known = {}
+        async for doc in db[CATALOG_COLLECTION].find(
+            {"source": source, "tender_number": {"$in": list(hashes)}},
+            {"_id": 0, "tender_number": 1, "content_hash": 1}
+        ):
+            known[doc["tender_number"]] = doc.get("content_hash")
+
+        operations = []
+        for tender in batch:
+            number = tender["tender_number"]
+            if known.get(number) == hashes[number]:
+                continue
+            operations.append(UpdateOne(
+                {"source": source, "tender_number": number},
+                {
+                    "$set": {**tender, "source": source, "content_hash": hashes[number], "updated_at": now},
+                    "$setOnInsert": {"id": str(uuid.uuid4()), "ingested_at": now}
+                },
+                upsert=True
+            ))
+
+        inserted = updated = 0
+        if operations:
+            result = await db[CATALOG_COLLECTION].bulk_write(operations, ordered=False)
+            inserted, updated = result.upserted_count, result.modified_count
+        return {"unchanged": len(batch) - len(operations), "inserted": inserted, "updated": updated}
+
+    async def run_source(self, db: AsyncIOMotorDatabase, source: str, keywords: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run one incremental ingestion for a source and record its stats"""
+        if source not in self.sources:
+            raise ValueError(f"Unknown tender source '{source}'")
+
+        state = await self._acquire_lease(db, source)
+        if state is None:
+            return {"source": source, "status": "skipped", "reason": "already running"}
+
+        started = time.monotonic()
+        started_at = datetime.now(timezone.utc).isoformat()
+        watermark = state.get("high_water_mark")
+        since = None
+        if watermark:
+            since = (datetime.fromisoformat(watermark) - timedelta(hours=TENDER_INGESTION_OVERLAP_HOURS)).isoformat()
+
+        stats = {"fetched": 0, "older_than_watermark": 0, "unchanged": 0, "inserted": 0, "updated": 0, "errors": 0}
+        new_watermark = watermark
+        # Only a run whose fetches and writes all succeeded may advance the mark,
+        # otherwise listings that were never written would fall behind it for good
+        saved_watermark = watermark
+
+        try:
+            listings: Dict[str, Dict[str, Any]] = {}
+            fetch_started = time.monotonic()
+            for keyword in keywords or TENDER_INGESTION_KEYWORDS:
+                try:
+                    for tender in await self.sources[source](keyword, since):
+                        if tender.get("tender_number"):
+                            listings[tender["tender_number"]] = tender
+                except Exception as e:
+                    stats["errors"] += 1
+                    logger.error(f"Ingestion fetch failed for {source} '{keyword}': {e}")
+            fetch_ms = (time.monotonic() - fetch_started) * 1000
+            stats["fetched"] = len(listings)
+
+            fresh = []
+            for tender in listings.values():
+                tender = {
+                    **tender,
+                    "publish_date": normalize_date(tender.get("publish_date")),
+                    "submission_deadline": normalize_date(tender.get("submission_deadline"))
+                }
+                if since and tender["publish_date"] and tender["publish_date"] < since:
+                    stats["older_than_watermark"] += 1
+                    continue
+                fresh.append(tender)
+                if tender["publish_date"] and (new_watermark is None or tender["publish_date"] > new_watermark):
+                    new_watermark = tender["publish_date"]
+
+            write_started = time.monotonic()
+            for offset in range(0, len(fresh), TENDER_INGESTION_BATCH_SIZE):
+                counts = await self._write_batch(db, source, fresh[offset:offset + TENDER_INGESTION_BATCH_SIZE], started_at)
+                for key, value in counts.items():
+                    stats[key] += value
+            write_ms = (time.monotonic() - write_started) * 1000
+            if not stats["errors"]:
+                saved_watermark = new_watermark
+
+            duration = time.monotonic() - started
+            run = {
+                "id": str(uuid.uuid4()),
+                "source": source,
+                "status": "completed" if not stats["errors"] else "completed_with_errors",
+                "started_at": started_at,
+                "since": since,
+                "high_water_mark": saved_watermark,
+                **stats,
+                "fetch_ms": round(fetch_ms),
+                "write_ms": round(write_ms),
+                "duration_ms": round(duration * 1000),
+                "listings_per_second": round(stats["fetched"] / duration, 1) if duration else None
+            }
+            await db[RUNS_COLLECTION].insert_one(dict(run))
+            logger.info(
+                f"Ingested {source}: {stats['fetched']} fetched, {stats['inserted']} new, "
+                f"{stats['updated']} changed, {stats['unchanged']} unchanged in {run['duration_ms']} ms"
+            )
+            return run
+        finally:
+            await self._release_lease(db, source, {
+                "high_water_mark": saved_watermark,
+                "last_run_at": started_at
+            })
+
+    async def run_all(self, db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+        """Ingest every source concurrently"""
+        return list(await asyncio.gather(*[self.run_source(db, source) for source in self.sources]))
+
+    async def recent_runs(self, db: AsyncIOMotorDatabase, source: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        query = {"source": source} if source else {}
+        return await db[RUNS_COLLECTION].find(query, {"_id": 0}).sort("started_at", -1).limit(limit).to_list(length=limit)
+
+    async def _loop(self, db: AsyncIOMotorDatabase):
+        while True:
+            try:
+                await self.run_all(db)
+            except Exception as e:
+                logger.error(f"Scheduled tender ingestion failed: {e}")
+            await asyncio.sleep(TENDER_INGESTION_INTERVAL_MINUTES * 60)
+
+    def start(self, db: AsyncIOMotorDatabase):
+        """Start the background schedule (no-op when TENDER_INGESTION_INTERVAL_MINUTES is 0)"""
+        if TENDER_INGESTION_INTERVAL_MINUTES > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop(db))
+            logger.info(f"Tender ingestion scheduled every {TENDER_INGESTION_INTERVAL_MINUTES} minutes")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global instance
+tender_ingestion = TenderIngestion()
@@ -0,0 +1,212 @@
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from cachetools import LRUCache
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.executors import executors
+
+logger = logging.getLogger(__name__)
+
+TYPEAHEAD_TOP_K = int(os.getenv('TYPEAHEAD_TOP_K', '10'))
+TYPEAHEAD_MAX_USERS = int(os.getenv('TYPEAHEAD_MAX_USERS', '2000'))
+TYPEAHEAD_MAX_KEY_LENGTH = int(os.getenv('TYPEAHEAD_MAX_KEY_LENGTH', '40'))
+# Other workers' writes only reach this worker's tries through a rebuild
+TYPEAHEAD_REBUILD_SECONDS = int(os.getenv('TYPEAHEAD_REBUILD_SECONDS', '600'))
+
+# collection -> (field, suggestion type, filter for live documents)
+SUGGESTION_SOURCES: Dict[str, Tuple[str, str, Dict[str, Any]]] = {
+    "tenders": ("title", "tender", {}),
+    "products": ("productName", "product", {"isActive": True}),
+    "vendors": ("companyName", "vendor", {"isActive": True})
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+Entry = Tuple[str, str]  # (type, text)
+
+class _Node:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.entries: set = set()
+        self.top: List[Entry] = []
+
+class PrefixTrie:
+    """
+    Character trie where every node caches its top-k entries by popularity,
+    so a lookup is a walk down the prefix plus a slice of the cached list.
+
+    Each text is indexed from the start of the string and from the start of
+    every word (edge n-grams), so "lap" matches "Supply of Laptops".
+
+    build() loads a whole collection at once and fills the cached lists in
+    a single post-order pass; add() and remove() keep them current per write.
+    """
+
+    def __init__(self, top_k: int = TYPEAHEAD_TOP_K):
+        self.top_k = top_k
+        self.root = _Node()
+        self.counts: Dict[Entry, int] = {}
+        self.built_at = time.monotonic()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _WHITESPACE.sub(" ", text).strip().lower()
+
+    def _keys(self, text: str) -> List[str]:
+        normalized = self.normalize(text)
+        starts = [0] + [i + 1 for i, char in enumerate(normalized) if char == " "]
+        return list(dict.fromkeys(normalized[start:start + TYPEAHEAD_MAX_KEY_LENGTH] for start in starts))
+
+    def _rank(self, entry: Entry):
+        return (-self.counts.get(entry, 0), entry[1])
+
+    def _recompute(self, node: _Node):
+        if not node.entries and len(node.children) == 1:
+            # Pass-through node: lists are replaced, never mutated, so the child's can be shared
+            node.top = next(iter(node.children.values())).top
+            return
+        candidates = set(node.entries)
+        for child in node.children.values():
+            candidates.update(child.top)
+        node.top = heapq.nsmallest(self.top_k, candidates, key=self._rank)
+
+    def _apply(self, entry: Entry, delta: int):
+        count = self.counts.get(entry, 0) + delta
+        if count > 0:
+            self.counts[entry] = count
+        else:
+            self.counts.pop(entry, None)
+
+        for key in self._keys(entry[1]):
+            path = [self.root]
+            for char in key:
+                node = path[-1].children.get(char)
+                if node is None:
+                    if count <= 0:
+                        break
+                    node = path[-1].children[char] = _Node()
+                path.append(node)
+            else:
+                if count > 0:
+                    path[-1].entries.add(entry)
+                else:
+                    path[-1].entries.discard(entry)
+
+                # Refresh cached top lists leaf-to-root, pruning empty branches
+                for depth in range(len(path) - 1, -1, -1):
+                    node = path[depth]
+                    self._recompute(node)
+                    if depth and not node.entries and not node.children:
+                        del path[depth - 1].children[key[depth - 1]]
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, Optional[str]]], top_k: int = TYPEAHEAD_TOP_K) -> "PrefixTrie":
+        """Trie over (type, text) pairs, with every node's top list computed once"""
+        trie = cls(top_k)
+        for kind, text in entries:
+            if text and text.strip():
+                entry = (kind, text.strip())
+                trie.counts[entry] = trie.counts.get(entry, 0) + 1
+
+        for entry in trie.counts:
+            for key in trie._keys(entry[1]):
+                node = trie.root
+                for char in key:
+                    child = node.children.get(char)
+                    if child is None:
+                        child = node.children[char] = _Node()
+                    node = child
+                node.entries.add(entry)
+
+        # Children before parents, so each node merges its children's finished lists
+        stack = [(trie.root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                trie._recompute(node)
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+        return trie
+
+    def add(self, kind: str, text: Optional[str]):
+        if text and text.strip():
+            self._apply((kind, text.strip()), 1)
+
+    def remove(self, kind: str, text: Optional[str]):
+        if text and text.strip() and (kind, text.strip()) in self.counts:
+            self._apply((kind, text.strip()), -1)
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        node = self.root
+        for char in self.normalize(prefix)[:TYPEAHEAD_MAX_KEY_LENGTH]:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [
+            {"text": text, "type": kind, "score": self.counts.get((kind, text), 0)}
+            for kind, text in node.top[:limit]
+        ]
+
+class TypeaheadIndex:
+    """Per-user prefix tries, built lazily from MongoDB and maintained on writes"""
+
+    def __init__(self):
+        self._tries: LRUCache = LRUCache(maxsize=TYPEAHEAD_MAX_USERS)
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def _build(self, db: AsyncIOMotorDatabase, owner_id: str) -> PrefixTrie:
+        started = time.monotonic()
+        entries = []
+        for collection, (field, kind, live_filter) in SUGGESTION_SOURCES.items():
+            cursor = db[collection].find({"userId": owner_id, **live_filter}, {"_id": 0, field: 1})
+            async for doc in cursor:
+                entries.append((kind, doc.get(field)))
+        # Building is pure CPU; keep it off the event loop
+        trie = await executors.io.run(PrefixTrie.build, entries)
+        logger.info(f"Built typeahead index for {owner_id}: {len(trie.counts)} entries in {(time.monotonic() - started) * 1000:.0f} ms")
+        return trie
+
+    async def get_trie(self, db: AsyncIOMotorDatabase, owner_id: str) -> PrefixTrie:
+        trie = self._tries.get(owner_id)
+        if trie is not None and time.monotonic() - trie.built_at < TYPEAHEAD_REBUILD_SECONDS:
+            return trie
+
+        lock = self._locks.setdefault(owner_id, asyncio.Lock())
+        async with lock:
+            trie = self._tries.get(owner_id)
+            if trie is None or time.monotonic() - trie.built_at >= TYPEAHEAD_REBUILD_SECONDS:
+                trie = await self._build(db, owner_id)
+                self._tries[owner_id] = trie
+        self._locks.pop(owner_id, None)
+        return trie
+
+    async def suggest(self, db: AsyncIOMotorDatabase, owner_id: str, prefix: str, limit: int = TYPEAHEAD_TOP_K) -> List[Dict[str, Any]]:
+        trie = await self.get_trie(db, owner_id)
+        return trie.suggest(prefix, limit)
+
+    def invalidate(self, owner_id: str):
+        """Drop a user's trie so the next lookup rebuilds it (after bulk writes)"""
+        self._tries.pop(owner_id, None)
+
+    def on_change(self, owner_id: str, collection: str, before: Optional[str], after: Optional[str]):
+        """
+        Apply a write to a loaded trie. Pass before=None for inserts and
+        after=None for deletes. Tries that are not loaded pick the change
+        up when they are next built.
+        """
+        trie = self._tries.get(owner_id)
+        if trie is None or before == after:
+            return
+        kind = SUGGESTION_SOURCES[collection][1]
+        trie.remove(kind, before)
+        trie.add(kind, after)
+
+# Global instance
+typeahead_index = TypeaheadIndex()
@@ -0,0 +1,346 @@
+"""
+BOQ export to XLSX, PDF and DOCX that scales to civil-works BOQs with
+thousands of line items
+
+Totals come from the NumPy-based BOQ calculator and every column is
+formatted in one pass; the writers then emit rows in bulk instead of building documents
+cell by cell:
+- XLSX is SpreadsheetML streamed straight into the zip, one block of rows at a time
+- PDF is reportlab LongTables with fixed column widths and pre-wrapped text
+- DOCX is python-docx for the surrounding text with the table inserted as one XML string
+"""
+
+import io
+import textwrap
+import zipfile
+from datetime import datetime
+from typing import Dict, Any, List, Optional, BinaryIO, Union
+from xml.sax.saxutils import escape
+import numpy as np
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer
+from services.boq_calculator import boq_calculator
+
+EXPORT_FORMATS = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+}
+
+# Rows written to the XLSX sheet per zip write
+XLSX_ROWS_PER_WRITE = 1000
+# Rows per PDF table slice (each slice repeats the header row)
+PDF_ROWS_PER_TABLE = 100
+PDF_FONT_SIZE = 7
+GST_NOTE = "Note: All prices are inclusive of GST @ 18%"
+
+def boq_totals(line_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Column arrays plus per-line amounts and totals from the BOQ calculator"""
+    arrays = boq_calculator.line_arrays(line_items)
+    return {**boq_calculator.compute(arrays), **{key: arrays[key] for key in ("quantity", "estimated_rate", "our_rate")}}
+
+def _money(values: np.ndarray) -> List[str]:
+    formatted = list(map("{:,.2f}".format, values.tolist()))
+    for idx in np.flatnonzero(np.isnan(values)).tolist():
+        formatted[idx] = ""
+    return formatted
+
+def _texts(line_items: List[Dict[str, Any]], field: str) -> List[str]:
+    return [str(item.get(field) or "") for item in line_items]
+
+def _columns(boq: Dict[str, Any], totals: Dict[str, Any], include_estimates: bool) -> List[Dict[str, Any]]:
+    """
+    (header, text values, numeric values or None, relative width) per column;
+    numeric columns keep the raw array for XLSX and money-formatted text for PDF/DOCX
+    """
+    items = boq.get("lineItems") or []
+    item_numbers = [str(item.get("itemNumber") or idx) for idx, item in enumerate(items, 1)]
+    columns = [
+        {"header": "Item No.", "text": item_numbers, "width": 0.6},
+        {"header": "Description", "text": _texts(items, "description"), "width": 2.6, "wrap": True},
+        {"header": "Specification", "text": _texts(items, "specification"), "width": 2.2, "wrap": True},
+        {"header": "Qty", "text": list(map("{:g}".format, totals["quantity"].tolist())), "values": totals["quantity"], "width": 0.6},
+        {"header": "Unit", "text": _texts(items, "unit"), "width": 0.5}
+    ]
+    if include_estimates:
+        columns.append({"header": "Est. Rate", "text": _money(totals["estimated_rate"]), "values": totals["estimated_rate"], "width": 0.9, "money": True})
+    columns += [
+        {"header": "Rate", "text": _money(totals["our_rate"]), "values": totals["our_rate"], "width": 0.9, "money": True},
+        {"header": "Amount", "text": _money(totals["amount"]), "values": totals["amount"], "width": 1.0, "money": True}
+    ]
+    return columns
+
+def _heading_lines(boq: Dict[str, Any]) -> List[str]:
+    lines = [f"Tender No: {boq.get('tenderNumber') or boq.get('tenderId') or 'N/A'}", f"BOQ No: {boq.get('boqNumber') or 'N/A'}"]
+    if boq.get("title"):
+        lines.append(boq["title"])
+    return lines
+
+# XLSX
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="BOQ" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Cell styles: 0 general, 1 #,##0.00, 2 bold, 3 bold #,##0.00
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '<xf numFmtId="4" fontId="1" fillId="0" borderId="0" xfId="0" applyNumberFormat="1" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+}
+
+def _xlsx_text(value: str, style: int = 0) -> str:
+    if not value:
+        return "<c/>"
+    style_attr = f' s="{style}"' if style else ""
+    return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+def _xlsx_column(column: Dict[str, Any]) -> List[str]:
+    values = column.get("values")
+    if values is None:
+        return [_xlsx_text(value) for value in column["text"]]
+    style = ' s="1"' if column.get("money") else ""
+    cells = [f"<c{style}><v>{value!r}</v></c>" for value in values.tolist()]
+    for idx in np.flatnonzero(np.isnan(values)).tolist():
+        cells[idx] = "<c/>"
+    return cells
+
+def _column_letter(idx: int) -> str:
+    letters = ""
+    idx += 1
+    while idx:
+        idx, remainder = divmod(idx - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _write_xlsx(boq: Dict[str, Any], columns: List[Dict[str, Any]], totals: Dict[str, Any], output: BinaryIO):
+    row_count = len(columns[0]["text"])
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as package:
+        for name, content in _XLSX_STATIC.items():
+            package.writestr(name, content)
+        with package.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            widths = "".join(
+                f'<col min="{idx}" max="{idx}" width="{column["width"] * 14:.0f}" customWidth="1"/>'
+                for idx, column in enumerate(columns, 1)
+            )
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+                f'<cols>{widths}</cols><sheetData>'
+                '<row>' + "".join(_xlsx_text(column["header"], 2) for column in columns) + '</row>'
+            ).encode("utf-8"))
+
+            cells = [_xlsx_column(column) for column in columns]
+            row_template = "<row>" + "{}" * len(columns) + "</row>"
+            for start in range(0, row_count, XLSX_ROWS_PER_WRITE):
+                block = [cells_of[start:start + XLSX_ROWS_PER_WRITE] for cells_of in cells]
+                sheet.write("".join(map(row_template.format, *block)).encode("utf-8"))
+
+            amount_column = _column_letter(len(columns) - 1)
+            total_row = ["<c/>"] * len(columns)
+            total_row[1] = _xlsx_text("TOTAL", 2)
+            total_row[-1] = (
+                f'<c s="3"><f>SUM({amount_column}2:{amount_column}{row_count + 1})</f>'
+                f'<v>{totals["total_our_value"]!r}</v></c>'
+            )
+            sheet.write(("<row>" + "".join(total_row) + "</row></sheetData></worksheet>").encode("utf-8"))
+
+# PDF
+
+def _write_pdf(boq: Dict[str, Any], columns: List[Dict[str, Any]], totals: Dict[str, Any], output: Union[str, BinaryIO]):
+    styles = getSampleStyleSheet()
+    pagesize = landscape(A4)
+    available = pagesize[0] - 1.0 * inch
+    scale = available / sum(column["width"] for column in columns)
+    col_widths = [column["width"] * scale for column in columns]
+
+    # Paragraph cells measure every word on each layout pass (table sizing, page
+    # splits, drawing), which dominates large exports. Long text is wrapped once
+    # up front by character count instead, sized for Helvetica's wider glyphs.
+    cells = []
+    for column, width in zip(columns, col_widths):
+        if column.get("wrap"):
+            wrapper = textwrap.TextWrapper(width=max(8, int((width - 6) / (PDF_FONT_SIZE * 0.55))))
+            cells.append([text if len(text) <= wrapper.width else "\n".join(wrapper.wrap(text)) for text in column["text"]])
+        else:
+            cells.append(column["text"])
+
+    rows = [[column["header"] for column in columns]]
+    rows += [list(row) for row in zip(*cells)]
+    total_row = [""] * len(columns)
+    total_row[1] = "TOTAL"
+    total_row[-1] = f"{totals['total_our_value']:,.2f}"
+    rows.append(total_row)
+
+    money_start = next(idx for idx, column in enumerate(columns) if column.get("money"))
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F81BD')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), PDF_FONT_SIZE),
+        ('LEADING', (0, 0), (-1, -1), PDF_FONT_SIZE + 1.5),
+        ('ALIGN', (3, 1), (3, -1), 'RIGHT'),
+        ('ALIGN', (money_start, 1), (-1, -1), 'RIGHT'),
+        ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP')
+    ])
+
+    # Splitting a table across pages re-lays out every remaining row, so one
+    # table of 10k rows is quadratic; fixed-size slices keep each split small
+    header, body = rows[0], rows[1:]
+    tables = []
+    for start in range(0, len(body), PDF_ROWS_PER_TABLE):
+        table = LongTable([header] + body[start:start + PDF_ROWS_PER_TABLE], colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        tables.append(table)
+    tables[-1].setStyle(TableStyle([('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold')]))
+
+    story = [Paragraph('Bill of Quantities', styles['Title'])]
+    story += [Paragraph(escape(line), styles['Normal']) for line in _heading_lines(boq)]
+    story += [
+        Spacer(1, 0.15 * inch),
+        *tables,
+        Spacer(1, 0.15 * inch),
+        Paragraph(GST_NOTE, styles['Normal']),
+        Paragraph(f"Total Value: Rs. {totals['total_our_value']:,.2f}", styles['Normal'])
+    ]
+    pdf = SimpleDocTemplate(output, pagesize=pagesize, leftMargin=0.5 * inch, rightMargin=0.5 * inch, topMargin=0.5 * inch, bottomMargin=0.5 * inch)
+    pdf.build(story)
+
+# DOCX
+
+_TABLE_MARKER = "@@BOQ_TABLE@@"
+
+def _docx_cell(text: str, width: int, bold: bool = False) -> str:
+    run_props = "<w:rPr><w:b/></w:rPr>" if bold else ""
+    return (
+        f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr>'
+        f'<w:p><w:r>{run_props}<w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p></w:tc>'
+    )
+
+def _docx_table(columns: List[Dict[str, Any]], totals: Dict[str, Any]) -> str:
+    # Page width minus margins in twentieths of a point
+    scale = 9000 / sum(column["width"] for column in columns)
+    widths = [int(column["width"] * scale) for column in columns]
+    grid = "".join(f'<w:gridCol w:w="{width}"/>' for width in widths)
+    header = "".join(_docx_cell(column["header"], width, bold=True) for column, width in zip(columns, widths))
+
+    cell_templates = [
+        f'<w:tc><w:tcPr><w:tcW w:w="{width}" w:type="dxa"/></w:tcPr><w:p><w:r><w:t xml:space="preserve">{{}}</w:t></w:r></w:p></w:tc>'
+        for width in widths
+    ]
+    row_template = "<w:tr>" + "".join(cell_templates) + "</w:tr>"
+    body = "".join(map(row_template.format, *[list(map(escape, column["text"])) for column in columns]))
+
+    total = [""] * len(columns)
+    total[1] = "TOTAL"
+    total[-1] = f"₹{totals['total_our_value']:,.2f}"
+    total_row = "<w:tr>" + "".join(_docx_cell(text, width, bold=True) for text, width in zip(total, widths)) + "</w:tr>"
+    return (
+        '<w:tbl><w:tblPr><w:tblStyle w:val="LightGrid-Accent1"/><w:tblW w:w="0" w:type="auto"/>'
+        '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" w:lastColumn="0" w:noHBand="0" w:noVBand="1"/></w:tblPr>'
+        f'<w:tblGrid>{grid}</w:tblGrid>'
+        f'<w:tr><w:trPr><w:tblHeader/></w:trPr>{header}</w:tr>{body}{total_row}</w:tbl>'
+    )
+
+def _write_docx(boq: Dict[str, Any], columns: List[Dict[str, Any]], totals: Dict[str, Any], output: Union[str, BinaryIO]):
+    doc = Document()
+    title = doc.add_heading('Bill of Quantities', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for line in _heading_lines(boq):
+        doc.add_paragraph(line)
+    doc.add_paragraph(_TABLE_MARKER)
+    doc.add_paragraph(GST_NOTE)
+    doc.add_paragraph(f"Total Value: ₹{totals['total_our_value']:,.2f}")
+
+    skeleton = io.BytesIO()
+    doc.save(skeleton)
+    with zipfile.ZipFile(skeleton) as source, zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as package:
+        for info in source.infolist():
+            data = source.read(info.filename)
+            if info.filename == "word/document.xml":
+                xml = data.decode("utf-8")
+                marker = xml.index(_TABLE_MARKER)
+                start = xml.rindex("<w:p>", 0, marker) if "<w:p>" in xml[:marker] else xml.rindex("<w:p ", 0, marker)
+                end = xml.index("</w:p>", marker) + len("</w:p>")
+                data = (xml[:start] + _docx_table(columns, totals) + xml[end:]).encode("utf-8")
+            package.writestr(info, data)
+
+_WRITERS = {"xlsx": _write_xlsx, "pdf": _write_pdf, "docx": _write_docx}
+
+def export_boq(boq: Dict[str, Any], fmt: str, output: Optional[Union[str, BinaryIO]] = None, include_estimates: bool = True) -> Dict[str, Any]:
+    """
+    Export a BOQ (stored document shape, camelCase fields) as xlsx, pdf or docx.
+
+    Writes to output (a path or binary file) when given; otherwise the
+    document's bytes are returned in 'content'. Can run inside process-pool
+    workers. include_estimates adds the estimated rate column, which belongs
+    in internal exports but not in submitted bid documents.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format '{fmt}', expected one of {', '.join(_WRITERS)}")
+    totals = boq_totals(boq.get("lineItems") or [])
+    columns = _columns(boq, totals, include_estimates)
+
+    buffer = io.BytesIO() if output is None else None
+    target = buffer if buffer is not None else output
+    if fmt == "xlsx" and isinstance(target, str):
+        with open(target, "wb") as f:
+            _write_xlsx(boq, columns, totals, f)
+    else:
+        _WRITERS[fmt](boq, columns, totals, target)
+
+    result = {
+        "line_items": len(boq.get("lineItems") or []),
+        "total_our_value": totals["total_our_value"],
+        "total_estimated_value": totals["total_estimated_value"],
+        "margin_percentage": totals["margin_percentage"],
+        "generated_at": datetime.now().isoformat()
+    }
+    if buffer is not None:
+        result["content"] = buffer.getvalue()
+    return result
@@ -7,13 +7,19 @@ from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, LongTable, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+from utils.boq_export import export_boq
+import io
 import os
-from datetime import datetime
+import re
+import uuid
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
 
 class DocumentTemplateEngine:
     """Generate professional tender documents"""
@@ -22,6 +28,11 @@ class DocumentTemplateEngine:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
     
+    def _output_file(self, prefix: str, data: Dict[str, Any], extension: str) -> str:
+        # A random suffix keeps concurrent requests for the same tender from overwriting each other
+        tender = data.get('tender_number', 'tender').replace('/', '_')
+        return os.path.join(self.output_dir, f"{prefix}_{tender}_{uuid.uuid4().hex[:8]}.{extension}")
+    
     def generate_cover_letter(self, data: Dict[str, Any]) -> str:
         """
         Generate cover letter DOCX
@@ -94,8 +105,7 @@ class DocumentTemplateEngine:
         doc.add_paragraph(f"{data.get('company_name', '')}")
         
         # Save
-        filename = f"cover_letter_{data.get('tender_number', 'tender').replace('/', '_')}.docx"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._output_file('cover_letter', data, 'docx')
         doc.save(filepath)
         
         return filepath
@@ -110,67 +120,29 @@ class DocumentTemplateEngine:
         Returns:
             Path to generated document
         """
-        doc = Document()
-        
-        # Title
-        title = doc.add_heading('Bill of Quantities', 0)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        doc.add_paragraph(f"Tender No: {data.get('tender_number', 'N/A')}")
-        doc.add_paragraph(f"BOQ No: {data.get('boq_number', 'N/A')}")
-        doc.add_paragraph()
-        
-        # Table
-        line_items = data.get('line_items', [])
-        if line_items:
-            # Create table with headers
-            table = doc.add_table(rows=1, cols=7)
-            table.style = 'Light Grid Accent 1'
-            
-            hdr_cells = table.rows[0].cells
-            hdr_cells[0].text = 'S.No'
-            hdr_cells[1].text = 'Description'
-            hdr_cells[2].text = 'Specification'
-            hdr_cells[3].text = 'Qty'
-            hdr_cells[4].text = 'Unit'
-            hdr_cells[5].text = 'Rate (₹)'
-            hdr_cells[6].text = 'Amount (₹)'
-            
-            # Add data rows
-            for i, item in enumerate(line_items, 1):
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(i)
-                row_cells[1].text = item.get('description', '')
-                row_cells[2].text = item.get('specification', '')
-                row_cells[3].text = str(item.get('quantity', 0))
-                row_cells[4].text = item.get('unit', '')
-                row_cells[5].text = f"{item.get('our_rate', 0):,.2f}"
-                row_cells[6].text = f"{item.get('total_amount', 0):,.2f}"
-            
-            # Total row
-            total_row = table.add_row().cells
-            total_row[0].text = ''
-            total_row[1].text = 'TOTAL'
-            total_row[1].merge(total_row[5])
-            total_row[6].text = f"₹{data.get('total_our_value', 0):,.2f}"
-            
-            # Make total row bold
-            for cell in total_row:
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.bold = True
-        
-        doc.add_paragraph()
-        doc.add_paragraph("Note: All prices are inclusive of GST @ 18%")
-        doc.add_paragraph(f"Total Value: ₹{data.get('total_our_value', 0):,.2f}")
-        
-        # Save
-        filename = f"boq_{data.get('tender_number', 'tender').replace('/', '_')}.docx"
-        filepath = os.path.join(self.output_dir, filename)
-        doc.save(filepath)
-        
+        filepath = self._output_file('boq', data, 'docx')
+        export_boq(self._boq_export_data(data), 'docx', filepath, include_estimates=False)
         return filepath
     
+    def _boq_export_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Template data uses snake_case keys; the exporter reads stored BOQ documents
+        return {
+            'tenderNumber': data.get('tender_number'),
+            'boqNumber': data.get('boq_number'),
+            'lineItems': [
+                {
+                    'itemNumber': str(i),
+                    'description': item.get('description', ''),
+                    'specification': item.get('specification', ''),
+                    'quantity': item.get('quantity', 0),
+                    'unit': item.get('unit', ''),
+                    'ourRate': item.get('our_rate', 0),
+                    'totalAmount': item.get('total_amount')
+                }
+                for i, item in enumerate(data.get('line_items', []), 1)
+            ]
+        }
+    
     def generate_compliance_statement(self, data: Dict[str, Any]) -> str:
         """
         Generate technical compliance statement
@@ -213,11 +185,375 @@ class DocumentTemplateEngine:
         doc.add_paragraph("We hereby declare that we comply with all the above technical requirements.")
         
         # Save
-        filename = f"compliance_{data.get('tender_number', 'tender').replace('/', '_')}.docx"
-        filepath = os.path.join(self.output_dir, filename)
+        filepath = self._output_file('compliance', data, 'docx')
         doc.save(filepath)
         
         return filepath
 
+    def generate_pdf(self, document_type: str, data: Dict[str, Any], output_path: str = None) -> str:
+        """
+        Generate a cover letter, BOQ or compliance statement as PDF, for
+        merging into bid packages
+        
+        Args:
+            document_type: 'cover_letter', 'boq' or 'compliance_statement'
+            data: Same data as the matching DOCX generator
+            output_path: Where to write the PDF (defaults to output_dir)
+            
+        Returns:
+            Path to generated document
+        """
+        builders = {
+            'cover_letter': self._cover_letter_story,
+            'compliance_statement': self._compliance_story
+        }
+        if document_type not in builders and document_type != 'boq':
+            raise ValueError(f"Unknown document type '{document_type}', expected one of cover_letter, boq, compliance_statement")
+        
+        if output_path is None:
+            output_path = self._output_file(document_type, data, 'pdf')
+        if document_type == 'boq':
+            export_boq(self._boq_export_data(data), 'pdf', output_path, include_estimates=False)
+            return output_path
+        
+        styles = getSampleStyleSheet()
+        pdf = SimpleDocTemplate(output_path, pagesize=A4, leftMargin=0.8 * inch, rightMargin=0.8 * inch)
+        pdf.build(builders[document_type](data, styles))
+        return output_path
+    
+    def _cover_letter_story(self, data: Dict[str, Any], styles) -> List[Any]:
+        centered = ParagraphStyle('CenteredBold', parent=styles['Normal'], alignment=1, fontName='Helvetica-Bold', fontSize=14)
+        story = [
+            Paragraph(data.get('company_name', 'Company Name'), centered),
+            Spacer(1, 0.3 * inch),
+            Paragraph(f"Date: {datetime.now().strftime('%d %B %Y')}", styles['Normal']),
+            Spacer(1, 0.2 * inch),
+            Paragraph("To,", styles['Normal']),
+            Paragraph(data.get('tender_organization', 'The Tender Inviting Authority'), styles['Normal']),
+            Paragraph(data.get('tender_department', ''), styles['Normal']),
+            Spacer(1, 0.2 * inch),
+            Paragraph(f"<b>Subject: Submission of Bid for Tender No. {data.get('tender_number', 'N/A')}</b>", styles['Normal']),
+            Spacer(1, 0.2 * inch),
+            Paragraph("Dear Sir/Madam,", styles['Normal']),
+            Spacer(1, 0.1 * inch)
+        ]
+        body = [
+            f"We are pleased to submit our bid for the tender \"{data.get('tender_title', '')}\" "
+            f"(Tender No: {data.get('tender_number', 'N/A')}).",
+            "We have carefully reviewed all the terms and conditions specified in the tender document "
+            "and confirm our compliance with all the requirements. We have submitted all mandatory "
+            "documents as required.",
+            f"Our company, {data.get('company_name', '')}, has extensive experience in similar projects "
+            "and we are confident of our ability to deliver as per the specifications.",
+            "Please find enclosed the following documents: 1. Technical Bid, 2. Financial Bid (in sealed envelope), "
+            "3. Compliance Statement, 4. Supporting Documents and Annexures.",
+            "We look forward to your favorable consideration of our bid."
+        ]
+        for text in body:
+            story += [Paragraph(text, styles['Normal']), Spacer(1, 0.1 * inch)]
+        story += [
+            Spacer(1, 0.2 * inch),
+            Paragraph("Thanking you,", styles['Normal']),
+            Paragraph("Yours faithfully,", styles['Normal']),
+            Spacer(1, 0.5 * inch),
+            Paragraph("<i>[Signature]</i>", styles['Normal']),
+            Paragraph(data.get('authorized_person', 'Authorized Signatory'), styles['Normal']),
+            Paragraph(data.get('designation', 'Director'), styles['Normal']),
+            Paragraph(data.get('company_name', ''), styles['Normal'])
+        ]
+        return story
+    
+    def _grid_table(self, rows: List[List[Any]], col_widths: List[float]) -> Table:
+        table = Table(rows, colWidths=col_widths, repeatRows=1)
+        style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F81BD')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP')
+        ]
+        table.setStyle(TableStyle(style))
+        return table
+    
+    def _compliance_story(self, data: Dict[str, Any], styles) -> List[Any]:
+        story = [
+            Paragraph('Technical Compliance Statement', styles['Title']),
+            Paragraph(f"Tender No: {data.get('tender_number', 'N/A')}", styles['Normal']),
+            Spacer(1, 0.2 * inch)
+        ]
+        requirements = data.get('technical_requirements', [])
+        if requirements:
+            rows = [['Clause', 'Requirement', 'Compliance', 'Remarks']]
+            for req in requirements:
+                rows.append([
+                    req.get('clause_number', ''),
+                    Paragraph(req.get('requirement', ''), styles['BodyText']),
+                    'YES' if req.get('compliance', True) else 'NO',
+                    Paragraph(req.get('remarks', 'Compliant'), styles['BodyText'])
+                ])
+            story.append(self._grid_table(rows, [0.8 * inch, 3.4 * inch, 0.9 * inch, 1.8 * inch]))
+        story += [
+            Spacer(1, 0.2 * inch),
+            Paragraph("We hereby declare that we comply with all the above technical requirements.", styles['Normal'])
+        ]
+        return story
+
+# Compiled templates
+#
+# Letter-style documents that are produced in bulk (one RFQ letter per vendor,
+# cover letters per tender) are declared once as blocks. Each template is
+# compiled once per process: the DOCX is built with python-docx a single time
+# with {{field}} placeholders left in, and its document.xml is split into
+# literal chunks and fields, so rendering is string joins plus one zip write.
+# Table blocks repeat one row per entry of context[<rows key>]; {{index}} is
+# the 1-based row number.
+
+TEMPLATE_SPECS: Dict[str, Dict[str, Any]] = {
+    "rfq_letter": {
+        "title": "Vendor request for quotation",
+        "filename": "rfq_{{rfqNumber}}_{{vendorName}}",
+        "blocks": [
+            ("title", "{{companyName}}"),
+            ("paragraph", "Date: {{date}}"),
+            ("paragraph", "To,\n{{vendorName}}\n{{vendorAddress}}"),
+            ("heading", "Request for Quotation: {{title}} (RFQ No. {{rfqNumber}})"),
+            ("paragraph", "Dear {{contactPerson}},"),
+            ("paragraph", "We invite your best quotation for the items listed below. {{description}}"),
+            ("table", "lineItems", [
+                ("S.No", "index"), ("Item", "itemName"), ("Description", "description"),
+                ("Qty", "quantity"), ("Unit", "unit"), ("Specifications", "specifications")
+            ]),
+            ("paragraph", "Delivery location: {{deliveryLocation}}"),
+            ("paragraph", "Payment terms: {{paymentTerms}}"),
+            ("paragraph", "Please submit your quotation on or before {{dueDate}}, quoting RFQ No. {{rfqNumber}}."),
+            ("paragraph", "{{notes}}"),
+            ("paragraph", "Regards,\n{{senderName}}\n{{companyName}}")
+        ]
+    },
+    "cover_letter": {
+        "title": "Bid submission cover letter",
+        "filename": "cover_letter_{{tender_number}}",
+        "blocks": [
+            ("title", "{{company_name}}"),
+            ("paragraph", "Date: {{date}}"),
+            ("paragraph", "To,\n{{tender_organization}}\n{{tender_department}}"),
+            ("heading", "Subject: Submission of Bid for Tender No. {{tender_number}}"),
+            ("paragraph", "Dear Sir/Madam,"),
+            ("paragraph", "We are pleased to submit our bid for the tender \"{{tender_title}}\" (Tender No: {{tender_number}}). "
+                          "We have carefully reviewed all the terms and conditions specified in the tender document "
+                          "and confirm our compliance with all the requirements."),
+            ("paragraph", "Our company, {{company_name}}, has extensive experience in similar projects "
+                          "and we are confident of our ability to deliver as per the specifications."),
+            ("paragraph", "We look forward to your favorable consideration of our bid."),
+            ("paragraph", "Yours faithfully,\n{{authorized_person}}\n{{designation}}\n{{company_name}}")
+        ]
+    }
+}
+
+TEMPLATE_FORMATS = ("docx", "pdf")
+
+_FIELD = re.compile(r"\{\{\s*([\w.@:]+)\s*\}\}")
+_ROW_MARKER = "{{@rows:%s}}"
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%d %B %Y')
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _split_fields(text: str) -> List[Any]:
+    """'Dear {{name}},' -> ['Dear ', ('name',), ','] (fields are 1-tuples)"""
+    parts = []
+    for idx, chunk in enumerate(_FIELD.split(text)):
+        if idx % 2:
+            parts.append((chunk,))
+        elif chunk:
+            parts.append(chunk)
+    return parts
+
+def _fill(parts: List[Any], context: Dict[str, Any], escape_value) -> str:
+    return "".join(part if isinstance(part, str) else escape_value(_format_value(context.get(part[0]))) for part in parts)
+
+def _docx_escape(value: str) -> str:
+    # Line breaks inside a value become Word line breaks within the same run
+    return escape(value).replace("\n", '</w:t><w:br/><w:t xml:space="preserve">')
+
+def _pdf_escape(value: str) -> str:
+    return escape(value).replace("\n", "<br/>")
+
+def _default_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    return {"date": datetime.now(), **context}
+
+class CompiledDocxTemplate:
+    """A template's document.xml pre-split into literals, fields and repeated table rows"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        doc = Document()
+        rows_keys = []
+        for block in spec["blocks"]:
+            kind = block[0]
+            if kind == "title":
+                paragraph = doc.add_paragraph()
+                paragraph.add_run(block[1]).bold = True
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            elif kind == "heading":
+                paragraph = doc.add_paragraph()
+                paragraph.add_run(block[1]).bold = True
+            elif kind == "paragraph":
+                doc.add_paragraph(block[1])
+            elif kind == "table":
+                _, rows_key, columns = block
+                table = doc.add_table(rows=2, cols=len(columns))
+                table.style = 'Light Grid Accent 1'
+                for idx, (header, field) in enumerate(columns):
+                    table.rows[0].cells[idx].text = header
+                    table.rows[1].cells[idx].text = "{{%s[].%s}}" % (rows_key, field)
+                rows_keys.append(rows_key)
+
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        with zipfile.ZipFile(buffer) as package:
+            parts = {name: package.read(name) for name in package.namelist() if name != "word/document.xml"}
+            xml = package.read("word/document.xml").decode("utf-8")
+        # Every other part is identical across documents, so it is compressed once here
+        # and each render only appends its own document.xml
+        base = io.BytesIO()
+        with zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as package:
+            for name, data in parts.items():
+                package.writestr(name, data)
+        self.base = base.getvalue()
+
+        self.rows: Dict[str, List[Any]] = {}
+        for rows_key in rows_keys:
+            marker = xml.index("{{%s[]." % rows_key)
+            start = max(match.start() for match in re.finditer(r"<w:tr[ >]", xml[:marker]))
+            end = xml.index("</w:tr>", marker) + len("</w:tr>")
+            self.rows[rows_key] = _split_fields(xml[start:end].replace("{{%s[]." % rows_key, "{{"))
+            xml = xml[:start] + _ROW_MARKER % rows_key + xml[end:]
+
+        self.document = []
+        for part in _split_fields(xml):
+            if isinstance(part, tuple) and part[0].startswith("@rows:"):
+                self.document.append(("rows", part[0][len("@rows:"):]))
+            else:
+                self.document.append(part)
+
+    def render(self, context: Dict[str, Any]) -> bytes:
+        context = _default_context(context)
+        xml = []
+        for part in self.document:
+            if isinstance(part, tuple) and len(part) == 2:
+                row_parts = self.rows[part[1]]
+                for idx, row in enumerate(context.get(part[1]) or [], 1):
+                    xml.append(_fill(row_parts, {"index": idx, **row}, _docx_escape))
+            else:
+                xml.append(_fill([part], context, _docx_escape))
+
+        buffer = io.BytesIO(self.base)
+        with zipfile.ZipFile(buffer, "a", zipfile.ZIP_DEFLATED) as package:
+            package.writestr("word/document.xml", "".join(xml))
+        return buffer.getvalue()
+
+class CompiledPdfTemplate:
+    """A template's blocks with placeholders pre-split and paragraph styles built once"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        styles = getSampleStyleSheet()
+        block_styles = {
+            "title": ParagraphStyle('TemplateTitle', parent=styles['Normal'], alignment=1, fontName='Helvetica-Bold', fontSize=14, spaceAfter=12),
+            "heading": ParagraphStyle('TemplateHeading', parent=styles['Normal'], fontName='Helvetica-Bold', spaceBefore=6, spaceAfter=6),
+            "paragraph": ParagraphStyle('TemplateParagraph', parent=styles['Normal'], spaceAfter=8)
+        }
+        self.cell_style = ParagraphStyle('TemplateCell', parent=styles['BodyText'], fontSize=8, leading=10)
+        self.blocks = []
+        for block in spec["blocks"]:
+            if block[0] == "table":
+                _, rows_key, columns = block
+                self.blocks.append(("table", rows_key, [header for header, _ in columns], [_split_fields("{{%s}}" % field) for _, field in columns]))
+            else:
+                self.blocks.append((block[0], block_styles[block[0]], _split_fields(block[1])))
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4F81BD')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP')
+        ])
+
+    def render(self, context: Dict[str, Any]) -> bytes:
+        context = _default_context(context)
+        story = []
+        for block in self.blocks:
+            if block[0] == "table":
+                _, rows_key, headers, cells = block
+                rows = [headers]
+                for idx, row in enumerate(context.get(rows_key) or [], 1):
+                    row = {"index": idx, **row}
+                    rows.append([Paragraph(_fill(cell, row, _pdf_escape), self.cell_style) for cell in cells])
+                table = LongTable(rows, repeatRows=1)
+                table.setStyle(self.table_style)
+                story += [table, Spacer(1, 0.15 * inch)]
+            else:
+                _, style, parts = block
+                story.append(Paragraph(_fill(parts, context, _pdf_escape), style))
+
+        buffer = io.BytesIO()
+        SimpleDocTemplate(buffer, pagesize=A4, leftMargin=0.8 * inch, rightMargin=0.8 * inch).build(story)
+        return buffer.getvalue()
+
+_compiled: Dict[Tuple[str, str], Any] = {}
+
+def compiled_template(name: str, fmt: str):
+    """Compiled template, built on first use in each process"""
+    if name not in TEMPLATE_SPECS:
+        raise ValueError(f"Unknown template '{name}', expected one of {', '.join(TEMPLATE_SPECS)}")
+    if fmt not in TEMPLATE_FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {', '.join(TEMPLATE_FORMATS)}")
+    key = (name, fmt)
+    if key not in _compiled:
+        _compiled[key] = (CompiledDocxTemplate if fmt == "docx" else CompiledPdfTemplate)(TEMPLATE_SPECS[name])
+    return _compiled[key]
+
+def template_fields(name: str) -> Dict[str, List[str]]:
+    """Fields a template reads: top-level fields and, per table, the row fields"""
+    fields, rows = [], {}
+    for block in TEMPLATE_SPECS[name]["blocks"]:
+        if block[0] == "table":
+            rows[block[1]] = [field for _, field in block[2] if field != "index"]
+        else:
+            fields += [part[0] for part in _split_fields(block[1]) if isinstance(part, tuple) and part[0] not in fields]
+    return {"fields": fields, "tables": rows}
+
+def document_filename(name: str, fmt: str, context: Dict[str, Any], index: int) -> str:
+    """File name for one document of a batch; the index prefix keeps names unique within the batch"""
+    stem = _fill(_split_fields(TEMPLATE_SPECS[name]["filename"]), context, lambda value: value)
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", stem).strip("._")[:80] or name
+    return f"{index + 1:04d}_{stem}.{fmt}"
+
+def render_documents(name: str, fmt: str, contexts: List[Dict[str, Any]], start_index: int = 0, output_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Render a slice of a batch. With output_dir the documents are written there
+    and their sizes returned; otherwise their bytes are returned. Runs inside
+    process-pool workers.
+    """
+    template = compiled_template(name, fmt)
+    results = []
+    for offset, context in enumerate(contexts):
+        index = start_index + offset
+        content = template.render(context)
+        result = {"index": index, "file_name": document_filename(name, fmt, context, index), "size": len(content)}
+        if output_dir:
+            with open(os.path.join(output_dir, result["file_name"]), "wb") as f:
+                f.write(content)
+        else:
+            result["content"] = content
+        results.append(result)
+    return results
+
 # Global template engine instance
 template_engine = DocumentTemplateEngine()
@@ -3,12 +3,139 @@ OCR Service for extracting text from images and PDFs
 Uses Tesseract OCR with fallback options
 """
 
+import asyncio
+import time
 import pytesseract
 from PIL import Image
 from pdf2image import convert_from_path
+from PyPDF2 import PdfReader
 import io
 import os
-from typing import List, Dict, Any
+import unicodedata
+from collections import deque
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+from services.executors import executors, ExecutorSaturated
+from services.extraction_cache import extraction_cache
+
+OCR_DPI = int(os.getenv('OCR_DPI', '200'))
+OCR_PAGES_PER_TASK = int(os.getenv('OCR_PAGES_PER_TASK', '2'))
+# Upper bound on rasterized page images held at once across all workers of one document
+OCR_MAX_IMAGE_MEMORY_MB = int(os.getenv('OCR_MAX_IMAGE_MEMORY_MB', '512'))
+OCR_SATURATION_WAIT_SECONDS = int(os.getenv('OCR_SATURATION_WAIT_SECONDS', '60'))
+# Hybrid extraction keeps a page's embedded text when it has at least this many
+# visible characters per square inch and at most this share of garbage characters
+TEXT_LAYER_MIN_DENSITY = float(os.getenv('TEXT_LAYER_MIN_DENSITY', '1.0'))
+TEXT_LAYER_MAX_GARBAGE_RATIO = float(os.getenv('TEXT_LAYER_MAX_GARBAGE_RATIO', '0.1'))
+# Text-layer pages are cheap, so hybrid workers take larger page ranges than OCR workers
+HYBRID_PAGES_PER_TASK = int(os.getenv('HYBRID_PAGES_PER_TASK', '8'))
+
+EXTRACTION_MODES = ("text", "hybrid", "ocr")
+
+# Control, private-use, unassigned and surrogate code points: what broken font encodings extract to
+_GARBAGE_CATEGORIES = {"Cc", "Co", "Cn", "Cs"}
+
+def pdf_page_layout(pdf_path: str, dpi: int) -> Tuple[int, int]:
+    """
+    Page count and the bytes one grayscale page image needs at this dpi
+    (largest page), read from the PDF structure without rendering anything
+    """
+    reader = PdfReader(pdf_path)
+    largest = 0.0
+    for page in reader.pages:
+        box = page.mediabox
+        largest = max(largest, float(box.width) * float(box.height))
+    # PDF user space is 1/72 inch
+    return len(reader.pages), int(largest / (72 * 72) * dpi * dpi)
+
+def _page_result(image: Image.Image, page_number: int, lang: str, config: str) -> Dict[str, Any]:
+    data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if not word.strip() or confidence < 0:
+            continue
+        lines.setdefault((data['block_num'][i], data['par_num'][i], data['line_num'][i]), []).append(word)
+        confidences.append(confidence)
+
+    return {
+        'page': page_number,
+        'text': "\n".join(" ".join(words) for words in lines.values()),
+        'method': 'ocr',
+        'average_confidence': round(sum(confidences) / len(confidences), 2) if confidences else 0,
+        'total_words': len(confidences)
+    }
+
+def text_layer_quality(text: str, area_sq_in: float) -> Dict[str, Any]:
+    """
+    Score a page's embedded text layer: visible characters per square inch of
+    page and the share of them that are garbage (replacement glyphs, control
+    or private-use code points). Scanned pages score zero density; documents
+    with broken font encodings score a high garbage ratio.
+    """
+    visible = [char for char in text if not char.isspace()]
+    garbage = sum(1 for char in visible if char == '\ufffd' or unicodedata.category(char) in _GARBAGE_CATEGORIES)
+    density = len(visible) / area_sq_in if area_sq_in else 0.0
+    garbage_ratio = garbage / len(visible) if visible else 1.0
+    return {
+        'characters': len(visible),
+        'density': round(density, 2),
+        'garbage_ratio': round(garbage_ratio, 3),
+        'usable': density >= TEXT_LAYER_MIN_DENSITY and garbage_ratio <= TEXT_LAYER_MAX_GARBAGE_RATIO
+    }
+
+def ocr_page_range(pdf_path: str, first_page: int, last_page: int, dpi: int = OCR_DPI, lang: str = 'eng', psm: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Rasterize and OCR a page range one page at a time, so a worker never
+    holds more than a single page image. Runs inside process-pool workers.
+    """
+    config = f"--psm {psm}" if psm else ""
+    results = []
+    for page_number in range(first_page, last_page + 1):
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True)
+        for image in images:
+            try:
+                results.append(_page_result(image, page_number, lang, config))
+            finally:
+                image.close()
+    return results
+
+def hybrid_page_range(pdf_path: str, first_page: int, last_page: int, dpi: int = OCR_DPI, lang: str = 'eng', psm: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Text layer first: keep each page's embedded text when it scores as usable
+    and rasterize + OCR only the pages that fail. Every result records the
+    'method' used and the text-layer score. Runs inside process-pool workers.
+    """
+    config = f"--psm {psm}" if psm else ""
+    reader = PdfReader(pdf_path)
+    results = []
+    for page_number in range(first_page, last_page + 1):
+        page = reader.pages[page_number - 1]
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            # Unparseable content streams are treated like a missing text layer
+            text = ""
+        box = page.mediabox
+        quality = text_layer_quality(text, float(box.width) * float(box.height) / (72 * 72))
+        if quality['usable']:
+            results.append({'page': page_number, 'text': text, 'method': 'text_layer', 'text_layer': quality})
+            continue
+        
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True)
+        for image in images:
+            try:
+                results.append({**_page_result(image, page_number, lang, config), 'text_layer': quality})
+            finally:
+                image.close()
+    return results
+
+# mode -> (extraction cache engine, worker, pages per task)
+_PAGE_WORKERS = {
+    "ocr": ("tesseract", ocr_page_range, OCR_PAGES_PER_TASK),
+    "hybrid": ("hybrid", hybrid_page_range, HYBRID_PAGES_PER_TASK)
+}
 
 class OCRService:
     """OCR service for document text extraction"""
@@ -64,22 +191,133 @@ class OCRService:
             Extracted text from all pages
         """
         try:
-            # Convert PDF to images
-            images = convert_from_path(pdf_path)
-            
-            if max_pages:
-                images = images[:max_pages]
+            # Apply max_pages before rendering and rasterize one page at a time
+            total_pages = len(PdfReader(pdf_path).pages)
+            last_page = min(total_pages, max_pages) if max_pages else total_pages
             
-            # Extract text from each page
             full_text = []
-            for i, image in enumerate(images):
-                page_text = pytesseract.image_to_string(image, lang='eng')
-                full_text.append(f"--- Page {i+1} ---\n{page_text}")
+            for page in ocr_page_range(pdf_path, 1, last_page):
+                full_text.append(f"--- Page {page['page']} ---\n{page['text']}")
             
             return "\n\n".join(full_text)
         except Exception as e:
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
+    async def _ocr_chunk(self, worker, pdf_path: str, first_page: int, last_page: int, dpi: int, lang: str, psm: Optional[int]) -> List[Dict[str, Any]]:
+        # Wait for room on the shared process pool instead of failing a document mid-stream
+        deadline = time.monotonic() + OCR_SATURATION_WAIT_SECONDS
+        while True:
+            try:
+                return await executors.cpu.run(worker, pdf_path, first_page, last_page, dpi, lang, psm)
+            except ExecutorSaturated:
+                if time.monotonic() >= deadline:
+                    raise
+                await asyncio.sleep(0.5)
+    
+    async def stream_pdf_pages(
+        self,
+        pdf_path: str,
+        first_page: int = 1,
+        last_page: int = None,
+        dpi: int = OCR_DPI,
+        lang: str = 'eng',
+        psm: int = None,
+        mode: str = "ocr"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        OCR a PDF page by page on the process pool, yielding results in page order
+        
+        Page ranges are rasterized lazily inside the workers. The number of
+        ranges in flight is limited by the pool size and by
+        OCR_MAX_IMAGE_MEMORY_MB / (size of one page image), so a 300-page
+        document never holds more than a handful of page images at once.
+        Pages already OCRed with the same file contents and parameters come
+        from the extraction cache and are marked 'cached'.
+        
+        In "hybrid" mode each page's text layer is tried first and only pages
+        whose embedded text fails text_layer_quality are OCRed.
+        
+        Args:
+            pdf_path: Path to PDF file
+            first_page: First page to OCR (1-based)
+            last_page: Last page to OCR (None for the last page of the document)
+            dpi: Rasterization resolution
+            lang: Tesseract language(s)
+            psm: Tesseract page segmentation mode
+            mode: "ocr" to OCR every page, "hybrid" for text layer first
+            
+        Yields:
+            {'page', 'text', 'method', ...} per page; OCRed pages carry
+            'average_confidence' and 'total_words', hybrid pages 'text_layer'
+            
+        Raises:
+            ValueError: If mode is unknown
+        """
+        if mode not in _PAGE_WORKERS:
+            raise ValueError(f"Unsupported extraction mode '{mode}'")
+        engine, worker, pages_per_task = _PAGE_WORKERS[mode]
+        
+        total_pages, page_bytes = await executors.io.run(pdf_page_layout, pdf_path, dpi)
+        last_page = min(last_page or total_pages, total_pages)
+        first_page = max(1, first_page)
+        
+        params = {"dpi": dpi, "lang": lang, "psm": psm}
+        if mode == "hybrid":
+            params.update(min_density=TEXT_LAYER_MIN_DENSITY, max_garbage=TEXT_LAYER_MAX_GARBAGE_RATIO)
+        digest = await executors.io.run(extraction_cache.file_digest, pdf_path)
+        cached = await executors.io.run(extraction_cache.get_pages, digest, engine, params, range(first_page, last_page + 1))
+        
+        # Page-ordered plan: cached pages are emitted as-is, runs of missing pages become OCR chunks
+        plan = []
+        for page_number in range(first_page, last_page + 1):
+            if page_number in cached:
+                plan.append(("cached", {**cached[page_number], "cached": True}))
+            elif plan and plan[-1][0] == "chunk" and plan[-1][1][1] - plan[-1][1][0] + 1 < pages_per_task:
+                plan[-1] = ("chunk", (plan[-1][1][0], page_number))
+            else:
+                plan.append(("chunk", (page_number, page_number)))
+        chunks = [value for kind, value in plan if kind == "chunk"]
+        
+        memory_slots = (OCR_MAX_IMAGE_MEMORY_MB * 1024 * 1024) // max(1, page_bytes)
+        in_flight = max(1, min(executors.cpu.max_workers, memory_slots))
+        
+        pending = deque()
+        next_chunk = 0
+        try:
+            for kind, value in plan:
+                while next_chunk < len(chunks) and len(pending) < in_flight:
+                    start, end = chunks[next_chunk]
+                    pending.append(asyncio.ensure_future(self._ocr_chunk(worker, pdf_path, start, end, dpi, lang, psm)))
+                    next_chunk += 1
+                
+                if kind == "cached":
+                    yield value
+                    continue
+                
+                pages = await pending.popleft()
+                await executors.io.run(extraction_cache.set_pages, digest, engine, params, pages)
+                for page in pages:
+                    yield page
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def extract_text_from_pdf_async(self, pdf_path: str, max_pages: int = None) -> str:
+        """
+        Async, process-pool version of extract_text_from_pdf
+        
+        Args:
+            pdf_path: Path to PDF file
+            max_pages: Maximum number of pages to process (None for all)
+            
+        Returns:
+            Extracted text from all pages
+        """
+        full_text = []
+        async for page in self.stream_pdf_pages(pdf_path, 1, max_pages):
+            full_text.append(f"--- Page {page['page']} ---\n{page['text']}")
+        return "\n\n".join(full_text)
+    
     def extract_text_with_confidence(self, image_path: str) -> Dict[str, Any]:
         """
         Extract text with confidence scores
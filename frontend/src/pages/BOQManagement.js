@@ -166,7 +166,20 @@ const BOQManagement = () => {
     }
   };
 
-  const handleEdit = (boq) => {
+  const handleEdit = async (listedBoq) => {
+    let boq = listedBoq;
+    try {
+      // The tender listing omits line items, so load the full BOQ
+      const token = localStorage.getItem('token');
+      const response = await axios.get(`${API_URL}/boq/${listedBoq.id}`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      boq = response.data;
+    } catch (error) {
+      console.error('Failed to fetch BOQ:', error);
+      alert('Failed to load BOQ: ' + (error.response?.data?.detail || error.message));
+      return;
+    }
     setEditingBoq(boq);
     setFormData({
       tenderId: boq.tenderId,
@@ -267,7 +280,7 @@ const BOQManagement = () => {
                   <tr key={boq.id} className="hover:bg-gray-50">
                     <td className="px-6 py-4 text-sm font-medium text-gray-900">{boq.boqNumber}</td>
                     <td className="px-6 py-4 text-sm text-gray-900">{boq.title}</td>
-                    <td className="px-6 py-4 text-sm text-gray-600">{boq.lineItems.length} items</td>
+                    <td className="px-6 py-4 text-sm text-gray-600">{boq.lineItemCount ?? boq.lineItems?.length ?? 0} items</td>
                     <td className="px-6 py-4 text-sm text-gray-900">
                       ₹{(boq.totalOurValue || 0).toLocaleString()}
                     </td>
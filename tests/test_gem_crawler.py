@@ -0,0 +1,298 @@
+"""
+GeM crawler tests against recorded bid listing pages.
+
+tests/fixtures/gem/all_bids_page_<n>.html are replayed through an
+httpx.MockTransport that behaves like the portal: each page carries an
+ETag, conditional requests for an unchanged page get a 304, and pages can
+be made to fail before they succeed.
+"""
+import asyncio
+import hashlib
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services import gem_crawler as crawler_module  # noqa: E402
+from services.gem_crawler import GeMCrawler, CRAWL_STATE_COLLECTION  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "gem")
+BASE_URL = "https://bidplus.gem.gov.in"
+
+
+def _page(number: int) -> bytes:
+    # The listing ends at page 3; later pages replay the same empty result
+    with open(os.path.join(FIXTURES, f"all_bids_page_{min(number, 3)}.html"), "rb") as f:
+        return f.read()
+
+
+class RecordedPortal:
+    """Replays the recorded listing pages; `failures` maps a page to statuses returned before it succeeds"""
+
+    def __init__(self, failures=None):
+        self.failures = {page: list(statuses) for page, statuses in (failures or {}).items()}
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        page = int(request.url.params.get("page_no", "1"))
+        if self.failures.get(page):
+            return httpx.Response(self.failures[page].pop(0), headers={"Retry-After": "0"})
+        body = _page(page)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        return httpx.Response(200, content=body, headers={"ETag": etag, "Content-Type": "text/html; charset=utf-8"})
+
+    def pages_requested(self):
+        return sorted(int(request.url.params["page_no"]) for request in self.requests)
+
+
+class _BulkResult:
+    def __init__(self, upserted_count: int, modified_count: int):
+        self.upserted_count = upserted_count
+        self.modified_count = modified_count
+
+
+class _Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def limit(self, count):
+        return _Cursor(self.documents[:count])
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield dict(document)
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for upsert-only bulk writes"""
+
+    def __init__(self):
+        self.documents = {}
+        self.bulk_writes = []
+
+    def find(self, query=None, projection=None):
+        return _Cursor(list(self.documents.values()))
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes.append(operations)
+        upserted = modified = 0
+        for operation in operations:
+            key = tuple(sorted(operation._filter.items()))
+            update = operation._doc
+            if key in self.documents:
+                document = self.documents[key]
+                changed = {field: value for field, value in update.get("$set", {}).items() if document.get(field) != value}
+                document.update(changed)
+                modified += bool(changed)
+            else:
+                self.documents[key] = {**operation._filter, **update.get("$setOnInsert", {}), **update.get("$set", {})}
+                upserted += 1
+        return _BulkResult(upserted, modified)
+
+
+class FakeDB:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+@pytest.fixture(autouse=True)
+def fast_crawler(monkeypatch):
+    # No rate limiting or backoff delays against the in-process portal
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_RATE_PER_SECOND", 1000.0)
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_BURST", 100)
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_BACKOFF_SECONDS", 0.0)
+
+
+def _crawler(portal: RecordedPortal) -> GeMCrawler:
+    return GeMCrawler(base_url=BASE_URL, transport=httpx.MockTransport(portal))
+
+
+async def _crawl(crawler: GeMCrawler, **kwargs):
+    try:
+        return await crawler.crawl("computers", **kwargs)
+    finally:
+        await crawler.close()
+
+
+def test_crawl_parses_recorded_pages():
+    portal = RecordedPortal()
+    tenders = asyncio.run(_crawl(_crawler(portal)))
+
+    # Page 2 repeats a bid from page 1; the empty page 3 ends the listing
+    assert [tender["tender_number"] for tender in tenders] == [
+        "GEM/2025/B/5812034", "GEM/2025/B/5812101", "GEM/2025/B/5812277", "GEM/2025/B/5813009"
+    ]
+    first = tenders[0]
+    assert first["title"] == "Desktop Computers (Q2)"
+    assert first["organization"] == "Ministry of Defence"
+    assert first["department"] == "Department of Military Affairs"
+    assert first["quantity"] == "25"
+    assert first["publish_date"] == "2025-01-02T10:15:00+00:00"
+    assert first["submission_deadline"] == "2025-01-23T18:00:00+00:00"
+    assert first["document_url"] == BASE_URL + "/showbidDocument/5812034"
+    assert tenders[2]["title"] == "Office Chair & Workstation Table"
+    assert all(request.url.params["searchedBid"] == "computers" for request in portal.requests)
+
+
+def test_unchanged_pages_are_revalidated_with_etags():
+    portal = RecordedPortal()
+    crawler = _crawler(portal)
+
+    async def crawl_twice():
+        try:
+            first = await crawler.crawl("computers")
+            portal.requests.clear()
+            second = await crawler.crawl("computers")
+            return first, second
+        finally:
+            await crawler.close()
+
+    first, second = asyncio.run(crawl_twice())
+
+    assert len(first) == 4
+    # Every page was sent with its validator and came back 304; the cached rows are served, nothing is re-parsed
+    assert second == first
+    assert portal.requests and all(request.headers.get("If-None-Match") for request in portal.requests)
+    assert crawler.stats["not_modified"] == len(portal.requests)
+    assert crawler.stats["tenders_parsed"] == 5
+
+
+def test_repeat_search_after_restart_returns_cached_rows(monkeypatch):
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_ENABLED", True)
+    db = FakeDB()
+
+    async def search(portal):
+        crawler = _crawler(portal)
+        try:
+            await crawler.load_state(db)
+            tenders = await crawler.search_tenders("computers")
+            await crawler.save_state(db)
+            return tenders
+        finally:
+            await crawler.close()
+
+    first = asyncio.run(search(RecordedPortal()))
+    portal = RecordedPortal()
+    second = asyncio.run(search(portal))
+
+    assert len(first) == 4
+    assert second == first
+    assert all(request.headers.get("If-None-Match") for request in portal.requests)
+
+
+def test_retryable_errors_are_retried_with_backoff():
+    portal = RecordedPortal(failures={1: [503, 429]})
+    crawler = _crawler(portal)
+    delays = []
+    backoff = crawler._backoff
+    crawler._backoff = lambda attempt, retry_after=None: delays.append((attempt, retry_after)) or backoff(attempt, retry_after)
+
+    tenders = asyncio.run(_crawl(crawler))
+
+    assert len(tenders) == 4
+    assert crawler.stats["retries"] == 2
+    assert crawler.stats["failures"] == 0
+    # Retry-After from the failed responses drives the backoff
+    assert delays == [(0, "0"), (1, "0")]
+    assert portal.pages_requested().count(1) == 3
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_MAX_RETRIES", 2)
+    portal = RecordedPortal(failures={1: [502, 502, 502, 502]})
+    crawler = _crawler(portal)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_crawl(crawler, max_pages=1))
+    assert crawler.stats["retries"] == 2
+    assert crawler.stats["failures"] == 1
+    assert len(portal.requests) == 3
+
+
+def test_client_errors_are_not_retried():
+    portal = RecordedPortal(failures={1: [404]})
+    crawler = _crawler(portal)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_crawl(crawler, max_pages=1))
+    assert crawler.stats["retries"] == 0
+    assert len(portal.requests) == 1
+
+
+def test_backoff_honours_retry_after_and_cap(monkeypatch):
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_BACKOFF_SECONDS", 0.5)
+    crawler = GeMCrawler(base_url=BASE_URL)
+
+    assert crawler._backoff(0, "3") == 3.0
+    assert crawler._backoff(0, "3600") == crawler_module.GEM_CRAWLER_MAX_BACKOFF_SECONDS
+    for attempt in range(12):
+        assert 0 <= crawler._backoff(attempt) <= min(crawler_module.GEM_CRAWLER_MAX_BACKOFF_SECONDS, 0.5 * 2 ** attempt)
+
+
+def test_sync_tenders_upserts_by_tender_number(monkeypatch):
+    monkeypatch.setattr(crawler_module, "GEM_CRAWLER_ENABLED", True)
+    rebuilds = []
+
+    async def rebuild(db, user_id):
+        rebuilds.append(user_id)
+
+    monkeypatch.setattr(crawler_module.dashboard_rollups, "rebuild", rebuild)
+    db = FakeDB()
+    db.tenders.documents[(("tenderNumber", "GEM/2025/B/5812101"), ("userId", "user-1"))] = {
+        "userId": "user-1",
+        "tenderNumber": "GEM/2025/B/5812101",
+        "id": "existing-id",
+        "title": "Old title",
+        "status": "bidding",
+        "notes": "our notes"
+    }
+
+    async def sync(portal):
+        crawler = _crawler(portal)
+        try:
+            return await crawler.sync_tenders(db, "user-1", "computers")
+        finally:
+            await crawler.close()
+
+    result = asyncio.run(sync(RecordedPortal()))
+
+    assert result["fetched"] == 4
+    assert result["inserted"] == 3
+    assert result["updated"] == 1
+    assert rebuilds == ["user-1"]
+    operations = db.tenders.bulk_writes[0]
+    assert {operation._filter["tenderNumber"] for operation in operations} == {
+        "GEM/2025/B/5812034", "GEM/2025/B/5812101", "GEM/2025/B/5812277", "GEM/2025/B/5813009"
+    }
+    assert all(operation._filter["userId"] == "user-1" and operation._upsert for operation in operations)
+
+    # Portal fields are refreshed; user-owned fields on the existing tender are left alone
+    existing = db.tenders.documents[(("tenderNumber", "GEM/2025/B/5812101"), ("userId", "user-1"))]
+    assert existing["title"] == "Laser Printer, Toner Cartridge"
+    assert existing["organization"] == "Ministry of Railways"
+    assert (existing["id"], existing["status"], existing["notes"]) == ("existing-id", "bidding", "our notes")
+    inserted = db.tenders.documents[(("tenderNumber", "GEM/2025/B/5812034"), ("userId", "user-1"))]
+    assert inserted["status"] == "new" and inserted["source"] == "gem" and inserted["id"]
+    assert inserted["submissionDeadline"] == "2025-01-23T18:00:00+00:00"
+
+    # Validators were saved, so a new crawler instance revalidates and replays the cached rows
+    assert len(db[CRAWL_STATE_COLLECTION].documents) >= 3
+    portal = RecordedPortal()
+    result = asyncio.run(sync(portal))
+    assert (result["fetched"], result["inserted"]) == (4, 0)
+    assert all(request.headers.get("If-None-Match") for request in portal.requests)
@@ -0,0 +1,58 @@
+"""
+Catalog matching memory stays bounded for large BOQ batches.
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services import product_matcher as matcher_module  # noqa: E402
+from services.product_matcher import CatalogIndex  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def _catalog_and_lines(products: int, lines: int, words: int):
+    rng = random.Random(7)
+    vocabulary = [f"w{number}x{'abcdefghij'[number % 10]}" for number in range(1500)]
+    catalog = [
+        {
+            "id": str(number),
+            "productName": " ".join(rng.choices(vocabulary, k=6)),
+            "brand": rng.choice(vocabulary),
+            "specifications": {"detail": " ".join(rng.choices(vocabulary, k=8))}
+        }
+        for number in range(products)
+    ]
+    return catalog, [" ".join(rng.choices(vocabulary, k=words)) for _ in range(lines)]
+
+
+def _peak(index: CatalogIndex, lines):
+    tracemalloc.start()
+    try:
+        results = index.match(lines)
+        return results, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_large_batch_peak_memory_is_bounded(monkeypatch):
+    catalog, lines = _catalog_and_lines(products=3000, lines=600, words=40)
+    index = CatalogIndex(catalog)
+
+    # Gathering every (query term, posting) pair of this batch at once takes well over 100 MB
+    monkeypatch.setattr(matcher_module, "PRODUCT_MATCH_BLOCK_CELLS", 10 ** 9)
+    monkeypatch.setattr(matcher_module, "PRODUCT_MATCH_BLOCK_PAIRS", 10 ** 9)
+    unbounded, unbounded_peak = _peak(index, lines)
+
+    monkeypatch.setattr(matcher_module, "PRODUCT_MATCH_BLOCK_CELLS", 300_000)
+    monkeypatch.setattr(matcher_module, "PRODUCT_MATCH_BLOCK_PAIRS", 100_000)
+    bounded, bounded_peak = _peak(index, lines)
+
+    # ~40 bytes per pair and 8 per score cell, plus the batch's query vectors
+    assert bounded_peak < 16 * MB
+    assert unbounded_peak > 100 * MB
+    assert [[match["id"] for match in line] for line in bounded] == [[match["id"] for match in line] for line in unbounded]
+    assert [[match["score"] for match in line] for line in bounded] == [[match["score"] for match in line] for line in unbounded]
@@ -0,0 +1,71 @@
+"""
+Tender ingestion against the recorded GeM listing pages.
+
+The ingestion run shares the global crawler (and its conditional-request
+validators) with interactive searches, so it is exercised here after a
+search has already fetched the same pages.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services import tender_ingestion as ingestion_module  # noqa: E402
+from services.tender_ingestion import TenderIngestion, CATALOG_COLLECTION, STATE_COLLECTION  # noqa: E402
+
+from tests.test_gem_crawler import FakeCollection, FakeDB, RecordedPortal, _crawler  # noqa: E402
+
+
+class IngestionCollection(FakeCollection):
+    """Adds the lease and run-log calls ingestion makes on top of bulk upserts"""
+
+    def __init__(self):
+        super().__init__()
+        self.updates = []
+        self.inserted = []
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        return {"source": query["source"], **self.documents.get(query["source"], {})}
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+        self.documents[query["source"]] = {**self.documents.get(query["source"], {}), **update["$set"]}
+
+    async def insert_one(self, document):
+        self.inserted.append(document)
+
+
+class IngestionDB(FakeDB):
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, IngestionCollection())
+
+
+@pytest.fixture
+def portal(monkeypatch):
+    portal = RecordedPortal()
+    crawler = _crawler(portal)
+    monkeypatch.setattr(ingestion_module, "GEM_CRAWLER_ENABLED", True)
+    monkeypatch.setattr(ingestion_module, "gem_crawler", crawler)
+    yield portal
+    asyncio.run(crawler.close())
+
+
+def test_ingestion_stores_pages_a_search_already_fetched(portal):
+    db = IngestionDB()
+
+    async def search_then_ingest():
+        await ingestion_module.gem_crawler.crawl("computers")
+        portal.requests.clear()
+        return await TenderIngestion().run_source(db, "gem", ["computers"])
+
+    run = asyncio.run(search_then_ingest())
+
+    # The pages came back 304 to ingestion, yet every listing was written
+    assert portal.requests and all(request.headers.get("If-None-Match") for request in portal.requests)
+    assert (run["fetched"], run["inserted"], run["errors"]) == (4, 4, 0)
+    stored = {document["tender_number"] for document in db[CATALOG_COLLECTION].documents.values()}
+    assert stored == {"GEM/2025/B/5812034", "GEM/2025/B/5812101", "GEM/2025/B/5812277", "GEM/2025/B/5813009"}
+    assert db[STATE_COLLECTION].documents["gem"]["high_water_mark"] == run["high_water_mark"]
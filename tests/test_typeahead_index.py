@@ -0,0 +1,68 @@
+"""
+Prefix trie built in bulk must match one maintained write by write.
+"""
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from services import typeahead_index as typeahead_module  # noqa: E402
+from services.typeahead_index import PrefixTrie, TypeaheadIndex  # noqa: E402
+
+from tests.test_gem_crawler import FakeDB  # noqa: E402
+
+TITLES = [
+    "Supply of Laptops", "Supply of Desktop Computers", "Laptop Bags", "Annual Maintenance of Laptops",
+    "Office Chairs", "Office Chair & Workstation Table", "Supply of Laptops", "Toner Cartridges",
+    "Network Switches", "Supply of  laptops  ", "CCTV Cameras", "Office Chairs"
+]
+PREFIXES = ["", "s", "sup", "supply of l", "lap", "laptop", "of", "office chair", "t", "x"]
+
+
+def _incremental(entries):
+    trie = PrefixTrie(top_k=3)
+    for kind, text in entries:
+        trie.add(kind, text)
+    return trie
+
+
+def test_bulk_build_matches_incremental_adds():
+    entries = [("tender", title) for title in TITLES] + [("product", "Laptop Stand"), ("vendor", None), ("vendor", " ")]
+    built = PrefixTrie.build(entries, top_k=3)
+    incremental = _incremental(entries)
+
+    assert built.counts == incremental.counts
+    for prefix in PREFIXES:
+        assert built.suggest(prefix, 3) == incremental.suggest(prefix, 3), prefix
+
+    # Writes after a bulk build keep the cached lists in step
+    for trie in (built, incremental):
+        trie.remove("tender", "Supply of Laptops")
+        trie.remove("tender", "Office Chairs")
+        trie.remove("tender", "Office Chairs")
+        trie.add("tender", "Laptop Chargers")
+    for prefix in PREFIXES + ["laptop c", "office c"]:
+        assert built.suggest(prefix, 3) == incremental.suggest(prefix, 3), prefix
+
+
+def test_index_builds_off_the_event_loop(monkeypatch):
+    db = FakeDB()
+    for number, title in enumerate(TITLES):
+        db.tenders.documents[number] = {"title": title}
+    threads = []
+    build = PrefixTrie.build
+
+    def record_thread(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(typeahead_module.PrefixTrie, "build", record_thread)
+
+    suggestions = asyncio.run(TypeaheadIndex().suggest(db, "user-1", "lap", 2))
+
+    assert [(suggestion["text"], suggestion["score"]) for suggestion in suggestions] == [
+        ("Supply of Laptops", 2), ("Annual Maintenance of Laptops", 1)
+    ]
+    assert threads and threads[0] is not threading.main_thread()